@@ -1,23 +1,21 @@
 from dotenv import load_dotenv, find_dotenv
 import os
 
-dotenv_path = find_dotenv()
-print("DOTENV PATH FOUND:", dotenv_path)
-
-load_dotenv(dotenv_path)
-print("CURRENT DIR:", os.getcwd())
-print("FILES HERE:", os.listdir())
+load_dotenv(find_dotenv())
 import logging
 import json
-from flask import Flask, render_template, request, redirect, url_for, flash, session, send_file, jsonify, abort
+from flask import Flask, render_template, request, redirect, url_for, flash, session, send_file, jsonify, abort, make_response, Response, stream_with_context
+from markupsafe import Markup
+from collections import OrderedDict
+import hashlib
+import threading
 from flask_login import LoginManager, login_user, logout_user, login_required, current_user
 from werkzeug.security import check_password_hash, generate_password_hash
 from werkzeug.utils import secure_filename
 from werkzeug.middleware.proxy_fix import ProxyFix
 import tempfile
 from datetime import datetime, date
-import pandas as pd
-from email_utils import (send_welcome_email, send_upgrade_email,
+from email_utils import (send_welcome_email, send_upgrade_email, send_password_reset_email,
                           send_activity_approved_email, send_activity_rejected_email,
                           check_emailjs_configured)
 
@@ -52,19 +50,29 @@ app.config['MAX_CONTENT_LENGTH'] = 16 * 1024 * 1024  # 16MB max file size
 os.makedirs(app.config['UPLOAD_FOLDER'], exist_ok=True)
 
 with app.app_context():
-    # Initialize database with proper schema
-    from database import init_database
-    init_database()
-    # Create all SQLAlchemy tables
-    db.create_all()
+    # Migrations run once per schema version; a current database costs one metadata read
+    from database import init_database, schema_is_current, install_tombstone_triggers
+    if not schema_is_current():
+        # Apply pending schema migrations
+        init_database()
+        # Create all SQLAlchemy tables
+        db.create_all()
+        # Triggers on tables that only create_all makes (fresh databases)
+        install_tombstone_triggers()
+
+# Deliver queued email in the background; maintenance scripts set EMAIL_OUTBOX_WORKER=0 to keep it off
+from email_outbox import outbox_worker_enabled, ensure_outbox_worker
+if outbox_worker_enabled():
+    ensure_outbox_worker(app)
 
 # Import utility functions after app context
-from automation import auto_classify_data, suggest_processing_purpose, assess_risk, suggest_security_measures
+from automation import (
+    auto_classify_data, suggest_processing_purpose, assess_risk, suggest_security_measures,
+    classify_records_frame, classify_stored_records
+)
 from utils import get_predefined_options, validate_required_fields
 from database import get_db_connection, get_user_department
-from export_utils import generate_export
-from file_handler import process_uploaded_file
-from template_generator import generate_ropa_template
+# export_utils, file_handler and template_generator pull in pandas/openpyxl, so they are imported on first use
 
 @login_manager.user_loader
 def load_user(user_id):
@@ -123,38 +131,71 @@ def from_json_filter(json_str):
     except (ValueError, TypeError):
         return []
 
-def cleanup_duplicate_sheets():
-    """Remove duplicate Excel sheets from database, keeping only the first occurrence"""
-    try:
-        # Get all Excel files
-        excel_files = models.ExcelFileData.query.all()
-        total_deleted = 0
-        
-        for file in excel_files:
-            # Track sheet names we've seen for this file
-            seen_sheet_names = set()
-            sheets_to_delete = []
-            
-            # Go through sheets in order of creation (earliest first)
-            for sheet in sorted(file.sheets, key=lambda s: s.id):
-                if sheet.sheet_name in seen_sheet_names:
-                    # This is a duplicate, mark for deletion
-                    sheets_to_delete.append(sheet)
-                    total_deleted += 1
-                else:
-                    # First occurrence, keep it
-                    seen_sheet_names.add(sheet.sheet_name)
-            
-            # Delete the duplicate sheets
-            for sheet in sheets_to_delete:
-                db.session.delete(sheet)
-        
-        db.session.commit()
-        return total_deleted
-    except Exception as e:
-        db.session.rollback()
-        print(f"Error cleaning up duplicate sheets: {str(e)}")
-        return 0
+# ── Conditional GETs and fragment caching for record, version and sheet views ──
+# Template mtimes are part of every page ETag so a deploy that only changes markup still invalidates
+TEMPLATE_BUILD = max(
+    (os.path.getmtime(os.path.join(app.root_path, 'templates', name))
+     for name in os.listdir(os.path.join(app.root_path, 'templates'))),
+    default=0
+)
+
+def page_etag(*parts):
+    """Strong ETag from the view's own inputs plus everything base.html renders for this user"""
+    unread = models.Notification.query.filter_by(user_id=current_user.id, is_read=False).count()
+    user_parts = (TEMPLATE_BUILD, current_user.id, current_user.role, get_user_effective_tier(current_user),
+                  unread, date.today().isoformat())
+    return hashlib.sha256(repr(user_parts + parts).encode()).hexdigest()
+
+def custom_values_key(record_id):
+    """Stable ETag input for a record's custom values; read-only"""
+    from custom_tab_automation import get_custom_values_for_records
+    values = get_custom_values_for_records([record_id]).get(record_id, {})
+    return tuple(sorted(values.items()))
+
+def conditional_page(etag, render):
+    """Return 304 when the client already has this ETag, otherwise render and tag the page"""
+    # Pages carrying a one-off flash message must never be replayed from cache
+    if session.get('_flashes'):
+        response = make_response(render())
+        response.cache_control.no_store = True
+        return response
+
+    if request.if_none_match.contains(etag):
+        response = app.response_class(status=304)
+    else:
+        response = make_response(render())
+    response.set_etag(etag)
+    response.cache_control.private = True
+    response.cache_control.no_cache = True  # Always revalidate; the ETag makes that cheap
+    response.vary.add('Cookie')
+    return response
+
+SHEET_FRAGMENT_CACHE_SIZE = 64
+_sheet_fragment_cache = OrderedDict()
+_sheet_fragment_lock = threading.Lock()
+
+@app.template_global()
+def render_sheet_table(sheet):
+    """Render an uploaded sheet's table once per sheet version and serve repeats from an LRU cache"""
+    sheet_data = sheet.sheet_data
+    if not sheet_data:
+        return ''
+    content_key = sheet.content_hash or hashlib.sha256(sheet_data.encode()).hexdigest()
+    cache_key = (sheet.id, content_key, getattr(sheet, 'display_name', None), sheet.sheet_name,
+                 sheet.row_count, sheet.column_count, TEMPLATE_BUILD)
+
+    with _sheet_fragment_lock:
+        fragment = _sheet_fragment_cache.get(cache_key)
+        if fragment is not None:
+            _sheet_fragment_cache.move_to_end(cache_key)
+            return fragment
+
+    fragment = Markup(render_template('excel_sheet_table.html', sheet=sheet, sheet_data_list=from_json_filter(sheet_data)))
+    with _sheet_fragment_lock:
+        _sheet_fragment_cache[cache_key] = fragment
+        while len(_sheet_fragment_cache) > SHEET_FRAGMENT_CACHE_SIZE:
+            _sheet_fragment_cache.popitem(last=False)
+    return fragment
 
 @app.route('/')
 def index():
@@ -245,6 +286,7 @@ def register():
             # Send welcome / confirmation email in background
             try:
                 send_welcome_email(user_email=email, organisation=organisation or email.split('@')[0])
+                db.session.commit()
             except Exception as email_err:
                 logging.warning(f"Welcome email failed for {email}: {email_err}")
             return redirect(url_for('login'))
@@ -316,6 +358,8 @@ def forgot_password():
             # In a production app, you would send an email here
             # For now, we'll flash the reset link
             reset_url = url_for('reset_password', token=token, _external=True)
+            send_password_reset_email(user_email=email, reset_link=reset_url)
+            db.session.commit()
 
             log_audit_event('Password Reset Requested', email, 'User requested password reset')
             flash(f'Password reset instructions would be sent to {email}. For development: {reset_url}', 'info')
@@ -1003,14 +1047,19 @@ def view_activity(record_id):
     # Get custom fields and their data for this record
     from custom_tab_automation import get_approved_custom_fields_by_category
     from custom_tab_automation import get_custom_data_for_record
-    try:
-        custom_fields = get_approved_custom_fields_by_category()
-        custom_data = get_custom_data_for_record(record.id)
-    except:
-        custom_fields = {}
-        custom_data = {}
+    from custom_tab_automation import get_custom_field_schema_version
+
+    def render():
+        try:
+            custom_fields = get_approved_custom_fields_by_category()
+            custom_data = get_custom_data_for_record(record.id)
+        except:
+            custom_fields = {}
+            custom_data = {}
+        return render_template('ropa_view_excel.html', record=record, custom_fields=custom_fields, custom_data=custom_data)
 
-    return render_template('ropa_view_excel.html', record=record, custom_fields=custom_fields, custom_data=custom_data)
+    etag = page_etag('view_activity', record.id, record.updated_at, custom_values_key(record.id), get_custom_field_schema_version())
+    return conditional_page(etag, render)
 
 @app.route('/view-all-ropa-excel')
 @login_required
@@ -1019,11 +1068,6 @@ def view_all_ropa_excel():
     if current_user.role != 'Privacy Officer':
         abort(403)
     
-    # Clean up any duplicate sheets in the database first
-    deleted_count = cleanup_duplicate_sheets()
-    if deleted_count > 0:
-        print(f"Cleaned up {deleted_count} duplicate sheets")
-    
     # Get only this user's uploaded Excel files
     uploaded_files = models.ExcelFileData.query.filter_by(uploaded_by=current_user.id).order_by(models.ExcelFileData.upload_timestamp.desc()).all()
     # Provide a fallback display name for unnamed sheets (A, B, C...)
@@ -1169,11 +1213,6 @@ def edit_all_ropa_excel():
             print(f"Error updating uploaded files: {str(e)}")
     
     # Get all uploaded Excel files with their sheet data for editing
-    # Clean up any duplicate sheets in the database first
-    deleted_count = cleanup_duplicate_sheets()
-    if deleted_count > 0:
-        print(f"Cleaned up {deleted_count} duplicate sheets")
-    
     uploaded_files = models.ExcelFileData.query.order_by(models.ExcelFileData.upload_timestamp.desc()).all()
     # Provide a fallback display name for unnamed sheets (A, B, C...)
     import string
@@ -1239,6 +1278,16 @@ def excel_version_history(file_id):
     
     try:
         excel_file = models.ExcelFileData.query.get_or_404(file_id)
+
+        # Version rows are append-only, so their count and newest id identify the page contents
+        from sqlalchemy import func
+        version_count, latest_id = db.session.query(
+            func.count(models.ExcelVersionHistory.id), func.max(models.ExcelVersionHistory.id)
+        ).filter(models.ExcelVersionHistory.excel_file_id == file_id).one()
+        etag = page_etag('excel_version_history', excel_file.id, excel_file.last_edited_at, version_count, latest_id)
+        log_audit_event('View Excel Version History', current_user.email, f'Viewed version history for file: {excel_file.filename}')
+        if request.if_none_match.contains(etag) and not session.get('_flashes'):
+            return conditional_page(etag, lambda: '')
         
         # Get all version history for this file, ordered by date descending
         version_history = models.ExcelVersionHistory.query.filter_by(
@@ -1266,12 +1315,10 @@ def excel_version_history(file_id):
                 'snapshot': version.snapshot
             })
         
-        log_audit_event('View Excel Version History', current_user.email, f'Viewed version history for file: {excel_file.filename}')
-        
-        return render_template('excel_version_history.html',
+        return conditional_page(etag, lambda: render_template('excel_version_history.html',
                                excel_file=excel_file,
                                versions_by_sheet=versions_by_sheet,
-                               current_time=datetime.now().strftime('%Y-%m-%d %H:%M:%S'))
+                               current_time=datetime.now().strftime('%Y-%m-%d %H:%M:%S')))
     except Exception as e:
         flash(f'Error loading version history: {str(e)}', 'error')
         return redirect(url_for('view_saved_ropa'))
@@ -1316,6 +1363,7 @@ def update_status(record_id, status):
                     reason=record.review_comments or None,
                     reviewer_name=reviewer_name
                 )
+            db.session.commit()
     except Exception as email_err:
         logging.warning(f"Status-change email failed: {email_err}")
 
@@ -1333,8 +1381,9 @@ def test_email():
         flash('EmailJS credentials are not fully configured. Please check your environment secrets.', 'error')
         return redirect(request.referrer or url_for('privacy_officer_dashboard'))
     try:
-        from email_utils import send_email
-        success = send_email(
+        # Sent directly rather than through the outbox so the officer sees the result straight away
+        from email_utils import deliver_email
+        success, error, _ = deliver_email(
             to_email=current_user.email,
             to_name=current_user.department or current_user.email,
             subject="DataProcess Flow – Email Test",
@@ -1347,7 +1396,7 @@ def test_email():
         if success:
             flash(f'Test email sent successfully to {current_user.email}.', 'success')
         else:
-            flash('Email was not delivered. Please check your EmailJS service/template configuration.', 'error')
+            flash(f'Email was not delivered ({error}). Please check your EmailJS service/template configuration.', 'error')
     except Exception as e:
         flash(f'Error sending test email: {str(e)}', 'error')
     return redirect(request.referrer or url_for('privacy_officer_dashboard'))
@@ -1379,9 +1428,12 @@ def download_template():
         abort(403)
 
     try:
-        template_path = generate_ropa_template()
+        from template_generator import generate_ropa_template
+        template_file = generate_ropa_template()
+        if template_file is None:
+            raise Exception('Template could not be generated')
         log_audit_event('Template Downloaded', current_user.email, 'Downloaded ROPA template')
-        return send_file(template_path, as_attachment=True, download_name='ROPA_Template.xlsx')
+        return send_file(template_file, as_attachment=True, download_name='ROPA_Template.xlsx')
     except Exception as e:
         import traceback
         print(f"Template generation error: {str(e)}")
@@ -1410,6 +1462,7 @@ def upload_file():
             filename = secure_filename(file.filename)
             try:
                 # Process the uploaded file
+                from file_handler import process_uploaded_file
                 result = process_uploaded_file(file, current_user.email)
                 log_audit_event('File Uploaded', current_user.email, f'Uploaded and processed file: {filename}')
                 flash(f'File processed successfully: {result}', 'success')
@@ -1433,16 +1486,34 @@ def export_data():
         include_drafts = request.args.get('include_drafts') == 'true'
         include_rejected = request.args.get('include_rejected') == 'true'
 
+        # CSV and NDJSON stream straight from the database without a temp file
+        if export_format in ('csv', 'ndjson'):
+            from export_utils import stream_ropa_export, export_stream_filename, STREAM_FORMATS
+            rows = stream_ropa_export(current_user.email, current_user.role, export_format,
+                                      include_drafts, include_rejected)
+            log_audit_event('Data Export', current_user.email, f'Streamed data export in {export_format} format')
+            response = Response(stream_with_context(rows), mimetype=STREAM_FORMATS[export_format])
+            response.headers['Content-Disposition'] = f'attachment; filename={export_stream_filename(export_format)}'
+            response.headers['X-Accel-Buffering'] = 'no'
+            return response
+
         # Special handling for complete Excel export
         if export_format == 'excel':
             export_format = 'excel_complete'  # Use the enhanced export
 
-        file_path, filename = generate_export(
-            current_user.email, 
-            current_user.role, 
+        from export_utils import generate_export
+        from export_cache import cached_export, export_scope
+        file_path, filename = cached_export(
+            export_scope(current_user.email, current_user.role),
             export_format,
-            include_drafts,
-            include_rejected
+            {'include_drafts': include_drafts, 'include_rejected': include_rejected},
+            lambda: generate_export(
+                current_user.email,
+                current_user.role,
+                export_format,
+                include_drafts,
+                include_rejected
+            )
         )
 
         # Get information about what was exported for user feedback
@@ -1475,13 +1546,37 @@ def export_data():
         else:
             return redirect(url_for('privacy_champion_dashboard'))
 
+@app.route('/api/export-changes')
+@login_required
+def api_export_changes():
+    """Delta export for sync clients: changes and tombstones since ?since=<cursor from the previous call>"""
+    if not has_feature(current_user, 'has_export'):
+        return jsonify({'error': 'upgrade_required', 'message': 'Export functionality is not available on your current plan.'}), 403
+    from export_utils import generate_delta_export, parse_delta_cursor
+    try:
+        since = parse_delta_cursor(request.args.get('since') or request.args.get('cursor'))
+    except ValueError:
+        return jsonify({'error': 'invalid_cursor', 'message': 'since must be an ISO 8601 timestamp'}), 400
+
+    payload = generate_delta_export(current_user.email, current_user.role, since)
+    log_audit_event('Delta Export', current_user.email,
+                    f"Exported {len(payload['records'])} records, {len(payload['sheets'])} sheets and "
+                    f"{len(payload['deleted'])} deletions changed since {payload['since'] or 'the beginning'}")
+    return jsonify(payload)
+
 @app.route('/export-complete-excel')
 @login_required
 def export_complete_excel():
     """Export complete Excel file with all original sheets plus updates"""
     try:
         from file_handler import export_excel_with_all_sheets
-        file_path, filename = export_excel_with_all_sheets(current_user.email, current_user.role, include_updates=True)
+        from export_cache import cached_export, export_scope
+        file_path, filename = cached_export(
+            export_scope(current_user.email, current_user.role),
+            'excel_complete',
+            {'include_updates': True},
+            lambda: export_excel_with_all_sheets(current_user.email, current_user.role, include_updates=True)
+        )
         log_audit_event('Complete Excel Exported', current_user.email, 'Exported complete Excel with all sheets and updates')
         return send_file(file_path, as_attachment=True, download_name=filename)
     except Exception as e:
@@ -1491,6 +1586,69 @@ def export_complete_excel():
         else:
             return redirect(url_for('privacy_champion_dashboard'))
 
+@app.route('/export-excel-zip')
+@login_required
+def export_excel_zip():
+    """Export one workbook per uploaded file as a streamed ZIP archive"""
+    if not has_feature(current_user, 'has_export'):
+        flash('Export functionality is not available on your current plan. Please upgrade to access Excel/PDF downloads.', 'error')
+        return redirect(url_for('pricing'))
+
+    from file_handler import stream_workbooks_zip
+    archive = stream_workbooks_zip(current_user.email, current_user.role, include_updates=True)
+    log_audit_event('Excel ZIP Exported', current_user.email, 'Exported one workbook per uploaded file as a ZIP archive')
+    response = Response(stream_with_context(archive), mimetype='application/zip')
+    response.headers['Content-Disposition'] = f"attachment; filename=ROPA_Workbooks_{datetime.now().strftime('%Y%m%d_%H%M%S')}.zip"
+    response.headers['X-Accel-Buffering'] = 'no'
+    return response
+
+@app.route('/export-columnar')
+@login_required
+def export_columnar():
+    """Export the register as Parquet/Arrow for analytics: one ?dataset=, or a ZIP bundle of all datasets"""
+    if not has_feature(current_user, 'has_export'):
+        flash('Export functionality is not available on your current plan. Please upgrade to access Excel/PDF downloads.', 'error')
+        return redirect(url_for('pricing'))
+    try:
+        export_format = request.args.get('format', 'parquet')
+        dataset = request.args.get('dataset')
+        from columnar_io import export_columnar_bundle, export_columnar_dataset
+        if dataset:
+            file_path, filename = export_columnar_dataset(current_user.email, current_user.role, dataset, export_format)
+        else:
+            file_path, filename = export_columnar_bundle(current_user.email, current_user.role, export_format)
+        log_audit_event('Columnar Export', current_user.email, f"Exported {dataset or 'all datasets'} as {export_format}")
+        return send_file(file_path, as_attachment=True, download_name=filename)
+    except Exception as e:
+        flash(f'Error generating analytics export: {str(e)}', 'error')
+        if current_user.role == 'Privacy Officer':
+            return redirect(url_for('privacy_officer_dashboard'))
+        else:
+            return redirect(url_for('privacy_champion_dashboard'))
+
+@app.route('/import-columnar', methods=['POST'])
+@login_required
+def import_columnar():
+    """Bulk import a Parquet/Arrow analytics bundle or dataset file (Privacy Officer only)"""
+    if current_user.role != 'Privacy Officer':
+        abort(403)
+
+    file = request.files.get('file')
+    if not file or file.filename == '':
+        flash('No file selected', 'error')
+        return redirect(url_for('upload_file'))
+    try:
+        from columnar_io import import_columnar_file
+        summary = import_columnar_file(file, current_user.email)
+        log_audit_event('Columnar Import', current_user.email, f'Imported {secure_filename(file.filename)}: {json.dumps(summary)}')
+        flash(f"Imported {summary['ropa_records']} ROPA records, {summary['custom_field_values']} custom field values "
+              f"({summary['skipped_custom_values']} skipped), {summary['excel_sheets']} sheets in "
+              f"{summary['excel_files']} files and {summary['audit_logs']} audit log entries.", 'success')
+    except Exception as e:
+        log_audit_event('Columnar Import Error', current_user.email, f'Error importing {secure_filename(file.filename)}: {str(e)}')
+        flash(f'Error importing file: {str(e)}', 'error')
+    return redirect(url_for('upload_file'))
+
 @app.route('/view-saved-ropa')
 @login_required
 def view_saved_ropa():
@@ -1856,24 +2014,59 @@ def delete_user(user_id):
     return redirect(url_for('user_management'))
 
 # API endpoints for automation features — gated by subscription tier
+def get_automation_input():
+    """Automation inputs from the JSON body; they can hold personal data, so they never go in a URL"""
+    data = request.get_json(silent=True)
+    return data if isinstance(data, dict) else {}
+
 @app.route('/api/auto-classify', methods=['POST'])
 @login_required
 def api_auto_classify():
     """Auto-classification — Enterprise only"""
     if not has_feature(current_user, 'has_automation'):
         return jsonify({'error': 'upgrade_required', 'message': 'Full automation is available on the Enterprise plan.'}), 403
-    data = request.get_json()
+    data = get_automation_input()
     description = data.get('description', '')
     classification = auto_classify_data(description)
     return jsonify({'classification': classification})
 
+@app.route('/api/batch-classify', methods=['POST'])
+@login_required
+def api_batch_classify():
+    """Batch classification and risk scoring — Enterprise only"""
+    if not has_feature(current_user, 'has_automation'):
+        return jsonify({'error': 'upgrade_required', 'message': 'Full automation is available on the Enterprise plan.'}), 403
+    data = request.get_json() or {}
+
+    # Ad-hoc records are scored and returned without touching the database
+    if 'records' in data:
+        records = data.get('records') or []
+        if not (isinstance(records, list) and all(isinstance(record, dict) for record in records)):
+            return jsonify({'error': 'invalid_records', 'message': 'records must be a list of objects'}), 400
+        import pandas as pd
+        records_df = pd.DataFrame(records)
+        classified = classify_records_frame(records_df)
+        results = classified.reindex(columns=['category', 'risk_level', 'dpia_required']).astype(object)
+        return jsonify({'results': results.where(results.notna(), None).to_dict('records')})
+
+    # Otherwise fill in stored records that are missing category or risk fields
+    record_ids = data.get('record_ids')
+    if record_ids is not None and not (
+        isinstance(record_ids, list) and all(type(record_id) is int for record_id in record_ids)
+    ):
+        return jsonify({'error': 'invalid_record_ids', 'message': 'record_ids must be a list of integers'}), 400
+    created_by = None if current_user.role == 'Privacy Officer' else current_user.id
+    updated = classify_stored_records(record_ids=record_ids, created_by=created_by)
+    log_audit_event('Batch Classification', current_user.email, f'Classified and risk-scored {updated} ROPA records')
+    return jsonify({'updated': updated})
+
 @app.route('/api/suggest-purpose', methods=['POST'])
 @login_required
 def api_suggest_purpose():
     """Purpose suggestion — Enterprise only"""
     if not has_feature(current_user, 'has_automation'):
         return jsonify({'error': 'upgrade_required', 'message': 'Full automation is available on the Enterprise plan.'}), 403
-    data = request.get_json()
+    data = get_automation_input()
     department = data.get('department', '')
     category = data.get('category', '')
     suggestion = suggest_processing_purpose(department, category)
@@ -1885,7 +2078,7 @@ def api_assess_risk():
     """Risk assessment — Growth+ (basic risk flagging)"""
     if not has_feature(current_user, 'has_dashboard'):
         return jsonify({'error': 'upgrade_required', 'message': 'Risk assessment is available on the Growth and Enterprise plans.'}), 403
-    data = request.get_json()
+    data = get_automation_input()
     data_categories = data.get('data_categories', '')
     special_categories = data.get('special_categories', '')
     risk_assessment = assess_risk(data_categories, special_categories)
@@ -1897,7 +2090,7 @@ def api_suggest_security():
     """Security suggestions — Enterprise only"""
     if not has_feature(current_user, 'has_automation'):
         return jsonify({'error': 'upgrade_required', 'message': 'Full automation is available on the Enterprise plan.'}), 403
-    data = request.get_json()
+    data = get_automation_input()
     data_categories = data.get('data_categories', '')
     risk_level = data.get('risk_level', 'Medium')
     suggestions = suggest_security_measures(data_categories, risk_level)
@@ -2087,14 +2280,19 @@ def view_ropa(id):
     # Get custom fields and their data for this record
     from custom_tab_automation import get_approved_custom_fields_by_category
     from custom_tab_automation import get_custom_data_for_record
-    try:
-        custom_fields = get_approved_custom_fields_by_category()
-        custom_data = get_custom_data_for_record(record.id)
-    except:
-        custom_fields = {}
-        custom_data = {}
+    from custom_tab_automation import get_custom_field_schema_version
+
+    def render():
+        try:
+            custom_fields = get_approved_custom_fields_by_category()
+            custom_data = get_custom_data_for_record(record.id)
+        except:
+            custom_fields = {}
+            custom_data = {}
+        return render_template('ropa_view.html', record=record, custom_fields=custom_fields, custom_data=custom_data)
 
-    return render_template('ropa_view.html', record=record, custom_fields=custom_fields, custom_data=custom_data)
+    etag = page_etag('view_ropa', record.id, record.updated_at, custom_values_key(record.id), get_custom_field_schema_version())
+    return conditional_page(etag, render)
 
 @app.route('/ropa/<int:id>/edit', methods=['GET', 'POST'])
 @login_required
@@ -2352,11 +2550,20 @@ def version_history(record_id):
     if current_user.role == 'Privacy Champion' and record.created_by != current_user.id:
         abort(403)
 
-    history = models.ROPAVersionHistory.query.filter_by(
-        ropa_record_id=record_id
-    ).order_by(models.ROPAVersionHistory.changed_at.desc()).all()
+    # History rows are append-only, so their count and newest id identify the page contents
+    from sqlalchemy import func
+    history_count, latest_id = db.session.query(
+        func.count(models.ROPAVersionHistory.id), func.max(models.ROPAVersionHistory.id)
+    ).filter(models.ROPAVersionHistory.ropa_record_id == record_id).one()
+
+    def render():
+        history = models.ROPAVersionHistory.query.filter_by(
+            ropa_record_id=record_id
+        ).order_by(models.ROPAVersionHistory.changed_at.desc()).all()
+        return render_template('version_history.html', record=record, history=history)
 
-    return render_template('version_history.html', record=record, history=history)
+    etag = page_etag('version_history', record.id, record.updated_at, history_count, latest_id)
+    return conditional_page(etag, render)
 
 
 @app.route('/notifications')
@@ -2,106 +2,172 @@
 Automation features for Privacy ROPA system
 """
 
+import re
+from functools import lru_cache
+
+# Keywords for different categories
+CATEGORY_KEYWORDS = {
+    "Human Resources": ["employee", "hr", "staff", "personnel", "payroll", "recruitment", "hiring"],
+    "Marketing": ["marketing", "campaign", "newsletter", "advertising", "promotion", "lead"],
+    "Sales": ["sales", "customer", "order", "purchase", "transaction", "invoice"],
+    "Customer Service": ["support", "service", "complaint", "feedback", "help", "assistance"],
+    "IT Security": ["security", "access", "login", "authentication", "system", "network"],
+    "Finance": ["finance", "accounting", "payment", "billing", "financial", "budget"],
+    "Operations": ["operations", "logistics", "supply", "inventory", "procurement"],
+    "Legal": ["legal", "contract", "compliance", "regulatory", "audit", "governance"],
+    "Training": ["training", "education", "learning", "development", "course", "certification"]
+}
+
+DEFAULT_CATEGORY = "Administration"
+
+PURPOSE_MAPPING = {
+    "HR": {
+        "default": "Human resources management and employee administration",
+        "Human Resources": "Employee data processing for HR operations including recruitment, performance management, and payroll"
+    },
+    "IT": {
+        "default": "IT systems management and security administration",
+        "IT Security": "System access control, security monitoring, and compliance management"
+    },
+    "Marketing": {
+        "default": "Marketing activities and customer communication",
+        "Marketing": "Direct marketing, lead generation, and customer relationship management"
+    },
+    "Sales": {
+        "default": "Sales process management and customer relations",
+        "Sales": "Customer order processing, sales pipeline management, and contract administration"
+    },
+    "Finance": {
+        "default": "Financial operations and accounting processes",
+        "Finance": "Financial transaction processing, billing, and regulatory compliance"
+    },
+    "Legal": {
+        "default": "Legal compliance and risk management",
+        "Legal": "Legal compliance monitoring, contract management, and regulatory reporting"
+    }
+}
+
+DEFAULT_PURPOSES = {"default": "Business operations and administration"}
+
+RISK_FACTORS = {
+    "high_risk_data": frozenset(["Genetic Data", "Biometric Data", "Health Data", "Criminal Convictions"]),
+    "medium_risk_data": frozenset(["Financial Data", "Location Data", "Behavioral Data"]),
+    "personal_identifiers": frozenset(["Identity Data", "Contact Information"])
+}
+
+BASE_SECURITY_MEASURES = (
+    "Access controls and user authentication",
+    "Regular data backups",
+    "Encryption of data in transit and at rest",
+    "Staff training on data protection"
+)
+
+# Risk-based additional measures
+RISK_SECURITY_MEASURES = {
+    "High": (
+        "Multi-factor authentication",
+        "Data loss prevention (DLP) tools",
+        "Regular penetration testing",
+        "Incident response procedures",
+        "Data minimization and pseudonymization",
+        "Regular security audits"
+    ),
+    "Medium": (
+        "Enhanced access logging and monitoring",
+        "Regular security updates and patches",
+        "Data retention policy enforcement",
+        "Vendor security assessments"
+    ),
+    "Low": (
+        "Basic firewall protection",
+        "Antivirus software",
+        "Regular password updates"
+    )
+}
+
+# Data-specific measures
+DATA_SECURITY_MEASURES = {
+    "Health Data": ("Medical data encryption", "HIPAA compliance measures"),
+    "Financial Data": ("PCI DSS compliance", "Financial data segregation"),
+    "Biometric Data": ("Biometric data hashing", "Secure biometric storage"),
+    "Location Data": ("Location data anonymization", "GPS data encryption")
+}
+
+
+def build_keyword_matcher(keywords):
+    """Compile keywords into one multi-pattern matcher anchored at word starts, allowing common suffixes"""
+    ordered = sorted(set(keywords), key=len, reverse=True)
+    return re.compile(r'\b(' + '|'.join(re.escape(k) for k in ordered) + r')(?:s|es|ed|ing|ers?)?\b')
+
+
+# Built once at import: keyword -> categories it votes for, plus the compiled matcher
+KEYWORD_CATEGORIES = {}
+for _category, _keywords in CATEGORY_KEYWORDS.items():
+    for _keyword in _keywords:
+        KEYWORD_CATEGORIES.setdefault(_keyword, []).append(_category)
+CATEGORY_MATCHER = build_keyword_matcher(KEYWORD_CATEGORIES)
+CATEGORY_ORDER = {category: idx for idx, category in enumerate(CATEGORY_KEYWORDS)}
+
+
+@lru_cache(maxsize=2048)
 def auto_classify_data(description):
     """Auto-classify data based on description keywords"""
-    description_lower = description.lower()
-    
-    # Keywords for different categories
-    category_keywords = {
-        "Human Resources": ["employee", "hr", "staff", "personnel", "payroll", "recruitment", "hiring"],
-        "Marketing": ["marketing", "campaign", "newsletter", "advertising", "promotion", "lead"],
-        "Sales": ["sales", "customer", "order", "purchase", "transaction", "invoice"],
-        "Customer Service": ["support", "service", "complaint", "feedback", "help", "assistance"],
-        "IT Security": ["security", "access", "login", "authentication", "system", "network"],
-        "Finance": ["finance", "accounting", "payment", "billing", "financial", "budget"],
-        "Operations": ["operations", "logistics", "supply", "inventory", "procurement"],
-        "Legal": ["legal", "contract", "compliance", "regulatory", "audit", "governance"],
-        "Training": ["training", "education", "learning", "development", "course", "certification"]
-    }
+    # Each distinct keyword counts once, as whole words rather than substrings ("hr" no longer hits "through")
+    matched_keywords = {match.group(1) for match in CATEGORY_MATCHER.finditer(description.lower())}
     
     # Score each category based on keyword matches
     category_scores = {}
-    for category, keywords in category_keywords.items():
-        score = sum(1 for keyword in keywords if keyword in description_lower)
-        if score > 0:
-            category_scores[category] = score
+    for keyword in matched_keywords:
+        for category in KEYWORD_CATEGORIES[keyword]:
+            category_scores[category] = category_scores.get(category, 0) + 1
     
-    # Return category with highest score, or default
+    # Return category with highest score (earliest category wins ties), or default
     if category_scores:
-        return max(category_scores, key=category_scores.get)
+        return max(category_scores, key=lambda category: (category_scores[category], -CATEGORY_ORDER[category]))
     else:
-        return "Administration"
+        return DEFAULT_CATEGORY
 
 def suggest_processing_purpose(department, category=""):
     """Suggest processing purpose based on department and category"""
-    
-    purpose_mapping = {
-        "HR": {
-            "default": "Human resources management and employee administration",
-            "Human Resources": "Employee data processing for HR operations including recruitment, performance management, and payroll"
-        },
-        "IT": {
-            "default": "IT systems management and security administration",
-            "IT Security": "System access control, security monitoring, and compliance management"
-        },
-        "Marketing": {
-            "default": "Marketing activities and customer communication",
-            "Marketing": "Direct marketing, lead generation, and customer relationship management"
-        },
-        "Sales": {
-            "default": "Sales process management and customer relations",
-            "Sales": "Customer order processing, sales pipeline management, and contract administration"
-        },
-        "Finance": {
-            "default": "Financial operations and accounting processes",
-            "Finance": "Financial transaction processing, billing, and regulatory compliance"
-        },
-        "Legal": {
-            "default": "Legal compliance and risk management",
-            "Legal": "Legal compliance monitoring, contract management, and regulatory reporting"
-        }
-    }
-    
-    dept_purposes = purpose_mapping.get(department, {"default": "Business operations and administration"})
+    dept_purposes = PURPOSE_MAPPING.get(department, DEFAULT_PURPOSES)
     return dept_purposes.get(category, dept_purposes["default"])
 
+def split_categories(categories):
+    """Normalize a comma-separated string or list of categories into a hashable tuple"""
+    if not categories:
+        return ()
+    if isinstance(categories, (list, tuple)):
+        return tuple(str(cat).strip() for cat in categories if str(cat).strip())
+    return tuple(cat.strip() for cat in str(categories).split(',') if cat.strip())
+
 def assess_risk(data_categories, special_categories):
     """Assess privacy risk based on data categories"""
-    
-    risk_factors = {
-        "high_risk_data": ["Genetic Data", "Biometric Data", "Health Data", "Criminal Convictions"],
-        "medium_risk_data": ["Financial Data", "Location Data", "Behavioral Data"],
-        "personal_identifiers": ["Identity Data", "Contact Information"]
-    }
-    
+    result = _assess_risk_cached(split_categories(data_categories), split_categories(special_categories))
+    # Hand out a copy so callers can't modify the cached result
+    return dict(result, risk_reasons=list(result["risk_reasons"]))
+
+@lru_cache(maxsize=2048)
+def _assess_risk_cached(data_list, special_list):
     risk_score = 0
     risk_reasons = []
     
     # Check for special categories (high risk)
-    if special_categories:
-        special_list = [cat.strip() for cat in special_categories.split(',') if cat.strip()]
-        high_risk_special = [cat for cat in special_list if cat in risk_factors["high_risk_data"]]
-        if high_risk_special:
-            risk_score += 3
-            risk_reasons.append(f"Special categories detected: {', '.join(high_risk_special)}")
+    high_risk_special = [cat for cat in special_list if cat in RISK_FACTORS["high_risk_data"]]
+    if high_risk_special:
+        risk_score += 3
+        risk_reasons.append(f"Special categories detected: {', '.join(high_risk_special)}")
     
     # Check for high-risk regular data
-    if data_categories:
-        # Handle both string and list inputs
-        if isinstance(data_categories, list):
-            data_list = [str(cat).strip() for cat in data_categories if str(cat).strip()]
-        else:
-            data_list = [cat.strip() for cat in str(data_categories).split(',') if cat.strip()]
-        high_risk_data = [cat for cat in data_list if cat in risk_factors["high_risk_data"]]
-        medium_risk_data = [cat for cat in data_list if cat in risk_factors["medium_risk_data"]]
-        
-        if high_risk_data:
-            risk_score += 2
-            risk_reasons.append(f"High-risk data categories: {', '.join(high_risk_data)}")
-        
-        if medium_risk_data:
-            risk_score += 1
-            risk_reasons.append(f"Medium-risk data categories: {', '.join(medium_risk_data)}")
+    high_risk_data = [cat for cat in data_list if cat in RISK_FACTORS["high_risk_data"]]
+    medium_risk_data = [cat for cat in data_list if cat in RISK_FACTORS["medium_risk_data"]]
+    
+    if high_risk_data:
+        risk_score += 2
+        risk_reasons.append(f"High-risk data categories: {', '.join(high_risk_data)}")
+    
+    if medium_risk_data:
+        risk_score += 1
+        risk_reasons.append(f"Medium-risk data categories: {', '.join(medium_risk_data)}")
     
     # Determine overall risk level
     if risk_score >= 3:
@@ -118,64 +184,96 @@ def assess_risk(data_categories, special_categories):
         "risk_level": risk_level,
         "risk_score": risk_score,
         "dpia_required": dpia_required,
-        "risk_reasons": risk_reasons
+        "risk_reasons": tuple(risk_reasons)
     }
 
 def suggest_security_measures(data_categories, risk_level):
     """Suggest appropriate security measures based on data and risk"""
-    
-    base_measures = [
-        "Access controls and user authentication",
-        "Regular data backups",
-        "Encryption of data in transit and at rest",
-        "Staff training on data protection"
-    ]
-    
-    # Risk-based additional measures
-    risk_measures = {
-        "High": [
-            "Multi-factor authentication",
-            "Data loss prevention (DLP) tools",
-            "Regular penetration testing",
-            "Incident response procedures",
-            "Data minimization and pseudonymization",
-            "Regular security audits"
-        ],
-        "Medium": [
-            "Enhanced access logging and monitoring",
-            "Regular security updates and patches",
-            "Data retention policy enforcement",
-            "Vendor security assessments"
-        ],
-        "Low": [
-            "Basic firewall protection",
-            "Antivirus software",
-            "Regular password updates"
-        ]
-    }
-    
-    # Data-specific measures
-    data_specific_measures = {
-        "Health Data": ["Medical data encryption", "HIPAA compliance measures"],
-        "Financial Data": ["PCI DSS compliance", "Financial data segregation"],
-        "Biometric Data": ["Biometric data hashing", "Secure biometric storage"],
-        "Location Data": ["Location data anonymization", "GPS data encryption"]
-    }
-    
-    measures = base_measures.copy()
+    return _suggest_security_measures_cached(split_categories(data_categories), risk_level)
+
+@lru_cache(maxsize=2048)
+def _suggest_security_measures_cached(data_list, risk_level):
+    measures = list(BASE_SECURITY_MEASURES)
     
     # Add risk-based measures
-    measures.extend(risk_measures.get(risk_level, []))
+    measures.extend(RISK_SECURITY_MEASURES.get(risk_level, ()))
     
     # Add data-specific measures
-    if data_categories:
-        # Handle both string and list inputs
-        if isinstance(data_categories, list):
-            data_list = [str(cat).strip() for cat in data_categories if str(cat).strip()]
-        else:
-            data_list = [cat.strip() for cat in str(data_categories).split(',') if cat.strip()]
-        for data_type in data_list:
-            if data_type in data_specific_measures:
-                measures.extend(data_specific_measures[data_type])
+    for data_type in data_list:
+        measures.extend(DATA_SECURITY_MEASURES.get(data_type, ()))
     
     return "; ".join(measures)
+
+def classify_records_frame(records_df):
+    """Fill empty category and risk fields for a DataFrame of records, evaluating each distinct input once"""
+    import pandas as pd
+
+    if records_df.empty:
+        return records_df
+    records_df = records_df.copy()
+
+    def text_column(name):
+        if name not in records_df.columns:
+            return pd.Series('', index=records_df.index)
+        return records_df[name].fillna('').astype(str)
+
+    def is_blank(name):
+        return text_column(name).str.strip() == ''
+
+    # Classify on everything that describes the activity, not just the description field
+    classify_text = (text_column('processing_activity_name') + ' ' + text_column('description') + ' ' +
+                     text_column('processing_purpose'))
+    missing_category = is_blank('category')
+    if missing_category.any():
+        texts = classify_text[missing_category]
+        categories = {text: auto_classify_data(text) for text in texts.unique()}
+        records_df.loc[missing_category, 'category'] = texts.map(categories)
+
+    missing_risk = is_blank('risk_level')
+    if missing_risk.any():
+        risk_keys = (text_column('data_categories') + '\x1f' + text_column('special_categories'))[missing_risk]
+        assessments = {key: assess_risk(*key.split('\x1f')) for key in risk_keys.unique()}
+        records_df.loc[missing_risk, 'risk_level'] = risk_keys.map(lambda key: assessments[key]['risk_level'])
+        records_df.loc[missing_risk, 'dpia_required'] = risk_keys.map(lambda key: assessments[key]['dpia_required'] == 'Yes')
+
+    return records_df
+
+def classify_stored_records(record_ids=None, created_by=None):
+    """Classify and risk-score stored ROPA records that are missing those fields, writing back in one statement"""
+    import pandas as pd
+    from sqlalchemy import bindparam, or_
+    from models import db, ROPARecord
+
+    columns = [ROPARecord.id, ROPARecord.processing_activity_name, ROPARecord.description,
+               ROPARecord.processing_purpose, ROPARecord.data_categories, ROPARecord.special_categories,
+               ROPARecord.category, ROPARecord.risk_level, ROPARecord.dpia_required]
+    query = db.session.query(*columns).filter(or_(
+        ROPARecord.category.is_(None), ROPARecord.category == '',
+        ROPARecord.risk_level.is_(None), ROPARecord.risk_level == ''
+    ))
+    if record_ids is not None:
+        query = query.filter(ROPARecord.id.in_(list(record_ids)))
+    if created_by is not None:
+        query = query.filter(ROPARecord.created_by == created_by)
+
+    records_df = pd.DataFrame(query.all(), columns=[column.key for column in columns])
+    if records_df.empty:
+        return 0
+
+    classified = classify_records_frame(records_df)
+    rows = [
+        {'record_id': int(row['id']), 'new_category': row['category'], 'new_risk_level': row['risk_level'],
+         'new_dpia_required': None if pd.isna(row['dpia_required']) else bool(row['dpia_required'])}
+        for row in classified[['id', 'category', 'risk_level', 'dpia_required']].to_dict('records')
+    ]
+
+    records_table = ROPARecord.__table__
+    db.session.execute(
+        records_table.update()
+        .where(records_table.c.id == bindparam('record_id'))
+        .values(category=bindparam('new_category'), risk_level=bindparam('new_risk_level'),
+                dpia_required=bindparam('new_dpia_required')),
+        rows
+    )
+    db.session.commit()
+    return len(rows)
@@ -0,0 +1,120 @@
+"""
+Column mapping engine for uploaded ROPA sheets
+Compiles every header pattern into one matcher and caches resolved mappings per header layout
+"""
+
+import re
+from functools import lru_cache
+
+# Field -> header patterns. Dict order is the tie-break priority when two fields score the same.
+FIELD_PATTERNS = {
+    'processing_activity_name': ['activity name', 'processing activity', 'activity', 'name', 'process', 'title'],
+    'category': ['category', 'type'],
+    'description': ['description', 'detail'],
+    'department_function': ['department', 'function', 'responsible'],
+    'controller_name': ['controller name', 'controller', 'name'],
+    'controller_contact': ['controller contact', 'contact'],
+    'controller_address': ['controller address', 'address'],
+    'processor_name': ['processor name', 'processor'],
+    'processor_contact': ['processor contact'],
+    'processor_address': ['processor address'],
+    'processing_purpose': ['processing purpose', 'purpose', 'reason'],
+    'legal_basis': ['legal', 'basis', 'lawful'],
+    'data_categories': ['data categories', 'categories of data', 'categories of personal data', 'personal data', 'data types'],
+    'data_subjects': ['data subjects', 'categories of data subjects', 'subjects'],
+    'retention_period': ['retention', 'period', 'time'],
+    'security_measures': ['security', 'measures', 'protection'],
+    'recipients': ['recipients', 'third parties'],
+    'dpo_name': ['dpo name', 'dpo', 'protection officer'],
+    'dpo_contact': ['dpo contact'],
+    'dpo_address': ['dpo address']
+}
+
+ROPA_SHEET_KEYWORDS = [
+    'ropa', 'record', 'processing', 'activities', 'register', 'controller', 'processor',
+    'activity', 'data protection', 'gdpr', 'privacy', 'personal data'
+]
+
+ROPA_COLUMN_KEYWORDS = [
+    'processing', 'controller', 'data', 'purpose', 'legal', 'retention', 'security',
+    'activity', 'name', 'department', 'contact', 'address', 'dpo', 'subjects',
+    'categories', 'recipients', 'basis', 'measures', 'period'
+]
+
+TYPICAL_COLUMN_PATTERNS = ['name', 'purpose', 'controller', 'data', 'legal']
+
+_NON_WORD = re.compile(r'[^a-z0-9]+')
+
+
+def normalize_header(header):
+    """Lower-case a header and collapse punctuation/underscores to single spaces"""
+    return _NON_WORD.sub(' ', str(header).lower()).strip()
+
+
+def compile_matcher(patterns):
+    """Compile patterns into one whole-word alternation, longest pattern first, plurals allowed"""
+    ordered = sorted(set(patterns), key=len, reverse=True)
+    return re.compile(r'\b(' + '|'.join(re.escape(p) for p in ordered) + r')(?:e?s)?\b')
+
+
+def _build_pattern_weights():
+    """Weight each (pattern, field) pair by pattern length, split across fields sharing the pattern"""
+    owners = {}
+    for field, patterns in FIELD_PATTERNS.items():
+        for pattern in patterns:
+            owners.setdefault(pattern, []).append(field)
+    return {pattern: [(field, len(pattern) / len(fields)) for field in fields] for pattern, fields in owners.items()}
+
+
+_PATTERN_WEIGHTS = _build_pattern_weights()
+_FIELD_MATCHER = compile_matcher(_PATTERN_WEIGHTS.keys())
+_FIELD_PRIORITY = {field: idx for idx, field in enumerate(FIELD_PATTERNS)}
+_SHEET_NAME_MATCHER = compile_matcher(ROPA_SHEET_KEYWORDS)
+_COLUMN_KEYWORD_MATCHER = compile_matcher(ROPA_COLUMN_KEYWORDS)
+_TYPICAL_PATTERN_MATCHER = compile_matcher(TYPICAL_COLUMN_PATTERNS)
+
+
+def score_header(header):
+    """Score a single header against every ROPA field in one matcher pass"""
+    scores = {}
+    for match in _FIELD_MATCHER.finditer(normalize_header(header)):
+        for field, weight in _PATTERN_WEIGHTS[match.group(1)]:
+            scores[field] = scores.get(field, 0) + weight
+    return scores
+
+
+def classify_header(header):
+    """Return the best-scoring ROPA field for a header, or None if nothing matches"""
+    scores = score_header(header)
+    if not scores:
+        return None
+    return max(scores, key=lambda field: (scores[field], -_FIELD_PRIORITY[field]))
+
+
+@lru_cache(maxsize=256)
+def _resolve_header_tuple(headers):
+    return tuple((header, classify_header(header)) for header in headers)
+
+
+def resolve_column_mapping(columns):
+    """Map each sheet column to a ROPA field, cached per header tuple so repeat templates skip classification"""
+    resolved = _resolve_header_tuple(tuple(str(col) for col in columns))
+    return {header: field for header, field in resolved if field}
+
+
+def sheet_name_matches(sheet_name):
+    """True if the sheet name itself carries a ROPA keyword"""
+    return _SHEET_NAME_MATCHER.search(normalize_header(sheet_name)) is not None
+
+
+@lru_cache(maxsize=256)
+def _header_keyword_matches(headers):
+    normalized = [normalize_header(header) for header in headers]
+    column_keywords = {m.group(1) for text in normalized for m in _COLUMN_KEYWORD_MATCHER.finditer(text)}
+    typical_patterns = {m.group(1) for text in normalized for m in _TYPICAL_PATTERN_MATCHER.finditer(text)}
+    return len(column_keywords), len(typical_patterns)
+
+
+def header_keyword_matches(columns):
+    """Return (distinct ROPA column keywords, distinct typical patterns) found across the headers"""
+    return _header_keyword_matches(tuple(str(col) for col in columns))
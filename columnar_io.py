@@ -0,0 +1,516 @@
+"""
+Columnar (Parquet / Arrow IPC) export and bulk import of the register for analytics
+Tables are read from SQL in batches and written as typed, compressed record batches, so nothing goes
+through pandas or openpyxl on the way out. pyarrow is an optional dependency, imported on first use.
+"""
+
+import json
+import os
+import shutil
+import tempfile
+import zipfile
+from datetime import datetime
+
+COLUMNAR_BATCH_ROWS = 10000
+COLUMNAR_FORMATS = {'parquet': '.parquet', 'arrow': '.arrow'}
+COLUMNAR_DATASETS = ('ropa_records', 'custom_field_values', 'excel_sheets', 'audit_logs')
+# Datasets that are a single table and can be downloaded on their own
+TABULAR_DATASETS = ('ropa_records', 'custom_field_values', 'audit_logs')
+COMPRESSION = 'zstd'
+BUNDLE_MANIFEST = 'manifest.json'
+BUNDLE_VERSION = 1
+SHEETS_DIR = 'sheets'
+
+
+def require_pyarrow():
+    """Import pyarrow, or fail with an install hint when the optional dependency is missing"""
+    try:
+        import pyarrow
+    except ImportError:
+        raise Exception("Parquet/Arrow support needs the optional pyarrow package (pip install pyarrow)")
+    return pyarrow
+
+
+def available_datasets(user):
+    """Datasets a user may export; audit logs are limited to officers on plans with audit logs"""
+    from subscription import has_feature
+
+    datasets = list(COLUMNAR_DATASETS)
+    if user.role != 'Privacy Officer' or not has_feature(user, 'has_audit_logs'):
+        datasets.remove('audit_logs')
+    return datasets
+
+
+def arrow_type(sql_type):
+    """Arrow type for a SQLAlchemy column type"""
+    import pyarrow as pa
+    from sqlalchemy import Boolean, DateTime, Float, Integer, Numeric
+
+    if isinstance(sql_type, Boolean):
+        return pa.bool_()
+    if isinstance(sql_type, Integer):
+        return pa.int64()
+    if isinstance(sql_type, DateTime):
+        return pa.timestamp('us')
+    if isinstance(sql_type, (Float, Numeric)):
+        return pa.float64()
+    return pa.string()
+
+
+def open_table_writer(path, schema, export_format):
+    """Writer with write_batch/write_table/close for either file format"""
+    import pyarrow as pa
+
+    if export_format == 'arrow':
+        return pa.ipc.new_file(path, schema, options=pa.ipc.IpcWriteOptions(compression=COMPRESSION))
+    import pyarrow.parquet as pq
+    return pq.ParquetWriter(path, schema, compression=COMPRESSION)
+
+
+def iter_file_batches(path):
+    """Yield record batches from a Parquet or Arrow IPC file without loading it whole"""
+    import pyarrow as pa
+
+    if path.endswith(COLUMNAR_FORMATS['arrow']):
+        with pa.memory_map(path) as source:
+            reader = pa.ipc.open_file(source)
+            for index in range(reader.num_record_batches):
+                yield reader.get_batch(index)
+    else:
+        import pyarrow.parquet as pq
+        yield from pq.ParquetFile(path).iter_batches(batch_size=COLUMNAR_BATCH_ROWS)
+
+
+def read_file_table(path):
+    """Read a whole (small) Parquet or Arrow IPC file into a pyarrow Table, keeping its schema when it has no rows"""
+    import pyarrow as pa
+
+    if path.endswith(COLUMNAR_FORMATS['arrow']):
+        with pa.memory_map(path) as source:
+            return pa.ipc.open_file(source).read_all()
+    import pyarrow.parquet as pq
+    return pq.read_table(path)
+
+
+def write_select(stmt, path, export_format):
+    """Stream a SELECT into a typed columnar file, COLUMNAR_BATCH_ROWS rows per batch; returns the row count"""
+    import pyarrow as pa
+    from app import db
+
+    schema = pa.schema([pa.field(column.name, arrow_type(column.type)) for column in stmt.selected_columns])
+    writer = open_table_writer(path, schema, export_format)
+    rows = 0
+    result = db.session.execute(stmt.execution_options(stream_results=True, yield_per=COLUMNAR_BATCH_ROWS))
+    try:
+        for partition in result.partitions():
+            columns = zip(*partition)
+            writer.write_batch(pa.record_batch(
+                [pa.array(values, type=field.type) for values, field in zip(columns, schema)], schema=schema
+            ))
+            rows += len(partition)
+    finally:
+        result.close()
+        writer.close()
+    return rows
+
+
+def build_dataset_select(dataset, user, user_role):
+    """SELECT for one tabular dataset, scoped like the other exports (champions see their own records)"""
+    from sqlalchemy import select
+    from sqlalchemy.orm import aliased
+    from models import ROPARecord, ROPACustomData, ApprovedCustomField, AuditLog, User
+
+    if dataset == 'ropa_records':
+        creator = aliased(User)
+        reviewer = aliased(User)
+        stmt = (select(ROPARecord.__table__, creator.email.label('created_by_email'),
+                       reviewer.email.label('reviewed_by_email'))
+                .outerjoin(creator, creator.id == ROPARecord.created_by)
+                .outerjoin(reviewer, reviewer.id == ROPARecord.reviewed_by)
+                .order_by(ROPARecord.id))
+        if user_role == 'Privacy Champion':
+            stmt = stmt.where(ROPARecord.created_by == user.id)
+        return stmt
+
+    if dataset == 'custom_field_values':
+        stmt = (select(ROPACustomData.id, ROPACustomData.ropa_record_id, ROPACustomData.custom_field_id,
+                       ApprovedCustomField.field_name, ApprovedCustomField.tab_category,
+                       ApprovedCustomField.field_type, ROPACustomData.field_value,
+                       ROPACustomData.created_at, ROPACustomData.updated_at)
+                .join(ApprovedCustomField, ApprovedCustomField.id == ROPACustomData.custom_field_id)
+                .order_by(ROPACustomData.id))
+        if user_role == 'Privacy Champion':
+            stmt = (stmt.join(ROPARecord, ROPARecord.id == ROPACustomData.ropa_record_id)
+                    .where(ROPARecord.created_by == user.id))
+        return stmt
+
+    if dataset == 'audit_logs':
+        return select(AuditLog.__table__).order_by(AuditLog.id)
+
+    raise Exception(f"Unsupported columnar dataset: {dataset}")
+
+
+def sheet_table(sheet):
+    """Arrow table for one uploaded sheet, typed per column; mixed-type columns fall back to text"""
+    import pandas as pd
+    import pyarrow as pa
+
+    rows = json.loads(sheet.sheet_data or '[]')
+    columns = json.loads(sheet.columns or '[]')
+    df = pd.DataFrame(rows)
+    for column in df.columns:
+        if column not in columns:
+            columns.append(column)
+
+    arrays = []
+    for column in columns:
+        values = df[column] if column in df.columns else pd.Series([None] * len(df), dtype=object)
+        try:
+            arrays.append(pa.array(values, from_pandas=True))
+        except (pa.ArrowInvalid, pa.ArrowTypeError):
+            arrays.append(pa.array(values.map(lambda value: None if pd.isna(value) else str(value)), type=pa.string()))
+    return pa.Table.from_arrays(arrays, names=[str(column) for column in columns])
+
+
+def write_sheets(user, user_role, workdir, export_format):
+    """Write one file per uploaded sheet plus an excel_sheets index table; returns the sheet count"""
+    import pyarrow as pa
+    from models import ExcelFileData, ExcelSheetData, User
+    from app import db
+
+    extension = COLUMNAR_FORMATS[export_format]
+    query = (db.session.query(ExcelSheetData, ExcelFileData.filename, ExcelFileData.upload_timestamp,
+                              ExcelFileData.last_edited_at, User.email)
+             .join(ExcelFileData, ExcelFileData.id == ExcelSheetData.excel_file_id)
+             .outerjoin(User, User.id == ExcelFileData.uploaded_by)
+             .order_by(ExcelFileData.id, ExcelSheetData.id))
+    if user_role == 'Privacy Champion':
+        query = query.filter(ExcelFileData.uploaded_by == user.id)
+
+    index = []
+    for sheet, filename, upload_timestamp, last_edited_at, uploaded_by_email in query.yield_per(50):
+        member = f'{SHEETS_DIR}/{sheet.excel_file_id}/{sheet.id}{extension}'
+        table = sheet_table(sheet)
+        path = os.path.join(workdir, member)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        writer = open_table_writer(path, table.schema, export_format)
+        writer.write_table(table)
+        writer.close()
+        index.append({
+            'sheet_id': sheet.id, 'excel_file_id': sheet.excel_file_id, 'filename': filename,
+            'uploaded_by_email': uploaded_by_email, 'upload_timestamp': upload_timestamp,
+            'last_edited_at': last_edited_at, 'sheet_name': sheet.sheet_name,
+            'columns': sheet.columns, 'row_count': table.num_rows, 'column_count': table.num_columns,
+            'path': member,
+        })
+        db.session.expunge(sheet)
+
+    schema = pa.schema([
+        ('sheet_id', pa.int64()), ('excel_file_id', pa.int64()), ('filename', pa.string()),
+        ('uploaded_by_email', pa.string()), ('upload_timestamp', pa.timestamp('us')),
+        ('last_edited_at', pa.timestamp('us')), ('sheet_name', pa.string()), ('columns', pa.string()),
+        ('row_count', pa.int64()), ('column_count', pa.int64()), ('path', pa.string()),
+    ])
+    writer = open_table_writer(os.path.join(workdir, f'excel_sheets{extension}'), schema, export_format)
+    writer.write_table(pa.Table.from_pylist(index, schema=schema))
+    writer.close()
+    return len(index)
+
+
+def export_columnar_dataset(user_email, user_role, dataset, export_format='parquet'):
+    """Export one tabular dataset as a single Parquet or Arrow file; returns (file_path, filename)"""
+    from models import User
+
+    require_pyarrow()
+    if export_format not in COLUMNAR_FORMATS:
+        raise Exception(f"Unsupported columnar format: {export_format}")
+    user = User.query.filter_by(email=user_email).first()
+    if not user:
+        raise Exception("User not found")
+    if dataset not in TABULAR_DATASETS or dataset not in available_datasets(user):
+        raise Exception(f"Dataset not available for single-file export: {dataset}")
+
+    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+    filename = f"{dataset}_{timestamp}{COLUMNAR_FORMATS[export_format]}"
+    file_path = os.path.join(tempfile.gettempdir(), filename)
+    write_select(build_dataset_select(dataset, user, user_role), file_path, export_format)
+    return file_path, filename
+
+
+def export_columnar_bundle(user_email, user_role, export_format='parquet'):
+    """
+    Export every dataset the user may see as a ZIP of columnar files with a manifest.json;
+    returns (file_path, filename)
+    """
+    from models import User
+
+    require_pyarrow()
+    if export_format not in COLUMNAR_FORMATS:
+        raise Exception(f"Unsupported columnar format: {export_format}")
+    user = User.query.filter_by(email=user_email).first()
+    if not user:
+        raise Exception("User not found")
+
+    extension = COLUMNAR_FORMATS[export_format]
+    workdir = tempfile.mkdtemp(prefix='ropa_columnar_')
+    try:
+        manifest = {
+            'version': BUNDLE_VERSION,
+            'format': export_format,
+            'generated_at': datetime.now().isoformat(timespec='seconds'),
+            'generated_by': user_email,
+            'datasets': {},
+        }
+        for dataset in available_datasets(user):
+            member = f'{dataset}{extension}'
+            if dataset == 'excel_sheets':
+                rows = write_sheets(user, user_role, workdir, export_format)
+            else:
+                rows = write_select(build_dataset_select(dataset, user, user_role),
+                                    os.path.join(workdir, member), export_format)
+            manifest['datasets'][dataset] = {'path': member, 'rows': rows}
+
+        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        filename = f"ROPA_Analytics_{timestamp}.zip"
+        file_path = os.path.join(tempfile.gettempdir(), filename)
+        # Members are already compressed, so the archive only stores them
+        with zipfile.ZipFile(file_path, 'w', compression=zipfile.ZIP_STORED) as archive:
+            archive.writestr(BUNDLE_MANIFEST, json.dumps(manifest, indent=2))
+            for root, _, files in os.walk(workdir):
+                for name in sorted(files):
+                    path = os.path.join(root, name)
+                    archive.write(path, os.path.relpath(path, workdir).replace(os.sep, '/'))
+        return file_path, filename
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+def import_ropa_records(path, user):
+    """Insert records as new rows, mapping user references by email; returns {exported id: new id}"""
+    from models import ROPARecord, User
+    from app import db
+
+    table = ROPARecord.__table__
+    user_ids = dict(db.session.query(User.email, User.id).all())
+    # custom_values holds the source database's field ids; it is rebuilt after custom values are imported
+    skipped = {'id', 'created_by', 'reviewed_by', 'custom_values'}
+    statement = table.insert().returning(table.c.id, sort_by_parameter_order=True)
+    id_map = {}
+    now = datetime.utcnow()
+
+    for batch in iter_file_batches(path):
+        rows = batch.to_pylist()
+        if not rows:
+            continue
+        columns = [key for key in rows[0] if key in table.c and key not in skipped]
+        values = []
+        for row in rows:
+            value = {key: row[key] for key in columns}
+            value['created_by'] = user_ids.get(row.get('created_by_email'), user.id)
+            value['reviewed_by'] = user_ids.get(row.get('reviewed_by_email'))
+            value['processing_activity_name'] = value.get('processing_activity_name') or 'Imported Processing Activity'
+            value['status'] = value.get('status') or 'Draft'
+            value['created_at'] = value.get('created_at') or now
+            value['updated_at'] = value.get('updated_at') or now
+            values.append(value)
+        new_ids = db.session.execute(statement, values).scalars().all()
+        id_map.update(zip((row.get('id') for row in rows), new_ids))
+    return id_map
+
+
+def import_custom_field_values(path, id_map):
+    """
+    Upsert custom-field values, matching fields by name and tab category. Record ids are the source
+    database's, so they are translated through id_map from the records imported alongside.
+    Returns (imported, skipped, touched record ids).
+    """
+    from models import ApprovedCustomField
+    from custom_tab_automation import build_custom_data_upsert
+    from app import db
+
+    field_ids = {(field.field_name, field.tab_category): field.id for field in ApprovedCustomField.query.all()}
+    upsert = build_custom_data_upsert()
+    imported = skipped = 0
+    touched = set()
+    now = datetime.utcnow()
+
+    for batch in iter_file_batches(path):
+        values = []
+        for row in batch.to_pylist():
+            record_id = id_map.get(row.get('ropa_record_id'))
+            field_id = field_ids.get((row.get('field_name'), row.get('tab_category')))
+            if record_id is None or field_id is None:
+                skipped += 1
+                continue
+            values.append({
+                'ropa_record_id': record_id,
+                'custom_field_id': field_id,
+                'field_value': row.get('field_value'),
+                'created_at': row.get('created_at') or now,
+                'updated_at': now,
+            })
+            touched.add(record_id)
+        if values:
+            db.session.execute(upsert, values)
+            imported += len(values)
+    return imported, skipped, touched
+
+
+def import_audit_logs(path):
+    """Append audit log entries, skipping ones already present; returns the number added"""
+    from models import AuditLog
+    from app import db
+
+    table = AuditLog.__table__
+    added = 0
+    for batch in iter_file_batches(path):
+        rows = [row for row in batch.to_pylist() if row.get('event_type')]
+        timestamps = [row['timestamp'] for row in rows if row.get('timestamp')]
+        existing = set()
+        if timestamps:
+            existing = set(db.session.query(AuditLog.timestamp, AuditLog.event_type, AuditLog.user_email,
+                                            AuditLog.description)
+                           .filter(AuditLog.timestamp.between(min(timestamps), max(timestamps))).all())
+        values = [
+            {key: row.get(key) for key in ('event_type', 'user_email', 'ip_address', 'description',
+                                           'additional_data', 'timestamp')}
+            for row in rows
+            if (row.get('timestamp'), row['event_type'], row.get('user_email'), row.get('description')) not in existing
+        ]
+        if values:
+            db.session.execute(table.insert(), values)
+            added += len(values)
+    return added
+
+
+def import_sheets(workdir, index_path, user_email):
+    """
+    Recreate uploaded files and their sheets from the excel_sheets index in the caller's transaction;
+    returns (files, sheets)
+    """
+    from file_handler import store_excel_data_in_database
+
+    files = {}
+    for row in read_file_table(index_path).to_pylist():
+        files.setdefault(row['excel_file_id'], []).append(row)
+
+    file_count = sheet_count = 0
+    for sheets in files.values():
+        excel_data = {'metadata': {'source': 'columnar import', 'sheet_names': []}, 'sheets': {}}
+        for row in sheets:
+            member = member_path(workdir, row['path'])
+            if not member:
+                continue
+            table = read_file_table(member)
+            excel_data['metadata']['sheet_names'].append(row['sheet_name'])
+            excel_data['sheets'][row['sheet_name']] = {
+                'data': table.to_pylist(),
+                'columns': table.column_names,
+                'shape': (table.num_rows, table.num_columns),
+                'has_data': table.num_rows > 0,
+            }
+        if not excel_data['sheets']:
+            continue
+        excel_data['metadata']['total_sheets'] = len(excel_data['sheets'])
+        result = store_excel_data_in_database(excel_data, user_email, sheets[0]['filename'] or 'imported.xlsx',
+                                              extract_records=False, commit=False)
+        if result.startswith('Error'):
+            raise Exception(result)
+        file_count += 1
+        sheet_count += sum(1 for sheet in excel_data['sheets'].values() if sheet['has_data'])
+    return file_count, sheet_count
+
+
+def member_path(workdir, member):
+    """Path of an extracted bundle member, or None if it is missing or points outside workdir"""
+    path = os.path.normpath(os.path.join(workdir, member or ''))
+    if not path.startswith(workdir + os.sep) or not os.path.isfile(path):
+        return None
+    return path
+
+
+def find_dataset_files(workdir):
+    """dataset -> extracted file path, from the manifest if there is one, otherwise by file name"""
+    manifest_path = os.path.join(workdir, BUNDLE_MANIFEST)
+    if os.path.exists(manifest_path):
+        with open(manifest_path, encoding='utf-8') as f:
+            entries = json.load(f).get('datasets', {})
+        paths = {dataset: member_path(workdir, entry.get('path')) for dataset, entry in entries.items()
+                 if dataset in COLUMNAR_DATASETS}
+    else:
+        paths = {}
+        for name in os.listdir(workdir):
+            stem, extension = os.path.splitext(name)
+            dataset = next((dataset for dataset in COLUMNAR_DATASETS if stem.startswith(dataset)), None)
+            if dataset and extension in COLUMNAR_FORMATS.values():
+                paths[dataset] = os.path.join(workdir, name)
+    return {dataset: path for dataset, path in paths.items() if path}
+
+
+def import_columnar_file(file, user_email):
+    """
+    Bulk import an analytics bundle (ZIP) or a single dataset file produced by the columnar export.
+    Records are added as new rows; custom values, sheets and audit logs follow them. Returns a summary dict.
+    """
+    from werkzeug.utils import secure_filename
+    from models import User
+    from app import db
+
+    require_pyarrow()
+    user = User.query.filter_by(email=user_email).first()
+    if not user:
+        raise Exception("User not found")
+
+    filename = secure_filename(file.filename or '')
+    extension = os.path.splitext(filename)[1].lower()
+    if extension not in ('.zip',) + tuple(COLUMNAR_FORMATS.values()):
+        raise Exception("Upload a ZIP bundle, .parquet or .arrow file from the analytics export")
+
+    workdir = tempfile.mkdtemp(prefix='ropa_columnar_import_')
+    try:
+        upload_path = os.path.join(workdir, filename)
+        file.save(upload_path)
+        if extension == '.zip':
+            with zipfile.ZipFile(upload_path) as archive:
+                archive.extractall(workdir)  # extractall keeps members inside workdir
+            os.remove(upload_path)
+
+        paths = find_dataset_files(workdir)
+        if not paths:
+            raise Exception("No ROPA datasets found in the uploaded file")
+        # Values reference the source database's record ids, which mean nothing without those records
+        if 'custom_field_values' in paths and 'ropa_records' not in paths:
+            raise Exception("Custom field values can only be imported in a bundle together with their records")
+
+        summary = {'ropa_records': 0, 'custom_field_values': 0, 'skipped_custom_values': 0,
+                   'audit_logs': 0, 'excel_files': 0, 'excel_sheets': 0}
+        # Everything is applied in one transaction, so a failed import can be retried without duplicates
+        try:
+            id_map = {}
+            if 'ropa_records' in paths:
+                id_map = import_ropa_records(paths['ropa_records'], user)
+                summary['ropa_records'] = len(id_map)
+
+            if 'custom_field_values' in paths:
+                imported, skipped, _ = import_custom_field_values(paths['custom_field_values'], id_map)
+                summary['custom_field_values'] = imported
+                summary['skipped_custom_values'] = skipped
+
+            # Build the compact custom_values column for every imported record
+            if id_map:
+                from custom_tab_automation import refresh_custom_values
+                refresh_custom_values(id_map.values())
+
+            if 'audit_logs' in paths and 'audit_logs' in available_datasets(user):
+                summary['audit_logs'] = import_audit_logs(paths['audit_logs'])
+
+            if 'excel_sheets' in paths:
+                summary['excel_files'], summary['excel_sheets'] = import_sheets(workdir, paths['excel_sheets'],
+                                                                                user_email)
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            raise
+        return summary
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+"""
+Offline maintenance for uploaded Excel sheet storage.
+
+Removes duplicate (excel_file_id, sheet_name) rows, moves inline sheet bodies
+into shared content-addressed blobs, drops blobs no sheet refers to, and then
+installs the unique constraint that keeps duplicates from coming back.
+
+Usage:
+    python compact_excel_sheets.py --dry-run   # report only, change nothing
+    python compact_excel_sheets.py             # apply the changes
+"""
+
+import argparse
+import json
+import os
+from sqlalchemy import text
+
+os.environ.setdefault('EMAIL_OUTBOX_WORKER', '0')  # no background email delivery during maintenance
+from app import app, db
+from models import ExcelSheetData, ExcelSheetBlob, ExcelVersionHistory
+from file_handler import get_or_create_sheet_blob
+
+
+def find_duplicate_sheets():
+    """Return (duplicate_id, kept_id) pairs, keeping the earliest sheet per file and name"""
+    rows = db.session.query(
+        ExcelSheetData.id, ExcelSheetData.excel_file_id, ExcelSheetData.sheet_name
+    ).order_by(ExcelSheetData.id).all()
+
+    kept = {}
+    duplicates = []
+    for sheet_id, file_id, sheet_name in rows:
+        key = (file_id, sheet_name)
+        if key in kept:
+            duplicates.append((sheet_id, kept[key]))
+        else:
+            kept[key] = sheet_id
+    return duplicates
+
+
+def find_inline_sheet_ids(excluding_sheet_ids=()):
+    """Return IDs of sheets that still carry their own copy of the sheet body"""
+    rows = db.session.query(ExcelSheetData.id).filter(
+        ExcelSheetData._sheet_data.isnot(None),
+        ExcelSheetData.content_hash.is_(None),
+        ExcelSheetData.id.notin_(list(excluding_sheet_ids))
+    ).all()
+    return [row[0] for row in rows]
+
+
+def find_orphan_blob_hashes(excluding_sheet_ids=()):
+    """Return content hashes of blobs that no (surviving) sheet references"""
+    referenced = db.session.query(ExcelSheetData.content_hash).filter(
+        ExcelSheetData.content_hash.isnot(None),
+        ExcelSheetData.id.notin_(list(excluding_sheet_ids))
+    )
+    rows = db.session.query(ExcelSheetBlob.content_hash).filter(
+        ExcelSheetBlob.content_hash.notin_(referenced)
+    ).all()
+    return [row[0] for row in rows]
+
+
+def compact_excel_sheets(dry_run=False):
+    """Run the compaction and return a report of what was (or would be) changed"""
+    duplicates = find_duplicate_sheets()
+    report = {'duplicate_sheets': len(duplicates), 'inlined_sheets': 0, 'orphan_blobs': 0}
+
+    for duplicate_id, kept_id in duplicates:
+        print(f"Duplicate sheet {duplicate_id} -> keeping sheet {kept_id}")
+        if not dry_run:
+            # Keep version history by re-pointing it at the surviving sheet
+            ExcelVersionHistory.query.filter_by(sheet_id=duplicate_id).update({'sheet_id': kept_id})
+            ExcelSheetData.query.filter_by(id=duplicate_id).delete()
+    if not dry_run:
+        db.session.commit()
+
+    # In a dry run the duplicates still exist, so leave them out of the remaining counts
+    excluded = [duplicate_id for duplicate_id, _ in duplicates] if dry_run else []
+
+    inline_ids = find_inline_sheet_ids(excluding_sheet_ids=excluded)
+    report['inlined_sheets'] = len(inline_ids)
+    for sheet_id in ([] if dry_run else inline_ids):
+        sheet = ExcelSheetData.query.get(sheet_id)
+        sheet_info = {
+            'columns': json.loads(sheet.columns) if sheet.columns else [],
+            'shape': (sheet.row_count or 0, sheet.column_count or 0)
+        }
+        blob = get_or_create_sheet_blob(sheet_info, sheet._sheet_data)
+        sheet._sheet_data = None
+        sheet.content_hash = blob.content_hash
+        db.session.commit()
+
+    orphan_hashes = find_orphan_blob_hashes(excluding_sheet_ids=excluded)
+    report['orphan_blobs'] = len(orphan_hashes)
+    if not dry_run and orphan_hashes:
+        ExcelSheetBlob.query.filter(ExcelSheetBlob.content_hash.in_(orphan_hashes)).delete(synchronize_session=False)
+        db.session.commit()
+
+    if not dry_run:
+        db.session.execute(text(
+            "CREATE UNIQUE INDEX IF NOT EXISTS uq_excel_sheets_file_sheet "
+            "ON excel_sheets (excel_file_id, sheet_name)"
+        ))
+        db.session.commit()
+
+    return report
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Compact uploaded Excel sheet storage')
+    parser.add_argument('--dry-run', action='store_true', help='report what would change without writing')
+    args = parser.parse_args()
+
+    with app.app_context():
+        report = compact_excel_sheets(dry_run=args.dry_run)
+
+    mode = 'Dry run' if args.dry_run else 'Compaction complete'
+    print(f"{mode}: {report['duplicate_sheets']} duplicate sheet(s), "
+          f"{report['inlined_sheets']} inline sheet body(ies) to share, "
+          f"{report['orphan_blobs']} orphan blob(s)")
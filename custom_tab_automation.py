@@ -3,11 +3,22 @@ Custom Tab Automation for GDPR ROPA System
 Handles automatic integration of approved custom fields into templates and existing ROPA records
 """
 
+import copy
 import json
+import threading
 from datetime import datetime
-from models import db, CustomTab, ApprovedCustomField, ROPACustomData, ROPARecord
+from sqlalchemy import bindparam, exists, literal, select
+from models import db, CustomTab, ApprovedCustomField, ROPACustomData, ROPARecord, CacheVersion
 from audit_logger import log_audit_event
 
+# Keeps IN (...) lists under SQLite's bound-parameter limit
+PIVOT_CHUNK_SIZE = 500
+
+# Approved custom field schema, rebuilt only when the stored schema version moves
+SCHEMA_VERSION_KEY = 'custom_field_schema'
+_schema_cache = {'version': None, 'categories': None, 'fields_by_id': None}
+_schema_lock = threading.Lock()
+
 
 def approve_custom_tab(custom_tab_id, privacy_officer_id, comments=None):
     """
@@ -35,10 +46,18 @@ def approve_custom_tab(custom_tab_id, privacy_officer_id, comments=None):
         approved_field.is_required = custom_tab.is_required
         
         db.session.add(approved_field)
+        db.session.flush()  # Get the ID
+        
+        # Auto-integrate into existing ROPA records in the same transaction, so a field is never half-integrated
+        integrated = integrate_field_into_existing_records(approved_field.id)
+        bump_custom_field_schema_version()
         db.session.commit()
         
-        # Auto-integrate into existing ROPA records
-        integrate_field_into_existing_records(approved_field.id)
+        log_audit_event(
+            "CUSTOM_FIELD_INTEGRATED",
+            "system",
+            f"Integrated custom field '{approved_field.field_name}' into {integrated} existing ROPA records"
+        )
         
         # Log the approval
         log_audit_event(
@@ -47,7 +66,7 @@ def approve_custom_tab(custom_tab_id, privacy_officer_id, comments=None):
             f"Approved custom field '{custom_tab.field_name}' in category '{custom_tab.tab_category}'"
         )
         
-        return {"success": True, "message": "Custom tab approved and integrated successfully"}
+        return {"success": True, "message": f"Custom tab approved and added to {integrated} existing records"}
         
     except Exception as e:
         db.session.rollback()
@@ -56,48 +75,54 @@ def approve_custom_tab(custom_tab_id, privacy_officer_id, comments=None):
 
 def integrate_field_into_existing_records(approved_field_id):
     """
-    Automatically add approved custom field to all existing ROPA records
+    Add an empty value for the approved custom field to every existing ROPA record that lacks one.
+    Runs in the caller's transaction and is idempotent; returns the number of rows added.
     """
-    try:
-        approved_field = ApprovedCustomField.query.get(approved_field_id)
-        if not approved_field:
-            return
-        
-        # Get all existing ROPA records
-        existing_records = ROPARecord.query.all()
-        
-        for record in existing_records:
-            # Check if this field already exists for this record
-            existing_data = ROPACustomData.query.filter_by(
-                ropa_record_id=record.id,
-                custom_field_id=approved_field_id
-            ).first()
-            
-            if not existing_data:
-                # Create new custom data entry with empty value
-                custom_data = ROPACustomData()
-                custom_data.ropa_record_id = record.id
-                custom_data.custom_field_id = approved_field_id
-                custom_data.field_value = ""  # Empty value for existing records
-                db.session.add(custom_data)
-        
-        db.session.commit()
-        
-        log_audit_event(
-            "CUSTOM_FIELD_INTEGRATED",
-            "system",
-            f"Integrated custom field '{approved_field.field_name}' into {len(existing_records)} existing ROPA records"
-        )
-        
-    except Exception as e:
-        db.session.rollback()
-        print(f"Error integrating field into existing records: {str(e)}")
+    # One INSERT ... SELECT of every record that doesn't have this field yet
+    now = datetime.utcnow()
+    custom_data_table = ROPACustomData.__table__
+    already_present = exists().where(
+        (ROPACustomData.ropa_record_id == ROPARecord.id) &
+        (ROPACustomData.custom_field_id == approved_field_id)
+    )
+    missing_pairs = select(
+        ROPARecord.id,
+        literal(approved_field_id),
+        literal(''),  # Empty value for existing records
+        literal(now),
+        literal(now)
+    ).where(~already_present)
+    
+    result = db.session.execute(custom_data_table.insert().from_select(
+        ['ropa_record_id', 'custom_field_id', 'field_value', 'created_at', 'updated_at'],
+        missing_pairs
+    ))
+    return result.rowcount or 0
 
 
 def get_approved_custom_fields_by_category():
     """
     Get all approved custom fields organized by category
     """
+    return copy.deepcopy(get_custom_field_schema()['categories'])
+
+
+def get_custom_field_schema():
+    """
+    Return the cached approved-field schema, reloading it only if another request bumped the version
+    """
+    version = get_custom_field_schema_version()
+    with _schema_lock:
+        if _schema_cache['version'] != version or _schema_cache['categories'] is None:
+            categories, fields_by_id = load_custom_field_schema()
+            _schema_cache.update(version=version, categories=categories, fields_by_id=fields_by_id)
+        return dict(_schema_cache)
+
+
+def load_custom_field_schema():
+    """
+    Load approved custom fields from the database, parsing field options once
+    """
     approved_fields = ApprovedCustomField.query.all()
     
     categories = {
@@ -111,18 +136,42 @@ def get_approved_custom_fields_by_category():
         'Retention': [],
         'Security': []
     }
+    fields_by_id = {}
     
     for field in approved_fields:
+        field_info = {
+            'id': field.id,
+            'field_name': field.field_name,
+            'tab_category': field.tab_category,
+            'field_type': field.field_type,
+            'field_options': json.loads(field.field_options) if field.field_options else [],
+            'is_required': field.is_required
+        }
+        fields_by_id[field.id] = field_info
         if field.tab_category in categories:
             categories[field.tab_category].append({
-                'id': field.id,
-                'field_name': field.field_name,
-                'field_type': field.field_type,
-                'field_options': json.loads(field.field_options) if field.field_options else [],
-                'is_required': field.is_required
+                key: value for key, value in field_info.items() if key != 'tab_category'
             })
     
-    return categories
+    return categories, fields_by_id
+
+
+def get_custom_field_schema_version():
+    """
+    Cheap primary-key lookup of the current schema version (0 if never bumped)
+    """
+    version = db.session.query(CacheVersion.version).filter_by(name=SCHEMA_VERSION_KEY).scalar()
+    return version or 0
+
+
+def bump_custom_field_schema_version():
+    """
+    Increment the schema version in the current transaction so every worker reloads on its next read.
+    The row is seeded by schema migrations 7/11, so this is a single atomic UPDATE.
+    """
+    CacheVersion.query.filter_by(name=SCHEMA_VERSION_KEY).update(
+        {'version': CacheVersion.version + 1, 'updated_at': datetime.utcnow()}
+    )
 
 
 def get_custom_fields_for_sheet_type(sheet_type):
@@ -151,47 +200,127 @@ def get_custom_data_for_record(ropa_record_id):
     """
     Get all custom field data for a specific ROPA record
     """
-    custom_data = db.session.query(ROPACustomData, ApprovedCustomField).join(
-        ApprovedCustomField, ROPACustomData.custom_field_id == ApprovedCustomField.id
-    ).filter(ROPACustomData.ropa_record_id == ropa_record_id).all()
+    values = get_custom_values_for_records([ropa_record_id]).get(ropa_record_id, {})
+    if not values:
+        return {}
+    
+    fields_by_id = get_custom_field_schema()['fields_by_id']
     
     result = {}
-    for data, field in custom_data:
-        if field.tab_category not in result:
-            result[field.tab_category] = {}
+    for field_id, value in values.items():
+        field = fields_by_id.get(field_id)
+        if not field:
+            continue
+        if field['tab_category'] not in result:
+            result[field['tab_category']] = {}
         
-        result[field.tab_category][field.field_name] = {
-            'value': data.field_value,
-            'field_type': field.field_type,
-            'field_options': json.loads(field.field_options) if field.field_options else [],
-            'is_required': field.is_required
+        result[field['tab_category']][field['field_name']] = {
+            'value': value,
+            'field_type': field['field_type'],
+            'field_options': list(field['field_options']),
+            'is_required': field['is_required']
         }
     
     return result
 
 
+def get_custom_values_for_records(record_ids):
+    """
+    Pivot API: return {record_id: {custom_field_id: value}} of non-empty values for many records at once
+    """
+    record_ids = list(record_ids)
+    pivot = {}
+    unbackfilled = []
+    
+    for start in range(0, len(record_ids), PIVOT_CHUNK_SIZE):
+        chunk = record_ids[start:start + PIVOT_CHUNK_SIZE]
+        rows = db.session.query(ROPARecord.id, ROPARecord.custom_values).filter(ROPARecord.id.in_(chunk)).all()
+        for record_id, custom_values in rows:
+            if custom_values is None:
+                unbackfilled.append(record_id)
+            else:
+                pivot[record_id] = {int(field_id): value for field_id, value in json.loads(custom_values).items()}
+    
+    # Records the custom_values backfill hasn't reached yet are read from ropa_custom_data without writing
+    if unbackfilled:
+        pivot.update(build_custom_values(unbackfilled))
+    
+    return pivot
+
+
+def build_custom_values(record_ids):
+    """
+    Read {record_id: {custom_field_id: value}} of non-empty values straight from ropa_custom_data
+    """
+    record_ids = list(record_ids)
+    pivot = {record_id: {} for record_id in record_ids}
+    
+    for start in range(0, len(record_ids), PIVOT_CHUNK_SIZE):
+        chunk = record_ids[start:start + PIVOT_CHUNK_SIZE]
+        rows = db.session.query(
+            ROPACustomData.ropa_record_id, ROPACustomData.custom_field_id, ROPACustomData.field_value
+        ).filter(
+            ROPACustomData.ropa_record_id.in_(chunk),
+            ROPACustomData.field_value.isnot(None),
+            ROPACustomData.field_value != ''
+        ).all()
+        for record_id, field_id, value in rows:
+            pivot[record_id][field_id] = value
+    
+    return pivot
+
+
+def refresh_custom_values(record_ids):
+    """
+    Rebuild the compact custom_values column from ropa_custom_data for the given records.
+    The update is flushed, not committed; the caller owns the transaction.
+    """
+    pivot = build_custom_values(record_ids)
+    if pivot:
+        records_table = ROPARecord.__table__
+        db.session.execute(
+            records_table.update()
+            .where(records_table.c.id == bindparam('record_id'))
+            .values(custom_values=bindparam('values_json'), updated_at=records_table.c.updated_at),
+            [{'record_id': record_id, 'values_json': json.dumps(values)} for record_id, values in pivot.items()]
+        )
+        db.session.flush()
+    
+    return pivot
+
+
 def update_custom_data_for_record(ropa_record_id, custom_data_updates):
     """
     Update custom field data for a ROPA record
     """
     try:
-        for field_id, value in custom_data_updates.items():
-            # Find existing custom data entry
-            custom_data = ROPACustomData.query.filter_by(
-                ropa_record_id=ropa_record_id,
-                custom_field_id=field_id
-            ).first()
+        # Load every stored value for the record in one query and only write what changed
+        existing = dict(db.session.query(ROPACustomData.custom_field_id, ROPACustomData.field_value).filter(
+            ROPACustomData.ropa_record_id == ropa_record_id
+        ).all())
+        
+        now = datetime.utcnow()
+        changes = [
+            {
+                'ropa_record_id': ropa_record_id,
+                'custom_field_id': int(field_id),
+                'field_value': value,
+                'created_at': now,
+                'updated_at': now
+            }
+            for field_id, value in custom_data_updates.items()
+            if int(field_id) not in existing or existing[int(field_id)] != value
+        ]
+        
+        if changes:
+            db.session.execute(build_custom_data_upsert(), changes)
             
-            if custom_data:
-                custom_data.field_value = value
-                custom_data.updated_at = datetime.utcnow()
-            else:
-                # Create new entry if it doesn't exist
-                custom_data = ROPACustomData()
-                custom_data.ropa_record_id = ropa_record_id
-                custom_data.custom_field_id = field_id
-                custom_data.field_value = value
-                db.session.add(custom_data)
+            # Refresh the compact store from the merged values without re-reading ropa_custom_data
+            existing.update({change['custom_field_id']: change['field_value'] for change in changes})
+            non_empty = {field_id: value for field_id, value in existing.items() if value}
+            ROPARecord.query.filter_by(id=ropa_record_id).update(
+                {'custom_values': json.dumps(non_empty), 'updated_at': ROPARecord.updated_at}
+            )
         
         db.session.commit()
         return {"success": True}
@@ -201,6 +330,25 @@ def update_custom_data_for_record(ropa_record_id, custom_data_updates):
         return {"success": False, "message": str(e)}
 
 
+def build_custom_data_upsert():
+    """
+    INSERT ... ON CONFLICT (ropa_record_id, custom_field_id) DO UPDATE for the active database dialect
+    """
+    if db.engine.dialect.name == 'postgresql':
+        from sqlalchemy.dialects.postgresql import insert
+    else:
+        from sqlalchemy.dialects.sqlite import insert
+    
+    statement = insert(ROPACustomData.__table__)
+    return statement.on_conflict_do_update(
+        index_elements=['ropa_record_id', 'custom_field_id'],
+        set_={
+            'field_value': statement.excluded.field_value,
+            'updated_at': statement.excluded.updated_at
+        }
+    )
+
+
 def reject_custom_tab(custom_tab_id, privacy_officer_id, comments):
     """
     Reject a custom tab submission
@@ -215,6 +363,7 @@ def reject_custom_tab(custom_tab_id, privacy_officer_id, comments):
         custom_tab.reviewed_at = datetime.utcnow()
         custom_tab.review_comments = comments
         
+        bump_custom_field_schema_version()
         db.session.commit()
         
         log_audit_event(
@@ -1,5 +1,4 @@
 import sqlite3
-import pandas as pd
 import hashlib
 from datetime import datetime
 import os
@@ -11,13 +10,125 @@ def get_db_connection():
     os.makedirs(os.path.dirname(db_path), exist_ok=True)
     return sqlite3.connect(db_path)
 
-def init_database():
-    """Initialize database with all required tables"""
-    conn = get_db_connection()
-    cursor = conn.cursor()
+# ── Versioned schema migrations ──
+# Each migration runs once and is recorded in schema_migrations. Steps are SQL strings or
+# callables taking a cursor. Tables that exist only in models.py are created by db.create_all(),
+# which app.py runs after any migration is applied, so a new model table still needs an entry here.
+# Steps that touch such a table must skip it when it is missing (see add_column), and anything they
+# would have created on it must be installed again after create_all (see install_tombstone_triggers).
+
+def table_columns(cursor, table):
+    """Column names of a table, or None if the table doesn't exist yet"""
+    rows = cursor.execute(f"PRAGMA table_info({table})").fetchall()
+    return [row[1] for row in rows] if rows else None
+
+def add_column(table, column, col_def):
+    """Migration step: add a column unless it exists (or the table will come from db.create_all())"""
+    def step(cursor):
+        columns = table_columns(cursor, table)
+        if columns is not None and column not in columns:
+            cursor.execute(f"ALTER TABLE {table} ADD COLUMN {column} {col_def}")
+    return step
+
+def create_index(index_sql, table):
+    """Migration step: create an index once its table exists"""
+    def step(cursor):
+        if table_columns(cursor, table) is not None:
+            cursor.execute(index_sql)
+    return step
+
+def create_excel_sheet_unique_index(cursor):
+    """One row per (file, sheet name); legacy duplicates must be removed by compact_excel_sheets.py first"""
+    if table_columns(cursor, 'excel_sheets') is None:
+        return
+    try:
+        cursor.execute(
+            "CREATE UNIQUE INDEX IF NOT EXISTS uq_excel_sheets_file_sheet "
+            "ON excel_sheets (excel_file_id, sheet_name)"
+        )
+    except sqlite3.IntegrityError:
+        print("WARNING: duplicate Excel sheets found; run 'python compact_excel_sheets.py' to remove them")
+
+# Columns older databases may be missing from ropa_records
+ROPA_RECORD_COLUMNS = [
+    ('category', 'TEXT'), ('description', 'TEXT'), ('department_function', 'TEXT'),
+    ('controller_name', 'TEXT'), ('controller_contact', 'TEXT'), ('controller_address', 'TEXT'),
+    ('dpo_name', 'TEXT'), ('dpo_contact', 'TEXT'), ('dpo_address', 'TEXT'),
+    ('processor_name', 'TEXT'), ('processor_contact', 'TEXT'), ('processor_address', 'TEXT'),
+    ('representative_name', 'TEXT'), ('representative_contact', 'TEXT'), ('representative_address', 'TEXT'),
+    ('processing_purpose', 'TEXT'), ('legal_basis', 'TEXT'), ('legitimate_interests', 'TEXT'),
+    ('data_categories', 'TEXT'), ('special_categories', 'TEXT'), ('data_subjects', 'TEXT'),
+    ('recipients', 'TEXT'), ('third_country_transfers', 'TEXT'), ('safeguards', 'TEXT'),
+    ('retention_period', 'TEXT'), ('deletion_procedures', 'TEXT'), ('security_measures', 'TEXT'),
+    ('breach_likelihood', 'TEXT'), ('breach_impact', 'TEXT'), ('risk_level', 'TEXT'),
+    ('dpia_required', 'BOOLEAN DEFAULT 0'), ('dpia_outcome', 'TEXT'),
+    ('entity_type', "TEXT DEFAULT 'Controller'"), ('controller_country', 'TEXT'),
+    ('status', "TEXT DEFAULT 'Draft'"), ('created_at', 'DATETIME'), ('updated_at', 'DATETIME'),
+    ('reviewed_by', 'INTEGER'), ('reviewed_at', 'DATETIME'), ('review_comments', 'TEXT'),
+]
+
+# UTC timestamp with microseconds, matching how SQLAlchemy stores datetime.utcnow()
+TOMBSTONE_NOW = "strftime('%Y-%m-%d %H:%M:%f000', 'now')"
+
+# Deletion triggers feeding tombstones, per table. Tables that only db.create_all() makes get theirs
+# from install_tombstone_triggers() once create_all has run.
+TOMBSTONE_TRIGGERS = [
+    ('ropa_records', f"""
+        CREATE TRIGGER IF NOT EXISTS tombstone_ropa_records AFTER DELETE ON ropa_records
+        BEGIN
+            INSERT INTO tombstones (table_name, row_id, owner_id, deleted_at)
+            VALUES ('ropa_records', OLD.id, OLD.created_by, {TOMBSTONE_NOW});
+        END
+        """),
+    ('ropa_custom_data', f"""
+        CREATE TRIGGER IF NOT EXISTS tombstone_ropa_custom_data AFTER DELETE ON ropa_custom_data
+        BEGIN
+            INSERT INTO tombstones (table_name, row_id, row_key, owner_id, deleted_at)
+            VALUES ('ropa_custom_data', OLD.id, OLD.ropa_record_id || ':' || OLD.custom_field_id,
+                    (SELECT created_by FROM ropa_records WHERE id = OLD.ropa_record_id), {TOMBSTONE_NOW});
+        END
+        """),
+    ('excel_sheets', f"""
+        CREATE TRIGGER IF NOT EXISTS tombstone_excel_sheets AFTER DELETE ON excel_sheets
+        BEGIN
+            INSERT INTO tombstones (table_name, row_id, row_key, owner_id, deleted_at)
+            VALUES ('excel_sheets', OLD.id, OLD.excel_file_id || ':' || OLD.sheet_name,
+                    (SELECT uploaded_by FROM excel_files WHERE id = OLD.excel_file_id), {TOMBSTONE_NOW});
+        END
+        """),
+    ('excel_files', f"""
+        CREATE TRIGGER IF NOT EXISTS tombstone_excel_files AFTER DELETE ON excel_files
+        BEGIN
+            INSERT INTO tombstones (table_name, row_id, owner_id, deleted_at)
+            VALUES ('excel_files', OLD.id, OLD.uploaded_by, {TOMBSTONE_NOW});
+        END
+        """),
+]
+
+def install_tombstone_triggers(cursor=None):
+    """Create the tombstone triggers for every table that exists; safe to run repeatedly"""
+    conn = None
+    if cursor is None:
+        conn = get_db_connection()
+        cursor = conn.cursor()
+    try:
+        if table_columns(cursor, 'tombstones') is None:
+            return
+        for table, trigger_sql in TOMBSTONE_TRIGGERS:
+            if table_columns(cursor, table) is not None:
+                cursor.execute(trigger_sql)
+        if conn:
+            conn.commit()
+    finally:
+        if conn:
+            conn.close()
 
-    # Users table
-    cursor.execute("""
+# Counters exist from the start, so bumping one is always a plain UPDATE (custom_tab_automation.SCHEMA_VERSION_KEY)
+SEED_CACHE_VERSIONS = "INSERT OR IGNORE INTO cache_versions (name, version) VALUES ('custom_field_schema', 0)"
+
+MIGRATIONS = [
+    (1, "Core tables", [
+        """
         CREATE TABLE IF NOT EXISTS users (
             id INTEGER PRIMARY KEY AUTOINCREMENT,
             email TEXT UNIQUE NOT NULL,
@@ -30,15 +141,9 @@ def init_database():
             reset_token TEXT,
             reset_token_expires DATETIME
         )
-    """)
-
-    # Migrate: add country column if not exists
-    existing_cols = [row[1] for row in cursor.execute("PRAGMA table_info(users)").fetchall()]
-    if 'country' not in existing_cols:
-        cursor.execute("ALTER TABLE users ADD COLUMN country TEXT")
-
-    # ROPA records table
-    cursor.execute("""
+        """,
+        add_column('users', 'country', 'TEXT'),
+        """
         CREATE TABLE IF NOT EXISTS ropa_records (
             id INTEGER PRIMARY KEY AUTOINCREMENT,
             processing_activity_name TEXT NOT NULL,
@@ -74,6 +179,8 @@ def init_database():
             risk_level TEXT,
             dpia_required BOOLEAN DEFAULT 0,
             dpia_outcome TEXT,
+            entity_type TEXT DEFAULT 'Controller',
+            controller_country TEXT,
             status TEXT DEFAULT 'Draft',
             created_by INTEGER NOT NULL,
             created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
@@ -82,46 +189,9 @@ def init_database():
             reviewed_at DATETIME,
             review_comments TEXT
         )
-    """)
-
-    # Add entity_type column if it doesn't exist (migration)
-    try:
-        cursor.execute("ALTER TABLE ropa_records ADD COLUMN entity_type TEXT DEFAULT 'Controller'")
-        conn.commit()
-    except Exception:
-        pass  # Column already exists
-
-    # Add controller_country column if it doesn't exist (migration)
-    try:
-        cursor.execute("ALTER TABLE ropa_records ADD COLUMN controller_country TEXT")
-        conn.commit()
-    except Exception:
-        pass  # Column already exists
-
-    # Add special_categories column if it doesn't exist (migration)
-    try:
-        cursor.execute("ALTER TABLE ropa_records ADD COLUMN special_categories TEXT")
-        conn.commit()
-    except Exception:
-        pass  # Column already exists
-
-    # Add representative columns if they don't exist (migration)
-    for col in ['representative_name TEXT', 'representative_contact TEXT', 'representative_address TEXT']:
-        try:
-            cursor.execute(f"ALTER TABLE ropa_records ADD COLUMN {col}")
-            conn.commit()
-        except Exception:
-            pass  # Column already exists
-
-    # Add dpia_outcome column if it doesn't exist (migration)
-    try:
-        cursor.execute("ALTER TABLE ropa_records ADD COLUMN dpia_outcome TEXT")
-        conn.commit()
-    except Exception:
-        pass  # Column already exists
-
-    # Audit logs table
-    cursor.execute("""
+        """,
+    ] + [add_column('ropa_records', column, col_def) for column, col_def in ROPA_RECORD_COLUMNS] + [
+        """
         CREATE TABLE IF NOT EXISTS audit_logs (
             id INTEGER PRIMARY KEY AUTOINCREMENT,
             timestamp DATETIME DEFAULT CURRENT_TIMESTAMP,
@@ -131,10 +201,8 @@ def init_database():
             description TEXT NOT NULL,
             additional_data TEXT
         )
-    """)
-
-    # Custom tabs table
-    cursor.execute("""
+        """,
+        """
         CREATE TABLE IF NOT EXISTS custom_tabs (
             id INTEGER PRIMARY KEY AUTOINCREMENT,
             tab_category TEXT NOT NULL,
@@ -153,10 +221,8 @@ def init_database():
             FOREIGN KEY (created_by) REFERENCES users (id),
             FOREIGN KEY (reviewed_by) REFERENCES users (id)
         )
-    """)
-
-    # Approved custom fields table
-    cursor.execute("""
+        """,
+        """
         CREATE TABLE IF NOT EXISTS approved_custom_fields (
             id INTEGER PRIMARY KEY AUTOINCREMENT,
             custom_tab_id INTEGER NOT NULL,
@@ -168,10 +234,8 @@ def init_database():
             approved_at DATETIME DEFAULT CURRENT_TIMESTAMP,
             FOREIGN KEY (custom_tab_id) REFERENCES custom_tabs (id)
         )
-    """)
-
-    # ROPA custom data table
-    cursor.execute("""
+        """,
+        """
         CREATE TABLE IF NOT EXISTS ropa_custom_data (
             id INTEGER PRIMARY KEY AUTOINCREMENT,
             ropa_record_id INTEGER NOT NULL,
@@ -182,30 +246,160 @@ def init_database():
             FOREIGN KEY (ropa_record_id) REFERENCES ropa_records (id),
             FOREIGN KEY (custom_field_id) REFERENCES approved_custom_fields (id)
         )
-    """)
+        """,
+    ]),
+    (2, "Subscription columns on users", [
+        add_column('users', 'subscription_tier', "TEXT NOT NULL DEFAULT 'trial'"),
+        add_column('users', 'trial_start_date', 'DATETIME'),
+        add_column('users', 'subscription_start_date', 'DATETIME'),
+        add_column('users', 'subscription_end_date', 'DATETIME'),
+        add_column('users', 'upgrade_email_sent', 'BOOLEAN DEFAULT 0'),
+    ]),
+    (3, "Excel edit tracking", [
+        add_column('excel_files', 'last_edited_at', 'DATETIME'),
+        add_column('excel_files', 'last_edited_by', 'INTEGER'),
+    ]),
+    (4, "Content-hash de-duplication of uploads", [
+        add_column('excel_files', 'content_hash', 'TEXT'),
+        add_column('excel_sheets', 'content_hash', 'TEXT'),
+        create_index("CREATE INDEX IF NOT EXISTS ix_excel_files_content_hash ON excel_files (content_hash)", 'excel_files'),
+        create_index("CREATE INDEX IF NOT EXISTS ix_excel_sheets_content_hash ON excel_sheets (content_hash)", 'excel_sheets'),
+        create_excel_sheet_unique_index,
+    ]),
+    (5, "Compact custom value store", [
+        add_column('ropa_records', 'custom_values', 'TEXT'),
+    ]),
+    (6, "Unique custom value per record and field", [
+        # Legacy duplicates keep the earliest row, which is the one updates were written to
+        """
+        DELETE FROM ropa_custom_data WHERE id NOT IN (
+            SELECT MIN(id) FROM ropa_custom_data GROUP BY ropa_record_id, custom_field_id
+        )
+        """,
+        "CREATE UNIQUE INDEX IF NOT EXISTS uq_ropa_custom_data_record_field "
+        "ON ropa_custom_data (ropa_record_id, custom_field_id)",
+    ]),
+    (7, "Cache version counters; drop the old schema stamp", [
+        "DROP TABLE IF EXISTS schema_stamp",
+        """
+        CREATE TABLE IF NOT EXISTS cache_versions (
+            name VARCHAR(100) NOT NULL PRIMARY KEY,
+            version INTEGER NOT NULL,
+            updated_at DATETIME
+        )
+        """,
+        SEED_CACHE_VERSIONS,
+    ]),
+    (8, "Deletion tombstones for delta exports", [
+        """
+        CREATE TABLE IF NOT EXISTS tombstones (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            table_name VARCHAR(64) NOT NULL,
+            row_id INTEGER NOT NULL,
+            row_key VARCHAR(64),
+            owner_id INTEGER,
+            deleted_at DATETIME NOT NULL
+        )
+        """,
+        "CREATE INDEX IF NOT EXISTS ix_tombstones_deleted_at ON tombstones (deleted_at)",
+        install_tombstone_triggers,
+    ]),
+    (9, "Outgoing email outbox", [
+        """
+        CREATE TABLE IF NOT EXISTS email_outbox (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            to_email VARCHAR(120) NOT NULL,
+            to_name VARCHAR(200),
+            subject VARCHAR(500) NOT NULL,
+            message TEXT NOT NULL,
+            status VARCHAR(20) NOT NULL DEFAULT 'pending',
+            attempts INTEGER NOT NULL DEFAULT 0,
+            next_attempt_at DATETIME NOT NULL,
+            last_error TEXT,
+            created_at DATETIME,
+            sent_at DATETIME
+        )
+        """,
+        "CREATE INDEX IF NOT EXISTS ix_email_outbox_due ON email_outbox (status, next_attempt_at)",
+    ]),
+    (10, "Backfill the compact custom value store", [
+        # Keys come out as strings, the same as json.dumps writes them
+        """
+        UPDATE ropa_records SET custom_values = COALESCE((
+            SELECT json_group_object(custom_field_id, field_value) FROM ropa_custom_data
+            WHERE ropa_custom_data.ropa_record_id = ropa_records.id
+              AND field_value IS NOT NULL AND field_value != ''
+        ), '{}')
+        WHERE custom_values IS NULL
+        """,
+    ]),
+    (11, "Seed cache version counters for databases already past migration 7", [
+        SEED_CACHE_VERSIONS,
+    ]),
+]
+
+LATEST_SCHEMA_VERSION = MIGRATIONS[-1][0]
+
+def get_schema_version(conn=None):
+    """Highest applied migration version, or 0 for a database that predates the runner"""
+    own_conn = conn is None
+    conn = conn or get_db_connection()
+    try:
+        row = conn.execute("SELECT MAX(version) FROM schema_migrations").fetchone()
+        return row[0] or 0
+    except sqlite3.OperationalError:
+        return 0  # No schema_migrations table yet
+    finally:
+        if own_conn:
+            conn.close()
 
+def schema_is_current():
+    """Single metadata read used at startup to decide whether migrations need to run"""
+    return get_schema_version() >= LATEST_SCHEMA_VERSION
+
+def run_migrations():
+    """Apply pending migrations in order, recording each one; returns the versions applied"""
+    conn = get_db_connection()
+    cursor = conn.cursor()
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS schema_migrations (
+            version INTEGER PRIMARY KEY,
+            description TEXT NOT NULL,
+            applied_at DATETIME DEFAULT CURRENT_TIMESTAMP
+        )
+    """)
     conn.commit()
 
-    # ── Schema migrations: safely add new columns if they don't exist ──
-    migrations = [
-        ("users", "subscription_tier", "TEXT NOT NULL DEFAULT 'trial'"),
-        ("users", "trial_start_date", "DATETIME"),
-        ("users", "subscription_start_date", "DATETIME"),
-        ("users", "subscription_end_date", "DATETIME"),
-        ("users", "upgrade_email_sent", "BOOLEAN DEFAULT 0"),
-        ("excel_files", "last_edited_at", "DATETIME"),
-        ("excel_files", "last_edited_by", "INTEGER"),
-    ]
-    for table, column, col_def in migrations:
-        try:
-            cursor.execute(f"ALTER TABLE {table} ADD COLUMN {column} {col_def}")
+    current = get_schema_version(conn)
+    applied = []
+    try:
+        for version, description, steps in MIGRATIONS:
+            if version <= current:
+                continue
+            for step in steps:
+                if callable(step):
+                    step(cursor)
+                else:
+                    cursor.execute(step)
+            cursor.execute(
+                "INSERT INTO schema_migrations (version, description, applied_at) VALUES (?, ?, ?)",
+                (version, description, datetime.utcnow().isoformat())
+            )
             conn.commit()
-        except Exception:
-            pass  # Column already exists
+            applied.append(version)
+            print(f"Applied schema migration {version}: {description}")
+    except Exception as e:
+        conn.rollback()
+        print(f"Schema migration failed at version {version}: {str(e)}")
+        raise
+    finally:
+        conn.close()
 
-    # Database initialization complete - users must register to access the system
+    return applied
 
-    conn.close()
+def init_database():
+    """Initialize database with all required tables"""
+    return run_migrations()
 
 def authenticate_user(email, password):
     """Authenticate user login"""
@@ -255,6 +449,7 @@ def create_user(email, password, role, department):
 
 def get_all_users():
     """Get all users for admin management"""
+    import pandas as pd
     conn = get_db_connection()
     df = pd.read_sql_query("""
         SELECT email, role, department, created_at, last_login 
@@ -307,8 +502,8 @@ def save_ropa_record(record_data, user_email):
             retention_period, deletion_procedures, security_measures,
             breach_likelihood, breach_impact, risk_level,
             dpia_required, dpia_outcome,
-            status, created_by, created_at, updated_at
-        ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, CURRENT_TIMESTAMP, CURRENT_TIMESTAMP)
+            status, created_by, custom_values, created_at, updated_at
+        ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, '{}', CURRENT_TIMESTAMP, CURRENT_TIMESTAMP)
         """
 
         values = (
@@ -391,6 +586,7 @@ def get_ropa_records(user_email=None, role=None, status=None):
 
     query += " ORDER BY created_at DESC"
 
+    import pandas as pd
     df = pd.read_sql_query(query, engine, params=params)
     return df
 
@@ -0,0 +1,235 @@
+#!/usr/bin/env python3
+"""
+Persistent outbox for outgoing email.
+
+Request handlers queue a row in email_outbox and return immediately; a
+background thread per process claims due rows and delivers them through
+email_utils.deliver_email, retrying failures with exponential backoff and
+dead-lettering a message once it runs out of attempts.
+
+Usage:
+    python email_outbox.py --status         # counts per status and recent dead letters
+    python email_outbox.py --drain          # deliver everything that is due now
+    python email_outbox.py --requeue-dead   # give dead-lettered messages a fresh set of attempts
+"""
+
+import argparse
+import logging
+import os
+import random
+import threading
+from datetime import datetime, timedelta
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+OUTBOX_MAX_ATTEMPTS = int(os.environ.get('EMAIL_OUTBOX_MAX_ATTEMPTS', 6))
+OUTBOX_BACKOFF_BASE_SECONDS = 30
+OUTBOX_BACKOFF_MAX_SECONDS = 3600
+OUTBOX_POLL_SECONDS = float(os.environ.get('EMAIL_OUTBOX_POLL_SECONDS', 15))
+OUTBOX_BATCH_SIZE = 20
+# A claimed message becomes due again after this long, so a worker that dies mid-send doesn't lose it
+OUTBOX_CLAIM_SECONDS = 300
+
+_worker = None
+_worker_pid = None
+_worker_lock = threading.Lock()
+_wake_event = threading.Event()
+
+
+def backoff_seconds(attempts):
+    """Delay before the next try after `attempts` failures: doubling from the base, capped, with 10% jitter"""
+    delay = min(OUTBOX_BACKOFF_BASE_SECONDS * 2 ** max(attempts - 1, 0), OUTBOX_BACKOFF_MAX_SECONDS)
+    return delay * random.uniform(1.0, 1.1)
+
+
+def outbox_worker_enabled():
+    """False when EMAIL_OUTBOX_WORKER=0, which maintenance scripts and the CLI set to keep delivery off"""
+    return os.environ.get('EMAIL_OUTBOX_WORKER', '1') != '0'
+
+
+def enqueue_email(to_email, to_name, subject, message):
+    """Add an email to the outbox in the caller's transaction; the worker is woken when the caller commits"""
+    from flask import current_app
+    from models import EmailOutbox
+    from app import db
+
+    now = datetime.utcnow()
+    db.session.add(EmailOutbox(
+        to_email=to_email, to_name=to_name, subject=subject, message=message,
+        status='pending', attempts=0, next_attempt_at=now, created_at=now
+    ))
+    db.session.info['outbox_pending'] = True
+    if outbox_worker_enabled():
+        ensure_outbox_worker(current_app._get_current_object())
+
+
+@event.listens_for(Session, 'after_commit')
+def wake_worker_after_commit(session):
+    """Wake this process's worker once a transaction that queued email has committed"""
+    if session.info.pop('outbox_pending', False):
+        _wake_event.set()
+
+
+def claim_message(message_id, now):
+    """Take a due message for this worker; False if another worker got it first"""
+    from models import EmailOutbox
+    from app import db
+
+    claimed = db.session.query(EmailOutbox).filter(
+        EmailOutbox.id == message_id,
+        EmailOutbox.status == 'pending',
+        EmailOutbox.next_attempt_at <= now
+    ).update({
+        'attempts': EmailOutbox.attempts + 1,
+        'next_attempt_at': now + timedelta(seconds=OUTBOX_CLAIM_SECONDS)
+    }, synchronize_session=False)
+    db.session.commit()
+    return claimed == 1
+
+
+def record_result(message_id, attempts, delivered, error, retryable):
+    """Mark a claimed message sent, schedule its retry, or dead-letter it"""
+    from models import EmailOutbox
+    from app import db
+
+    now = datetime.utcnow()
+    if delivered:
+        values = {'status': 'sent', 'sent_at': now, 'last_error': None}
+    elif not retryable or attempts >= OUTBOX_MAX_ATTEMPTS:
+        values = {'status': 'dead', 'last_error': error}
+        logging.warning(f"Email {message_id} dead-lettered after {attempts} attempt(s): {error}")
+    else:
+        values = {'next_attempt_at': now + timedelta(seconds=backoff_seconds(attempts)), 'last_error': error}
+    db.session.query(EmailOutbox).filter(EmailOutbox.id == message_id).update(values, synchronize_session=False)
+    db.session.commit()
+
+
+def drain_outbox(limit=None):
+    """Deliver due messages until none are left (or `limit` have been tried); returns (sent, failed)"""
+    from models import EmailOutbox
+    from email_utils import deliver_email
+    from app import db
+
+    sent = failed = 0
+    while limit is None or sent + failed < limit:
+        now = datetime.utcnow()
+        due = db.session.query(EmailOutbox.id).filter(
+            EmailOutbox.status == 'pending',
+            EmailOutbox.next_attempt_at <= now
+        ).order_by(EmailOutbox.next_attempt_at, EmailOutbox.id).limit(OUTBOX_BATCH_SIZE).all()
+        db.session.commit()  # end the read transaction before the slow network calls
+        if not due:
+            break
+
+        for (message_id,) in due:
+            if limit is not None and sent + failed >= limit:
+                break
+            if not claim_message(message_id, now):
+                continue
+            message = db.session.get(EmailOutbox, message_id)
+            to_email, to_name, subject, body, attempts = (message.to_email, message.to_name, message.subject,
+                                                          message.message, message.attempts)
+            db.session.commit()
+            try:
+                delivered, error, retryable = deliver_email(to_email, to_name, subject, body)
+            except Exception as e:
+                delivered, error, retryable = False, str(e), True
+            record_result(message_id, attempts, delivered, error, retryable)
+            if delivered:
+                sent += 1
+            else:
+                failed += 1
+    return sent, failed
+
+
+def next_due_in(default):
+    """Seconds until the earliest pending message is due, capped at `default`"""
+    from sqlalchemy import func
+    from models import EmailOutbox
+    from app import db
+
+    earliest = db.session.query(func.min(EmailOutbox.next_attempt_at)).filter(
+        EmailOutbox.status == 'pending'
+    ).scalar()
+    db.session.commit()
+    if earliest is None:
+        return default
+    return max(0.0, min(default, (earliest - datetime.utcnow()).total_seconds()))
+
+
+def run_outbox_worker(app):
+    """Worker loop: drain, then sleep until woken by a commit that queued email or the next message falls due"""
+    from app import db
+
+    while True:
+        wait = OUTBOX_POLL_SECONDS
+        with app.app_context():
+            try:
+                drain_outbox()
+                wait = next_due_in(OUTBOX_POLL_SECONDS)
+            except Exception as e:
+                db.session.rollback()
+                logging.error(f"Email outbox worker error: {str(e)}")
+            finally:
+                db.session.remove()
+        _wake_event.wait(wait)
+        _wake_event.clear()
+
+
+def ensure_outbox_worker(app):
+    """Start this process's outbox thread unless it is already running (also after a fork)"""
+    global _worker, _worker_pid
+    with _worker_lock:
+        if _worker is not None and _worker.is_alive() and _worker_pid == os.getpid():
+            return _worker
+        _worker = threading.Thread(target=run_outbox_worker, args=(app,), name='email-outbox', daemon=True)
+        _worker_pid = os.getpid()
+        _worker.start()
+        return _worker
+
+
+def outbox_status():
+    """{status: count} for the whole outbox"""
+    from sqlalchemy import func
+    from models import EmailOutbox
+    from app import db
+
+    return dict(db.session.query(EmailOutbox.status, func.count()).group_by(EmailOutbox.status).all())
+
+
+def requeue_dead():
+    """Move dead letters back to pending with a fresh set of attempts; returns how many"""
+    from models import EmailOutbox
+    from app import db
+
+    count = db.session.query(EmailOutbox).filter(EmailOutbox.status == 'dead').update({
+        'status': 'pending', 'attempts': 0, 'next_attempt_at': datetime.utcnow()
+    }, synchronize_session=False)
+    db.session.commit()
+    return count
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Inspect and drain the outgoing email outbox')
+    group = parser.add_mutually_exclusive_group()
+    group.add_argument('--status', action='store_true', help='show message counts per status (default)')
+    group.add_argument('--drain', action='store_true', help='deliver every message that is due now')
+    group.add_argument('--requeue-dead', action='store_true', help='retry dead-lettered messages')
+    args = parser.parse_args()
+
+    os.environ.setdefault('EMAIL_OUTBOX_WORKER', '0')
+    from app import app
+    from models import EmailOutbox
+
+    with app.app_context():
+        if args.drain:
+            sent, failed = drain_outbox()
+            print(f"Sent {sent} email(s); {failed} failed and were rescheduled or dead-lettered")
+        elif args.requeue_dead:
+            print(f"Requeued {requeue_dead()} dead-lettered email(s)")
+        else:
+            for status, count in sorted(outbox_status().items()):
+                print(f"  {status:<8} {count}")
+            for message in EmailOutbox.query.filter_by(status='dead').order_by(EmailOutbox.id.desc()).limit(10):
+                print(f"  dead #{message.id} to {message.to_email} after {message.attempts} attempt(s): {message.last_error}")
@@ -1,61 +1,130 @@
 import os
+import threading
 import requests
 import logging
+from requests.adapters import HTTPAdapter
 
 EMAILJS_API_URL = 'https://api.emailjs.com/api/v1.0/email/send'
+EMAILJS_TIMEOUT_SECONDS = 10
+
+# Delivery backend: 'emailjs' posts to EmailJS, 'stub' records messages in STUB_SENT for tests and local runs
+EMAIL_TRANSPORT_ENV = 'EMAIL_TRANSPORT'
+STUB_SENT = []
+
+_http_session = None
+_http_session_lock = threading.Lock()
 
 
 def _get_credentials():
     service_id = os.environ.get('EMAILJS_SERVICE_ID')
     template_id = os.environ.get('EMAILJS_TEMPLATE_ID')
     public_key = os.environ.get('EMAILJS_PUBLIC_KEY')
+    return service_id, template_id, public_key
 
-    print("DEBUG EMAILJS INSIDE FUNCTION:",
-          service_id, template_id, public_key)
 
-    return service_id, template_id, public_key
+def get_http_session():
+    """Process-wide requests.Session, so deliveries reuse one keep-alive connection to EmailJS"""
+    global _http_session
+    with _http_session_lock:
+        if _http_session is None:
+            session = requests.Session()
+            session.mount('https://', HTTPAdapter(pool_connections=1, pool_maxsize=4))
+            session.headers.update({"Content-Type": "application/json"})
+            _http_session = session
+        return _http_session
 
 
-def send_email(to_email, to_name, subject, message, reply_to=None):
+def build_emailjs_payload(to_email, to_name, subject, message):
     service_id, template_id, public_key = _get_credentials()
 
-    if not all([service_id, template_id, public_key]):
-        logging.warning("EmailJS credentials not configured. Email not sent.")
-        return False
-
     # Split name into first/last to match the EmailJS template variables
     name_parts = (to_name or '').strip().split(' ', 1)
     fname = name_parts[0] if name_parts else ''
-    lname = name_parts[1] if len(name_parts) > 1 else ''
 
     # Combine subject + body since template has no dedicated subject field
     full_message = f"Subject: {subject}\n\n{message}"
 
-    try:
-        payload = {
-            "service_id": service_id,
-            "template_id": template_id,
-            "user_id": public_key,
-            "template_params": {
-                "FName": fname,
-                "email": to_email,
-                "message": full_message
-            }
+    return {
+        "service_id": service_id,
+        "template_id": template_id,
+        "user_id": public_key,
+        "template_params": {
+            "FName": fname,
+            "email": to_email,
+            "message": full_message
         }
-        response = requests.post(
+    }
+
+
+def emailjs_transport(to_email, to_name, subject, message):
+    """
+    POST one email to EmailJS over the shared session.
+    Returns (delivered, error, retryable); 4xx other than 429 will not succeed on retry.
+    """
+    if not check_emailjs_configured():
+        return False, "EmailJS credentials not configured", False
+
+    try:
+        response = get_http_session().post(
             EMAILJS_API_URL,
-            json=payload,
-            headers={"Content-Type": "application/json"},
-            timeout=10
+            json=build_emailjs_payload(to_email, to_name, subject, message),
+            timeout=EMAILJS_TIMEOUT_SECONDS
         )
-        if response.status_code == 200:
-            logging.info(f"Email sent successfully to {to_email}")
-            return True
-        else:
-            logging.error(f"EmailJS API error: {response.status_code} - {response.text}")
-            return False
+    except requests.RequestException as e:
+        return False, f"{type(e).__name__}: {str(e)}", True
+
+    if response.status_code == 200:
+        return True, None, False
+    retryable = response.status_code == 429 or response.status_code >= 500
+    return False, f"EmailJS API error: {response.status_code} - {response.text[:500]}", retryable
+
+
+def stub_transport(to_email, to_name, subject, message):
+    """Record the email instead of sending it"""
+    STUB_SENT.append({'to_email': to_email, 'to_name': to_name, 'subject': subject, 'message': message})
+    return True, None, False
+
+
+TRANSPORTS = {
+    'emailjs': emailjs_transport,
+    'stub': stub_transport,
+}
+
+
+def get_transport():
+    name = os.environ.get(EMAIL_TRANSPORT_ENV, 'emailjs')
+    if name not in TRANSPORTS:
+        raise Exception(f"Unknown email transport: {name}")
+    return TRANSPORTS[name]
+
+
+def deliver_email(to_email, to_name, subject, message):
+    """Send one email right now through the configured transport; returns (delivered, error, retryable)"""
+    delivered, error, retryable = get_transport()(to_email, to_name, subject, message)
+    if delivered:
+        logging.info(f"Email sent successfully to {to_email}")
+    else:
+        logging.error(f"Error sending email to {to_email}: {error}")
+    return delivered, error, retryable
+
+
+def send_email(to_email, to_name, subject, message, reply_to=None):
+    """
+    Queue an email in the outbox; the background worker delivers it with retries once the caller commits.
+    Returns True once queued. Call it after committing other work: a failure rolls the session back.
+    """
+    from email_outbox import enqueue_email
+    from app import db
+    # Without credentials nothing could deliver the message, so don't queue it
+    if os.environ.get(EMAIL_TRANSPORT_ENV, 'emailjs') == 'emailjs' and not check_emailjs_configured():
+        logging.warning(f"EmailJS credentials not configured. Email to {to_email} not sent.")
+        return False
+    try:
+        enqueue_email(to_email, to_name, subject, message)
+        return True
     except Exception as e:
-        logging.error(f"Error sending email to {to_email}: {str(e)}")
+        db.session.rollback()
+        logging.error(f"Error queueing email to {to_email}: {str(e)}")
         return False
 
 
@@ -0,0 +1,128 @@
+"""
+Named styles for generated workbooks
+Styles are registered once per workbook and cells point at them by name, so formatting a sheet
+no longer builds Font/PatternFill/Alignment/Border objects for every cell
+"""
+
+from openpyxl.formatting.rule import FormulaRule
+from openpyxl.styles import Alignment, Border, Font, NamedStyle, PatternFill, Side
+from openpyxl.utils import get_column_letter
+
+# Rows read when estimating column widths, spread evenly over the sheet
+WIDTH_SAMPLE_ROWS = 200
+
+# Header colour per kind of exported sheet
+EXPORT_HEADER_COLORS = {
+    'original': '1F4E79',  # Deep royal blue for original sheets
+    'ropa': '548235',  # Deep green for ROPA sheets
+    'default': 'C65911',  # Deep orange
+}
+
+EXPORT_DATA_STYLE = 'ropa_export_data'
+EXPORT_STRIPE_COLOR = 'ADD8E6'
+REGISTER_SECTION_STYLE = 'ropa_register_section'
+REGISTER_HEADER_STYLE = 'ropa_register_header'
+REGISTER_CELL_STYLE = 'ropa_register_cell'
+REGISTER_STRIPE_COLOR = 'F2F2F2'
+
+
+def solid_fill(color):
+    return PatternFill(start_color=color, end_color=color, fill_type='solid')
+
+
+def box_border(style='thin', color=None):
+    side = Side(style=style, color=color)
+    return Border(left=side, right=side, top=side, bottom=side)
+
+
+def export_header_style_name(kind):
+    return f'ropa_export_header_{kind}'
+
+
+def build_named_styles():
+    """Fresh NamedStyle objects; a NamedStyle binds to one workbook, so each workbook gets its own"""
+    styles = [
+        NamedStyle(
+            name=export_header_style_name(kind),
+            font=Font(bold=True, color='FFFFFF', size=12, name='Calibri'),
+            fill=solid_fill(color),
+            alignment=Alignment(horizontal='center', vertical='center', wrap_text=True),
+            border=box_border('medium', 'FFFFFF')
+        )
+        for kind, color in EXPORT_HEADER_COLORS.items()
+    ]
+    styles.extend([
+        NamedStyle(
+            name=EXPORT_DATA_STYLE,
+            font=Font(name='Calibri', size=11, color='2C2C2C'),
+            fill=solid_fill('FFFFFF'),
+            alignment=Alignment(horizontal='left', vertical='top', wrap_text=True),
+            border=box_border('thin', 'CCCCCC')
+        ),
+        NamedStyle(
+            name=REGISTER_SECTION_STYLE,
+            font=Font(bold=True, color='FFFFFF', size=11),
+            fill=solid_fill('366092'),
+            alignment=Alignment(horizontal='center', vertical='center'),
+            border=box_border()
+        ),
+        NamedStyle(
+            name=REGISTER_HEADER_STYLE,
+            font=Font(bold=True, color='FFFFFF', size=9),
+            fill=solid_fill('4472C4'),
+            alignment=Alignment(horizontal='center', vertical='center', wrap_text=True),
+            border=box_border()
+        ),
+        NamedStyle(
+            name=REGISTER_CELL_STYLE,
+            font=Font(name='Calibri', size=10),
+            fill=solid_fill('FFFFFF'),
+            alignment=Alignment(wrap_text=True, vertical='top'),
+            border=box_border()
+        ),
+    ])
+    return styles
+
+
+def register_named_styles(workbook):
+    """Add the shared named styles to a workbook unless they are already there"""
+    existing = set(workbook.named_styles)
+    for style in build_named_styles():
+        if style.name not in existing:
+            workbook.add_named_style(style)
+
+
+def style_cells(worksheet, style_name, min_row, max_row, min_col, max_col):
+    """Point every cell in a block at one registered style"""
+    if max_row < min_row or max_col < min_col:
+        return
+    for row in worksheet.iter_rows(min_row=min_row, max_row=max_row, min_col=min_col, max_col=max_col):
+        for cell in row:
+            cell.style = style_name
+
+
+def add_zebra_stripes(worksheet, min_row, max_row, max_col, color):
+    """Shade even rows of a block with one conditional format instead of a fill per cell"""
+    if max_row < min_row or max_col < 1:
+        return
+    cell_range = f'A{min_row}:{get_column_letter(max_col)}{max_row}'
+    worksheet.conditional_formatting.add(cell_range, FormulaRule(formula=['MOD(ROW(),2)=0'], fill=solid_fill(color)))
+
+
+def set_default_row_height(worksheet, height):
+    """Row height for every row without its own, set once on the sheet"""
+    worksheet.sheet_format.defaultRowHeight = height
+    worksheet.sheet_format.customHeight = True
+
+
+def sample_column_lengths(df, sample_rows=WIDTH_SAMPLE_ROWS):
+    """Longest text length per column over an evenly spaced sample of at most `sample_rows` rows"""
+    if df.empty:
+        return [0] * len(df.columns)
+    step = max(1, len(df) // sample_rows)
+    sample = df.iloc[::step].head(sample_rows)
+    lengths = []
+    for position in range(len(sample.columns)):
+        values = sample.iloc[:, position].dropna()
+        lengths.append(int(values.astype(str).str.len().max()) if len(values) else 0)
+    return lengths
@@ -0,0 +1,138 @@
+"""
+On-disk cache for generated export files
+Artifacts are keyed by (user scope, format, filters, data-version watermark) and evicted least-recently-used
+"""
+
+import glob
+import hashlib
+import json
+import os
+import shutil
+import threading
+
+EXPORT_CACHE_DIR = os.environ.get(
+    'EXPORT_CACHE_DIR',
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), 'instance', 'export_cache')
+)
+EXPORT_CACHE_MAX_BYTES = int(os.environ.get('EXPORT_CACHE_MAX_MB', 256)) * 1024 * 1024
+EXPORT_CACHE_MAX_FILES = int(os.environ.get('EXPORT_CACHE_MAX_FILES', 64))
+
+# One round trip that changes whenever anything an export reads is inserted, updated or deleted
+WATERMARK_SQL = """
+SELECT
+    (SELECT COUNT(*) || ':' || COALESCE(MAX(id), 0) || ':' || COALESCE(MAX(updated_at), '') FROM ropa_records),
+    (SELECT COUNT(*) || ':' || COALESCE(MAX(updated_at), '') FROM ropa_custom_data),
+    (SELECT COALESCE(SUM(version), 0) FROM cache_versions),
+    (SELECT COUNT(*) || ':' || COALESCE(MAX(id), 0) || ':' || COALESCE(MAX(last_edited_at), '') FROM excel_files),
+    (SELECT COUNT(*) || ':' || COALESCE(MAX(id), 0) FROM excel_sheets),
+    (SELECT COUNT(*) || ':' || COALESCE(MAX(id), 0) FROM users)
+"""
+
+_build_locks = {}
+_build_locks_guard = threading.Lock()
+
+
+def get_data_watermark():
+    """Return a string that changes whenever exported data changes"""
+    from sqlalchemy import text
+    from app import db
+
+    row = db.session.execute(text(WATERMARK_SQL)).fetchone()
+    return '|'.join(str(value) for value in row)
+
+
+def export_scope(user_email, user_role):
+    """Officers all see the same organisation-wide export; everyone else gets their own"""
+    return 'all' if user_role == 'Privacy Officer' else f'user:{user_email}'
+
+
+def export_cache_key(scope, export_format, filters, watermark):
+    """Hash the cache key parts into a filename-safe digest"""
+    payload = json.dumps([scope, export_format, filters, watermark], sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+def find_cached_export(key):
+    """Return (path, download name) for a cached artifact and mark it recently used, or None"""
+    for path in glob.glob(os.path.join(EXPORT_CACHE_DIR, f'{key}__*')):
+        if path.endswith('.part'):
+            continue
+        try:
+            os.utime(path)
+        except OSError:
+            continue  # evicted by another worker between glob and utime
+        return path, os.path.basename(path).split('__', 1)[1]
+    return None
+
+
+def store_export(key, file_path, filename):
+    """Move a freshly built export into the cache and return its cached path"""
+    os.makedirs(EXPORT_CACHE_DIR, exist_ok=True)
+    cached_path = os.path.join(EXPORT_CACHE_DIR, f'{key}__{filename}')
+    partial_path = cached_path + '.part'
+    shutil.move(file_path, partial_path)
+    os.replace(partial_path, cached_path)
+    evict_exports()
+    return cached_path
+
+
+def evict_exports(max_bytes=None, max_files=None):
+    """Delete least-recently-used artifacts until the cache is within its file and size limits"""
+    max_bytes = EXPORT_CACHE_MAX_BYTES if max_bytes is None else max_bytes
+    max_files = EXPORT_CACHE_MAX_FILES if max_files is None else max_files
+
+    entries = []
+    for path in glob.glob(os.path.join(EXPORT_CACHE_DIR, '*__*')):
+        if path.endswith('.part'):
+            continue
+        try:
+            stat = os.stat(path)
+        except OSError:
+            continue
+        entries.append((stat.st_mtime, stat.st_size, path))
+
+    entries.sort(reverse=True)  # most recently used first
+    total_bytes = 0
+    removed = 0
+    for index, (_, size, path) in enumerate(entries):
+        total_bytes += size
+        if index >= max_files or (index > 0 and total_bytes > max_bytes):
+            try:
+                os.remove(path)
+                removed += 1
+            except OSError:
+                pass
+    return removed
+
+
+def _lock_for(key):
+    with _build_locks_guard:
+        return _build_locks.setdefault(key, threading.Lock())
+
+
+def cached_export(scope, export_format, filters, build):
+    """
+    Return (file_path, filename) for an export, calling build() only when no artifact exists
+    for the current data watermark. build() must return (file_path, filename) like generate_export.
+    """
+    key = export_cache_key(scope, export_format, filters, get_data_watermark())
+
+    cached = find_cached_export(key)
+    if cached:
+        return cached
+
+    # Concurrent requests for the same export in this worker wait for one build
+    with _lock_for(key):
+        cached = find_cached_export(key)
+        if cached:
+            return cached
+        try:
+            file_path, filename = build()
+            try:
+                return store_export(key, file_path, filename), filename
+            except OSError as e:
+                print(f"Could not cache export {filename}: {str(e)}")
+                return file_path, filename
+        finally:
+            with _build_locks_guard:
+                _build_locks.pop(key, None)
@@ -5,6 +5,66 @@ from datetime import datetime
 from audit_logger import log_audit_event
 import tempfile
 import json
+from fpdf import FPDF
+
+# Export column -> header, in output order. Shared by the DataFrame and streaming exports.
+EXPORT_COLUMNS = {
+    'processing_activity_name': 'Processing Activity Name',
+    'category': 'Category',
+    'department_function': 'Department/Function',
+    'controller_name': 'Controller Name',
+    'controller_contact': 'Controller Contact',
+    'controller_address': 'Controller Address',
+    'controller_country': 'Controller Country',
+    'dpo_name': 'DPO Name',
+    'dpo_contact': 'DPO Contact',
+    'dpo_country': 'DPO Country',
+    'processor_name': 'Processor Name',
+    'processor_contact': 'Processor Contact',
+    'processor_address': 'Processor Country',
+    'processing_purpose': 'Purpose',
+    'legal_basis': 'Legal Basis for Processing',
+    'data_subjects': 'Categories of Data Subjects',
+    'data_categories': 'Categories of Personal Data',
+    'special_categories': 'Special Categories of Personal Data',
+    'recipients': 'Recipients',
+    'third_country_transfers': 'Crossborder Transfer?',
+    'safeguards': 'Safeguards & Measures',
+    'retention_period': 'Retention Period',
+    'deletion_procedures': 'Is Data Retained/Erased in Accordance with Policy?',
+    'security_measures': 'Security Measures Used',
+    'legitimate_interests': 'Reasons For Not Adhering to Policy',
+    'breach_likelihood': 'Likelihood of Data Breach',
+    'breach_impact': 'Impact of Data Breach',
+    'risk_level': 'Risk Level',
+    'dpia_required': 'DPIA Required?',
+    'dpia_outcome': 'DPIA Outcome / Status',
+    'representative_name': 'Representative Name',
+    'representative_contact': 'Representative Contact',
+    'representative_address': 'Representative Address',
+    'description': 'Notes/Comments',
+    'entity_type': 'Entity Type',
+    'status': 'Status',
+    'created_by': 'Created By',
+    'created_at': 'Created Date',
+    'updated_at': 'Updated Date'
+}
+
+NULL_STRINGS = ['nan', 'None', 'NaT', 'NULL']
+TRUE_STRINGS = ['1', '1.0', 'true', 'yes']
+FALSE_STRINGS = ['0', '0.0', 'false', 'no']
+
+def normalize_text_series(series, null_strings=NULL_STRINGS):
+    """Vectorized str(x).strip(), with nulls and null-like strings mapped to ''"""
+    text = series.astype('string').str.strip().fillna('')
+    return text.mask(text.isin(null_strings), '').astype(object)
+
+def yes_no_series(series, default=''):
+    """Map booleans, 0/1 and yes/no strings to 'Yes'/'No'; other non-empty values pass through"""
+    text = series.astype('string').str.strip().fillna('')
+    lowered = text.str.lower()
+    result = text.mask(lowered.isin(TRUE_STRINGS), 'Yes').mask(lowered.isin(FALSE_STRINGS), 'No')
+    return result.mask(result == '', default).astype(object)
 
 def generate_export(user_email, user_role, export_format, include_drafts=False, include_rejected=False):
     """Generate export file with enhanced multi-sheet support"""
@@ -74,8 +134,8 @@ def generate_excel_export_enhanced(user_email, user_role, include_drafts=False,
         raise e
 
 def get_filtered_ropa_data(user_email, user_role, include_drafts=False, include_rejected=False):
-    """Get filtered ROPA data for export"""
-    from models import ROPARecord, User
+    """Get filtered ROPA data for export, loaded straight from SQL and normalized column-wise"""
+    from models import User
     from app import db
 
     try:
@@ -83,74 +143,18 @@ def get_filtered_ropa_data(user_email, user_role, include_drafts=False, include_
         if not user:
             return pd.DataFrame()
 
-        # Build query based on user role
-        if user_role == 'Privacy Champion':
-            query = ROPARecord.query.filter_by(created_by=user.id)
-        else:
-            query = ROPARecord.query
-
-        # Status filtering
-        status_filters = ['Approved', 'Under Review']
-        if include_drafts:
-            status_filters.append('Draft')
-        if include_rejected:
-            status_filters.append('Rejected')
-
-        # Apply status filter
-        records = query.filter(ROPARecord.status.in_(status_filters)).order_by(ROPARecord.created_at.desc()).all()
-
-        # Convert to DataFrame
-        if not records:
+        stmt = build_export_select(user, user_role, include_drafts, include_rejected, with_id=True)
+        df = pd.read_sql_query(stmt, db.session.connection(), parse_dates=['created_at', 'updated_at'])
+        if df.empty:
             return pd.DataFrame()
 
-        records_data = []
-        for record in records:
-            creator = User.query.get(record.created_by)
-            record_dict = {
-                'id': record.id,
-                'processing_activity_name': record.processing_activity_name,
-                'category': record.category,
-                'department_function': record.department_function,
-                'controller_name': record.controller_name,
-                'controller_contact': record.controller_contact,
-                'controller_address': record.controller_address,
-                'dpo_name': record.dpo_name,
-                'dpo_contact': record.dpo_contact,
-                'dpo_country': record.dpo_address or '',
-                'processing_purpose': record.processing_purpose,
-                'data_subjects': record.data_subjects,
-                'data_categories': record.data_categories,
-                'retention_period': record.retention_period,
-                'recipients': record.recipients,
-                'security_measures': record.security_measures,
-                'third_country_transfers': record.third_country_transfers,
-                'processor_name': record.processor_name,
-                'processor_contact': record.processor_contact,
-                'processor_address': record.processor_address,
-                'entity_type': record.entity_type,
-                'safeguards': record.safeguards,
-                'legal_basis': record.legal_basis,
-                'deletion_procedures': record.deletion_procedures,
-                'legitimate_interests': record.legitimate_interests,
-                'description': record.description,
-                'breach_likelihood': record.breach_likelihood or '',
-                'breach_impact': record.breach_impact or '',
-                'risk_level': record.risk_level or '',
-                'dpia_required': 'Yes' if record.dpia_required else 'No',
-                'dpia_outcome': getattr(record, 'dpia_outcome', '') or '',
-                'special_categories': getattr(record, 'special_categories', '') or '',
-                'representative_name': getattr(record, 'representative_name', '') or '',
-                'representative_contact': getattr(record, 'representative_contact', '') or '',
-                'representative_address': getattr(record, 'representative_address', '') or '',
-                'controller_country': getattr(record, 'controller_country', '') or '',
-                'status': record.status,
-                'created_by': creator.email if creator else 'Unknown',
-                'created_at': record.created_at,
-                'updated_at': record.updated_at
-            }
-            records_data.append(record_dict)
-
-        return pd.DataFrame(records_data)
+        blank_columns = ['dpo_country', 'breach_likelihood', 'breach_impact', 'risk_level', 'dpia_outcome',
+                         'special_categories', 'representative_name', 'representative_contact',
+                         'representative_address', 'controller_country']
+        df[blank_columns] = df[blank_columns].fillna('')
+        df['dpia_required'] = yes_no_series(df['dpia_required'], default='No')
+        df['created_by'] = df['created_by'].fillna('Unknown')
+        return df
 
     except Exception as e:
         print(f"Error getting filtered ROPA data: {str(e)}")
@@ -173,19 +177,646 @@ def generate_csv_export(user_email, user_role, include_drafts=False, include_rej
     export_df.to_csv(file_path, index=False)
     return file_path, filename
 
+STREAM_BATCH_SIZE = 500
+STREAM_FORMATS = {'csv': 'text/csv', 'ndjson': 'application/x-ndjson'}
+
+
+def export_status_filters(include_drafts=False, include_rejected=False):
+    """Statuses included in an export"""
+    status_filters = ['Approved', 'Under Review']
+    if include_drafts:
+        status_filters.append('Draft')
+    if include_rejected:
+        status_filters.append('Rejected')
+    return status_filters
+
+
+def build_export_select(user, user_role, include_drafts=False, include_rejected=False, with_id=False):
+    """Core SELECT of the export columns with the creator email joined in, instead of a User lookup per row"""
+    from sqlalchemy import select
+    from models import ROPARecord, User
+
+    table = ROPARecord.__table__
+    columns = [table.c.id] if with_id else []
+    for key in EXPORT_COLUMNS:
+        if key == 'created_by':
+            columns.append(User.__table__.c.email.label('created_by'))
+        elif key == 'dpo_country':
+            columns.append(table.c.dpo_address.label('dpo_country'))
+        else:
+            columns.append(table.c[key])
+
+    return (select(*columns)
+            .select_from(table.outerjoin(User.__table__, User.__table__.c.id == table.c.created_by))
+            .where(*export_record_conditions(user, user_role, include_drafts, include_rejected))
+            .order_by(table.c.created_at.desc()))
+
+
+def export_record_conditions(user, user_role, include_drafts=False, include_rejected=False):
+    """WHERE clauses selecting the records a user may export"""
+    from models import ROPARecord
+
+    table = ROPARecord.__table__
+    conditions = [table.c.status.in_(export_status_filters(include_drafts, include_rejected))]
+    if user_role == 'Privacy Champion':
+        conditions.append(table.c.created_by == user.id)
+    return conditions
+
+
+def format_export_value(key, value):
+    """Render one value the same way the DataFrame exports do"""
+    if key == 'dpia_required':
+        return 'Yes' if value else 'No'
+    if key == 'created_by':
+        return value or 'Unknown'
+    if value is None:
+        return ''
+    if isinstance(value, datetime):
+        return value.strftime('%Y-%m-%d %H:%M:%S')
+    return value
+
+
+def iter_export_rows(user_email, user_role, include_drafts=False, include_rejected=False):
+    """Yield export rows as dicts from a server-side cursor, STREAM_BATCH_SIZE rows at a time"""
+    from models import User
+
+    user = User.query.filter_by(email=user_email).first()
+    if not user:
+        return
+
+    stmt = build_export_select(user, user_role, include_drafts, include_rejected)
+    for row in iter_select_rows(stmt):
+        yield {key: format_export_value(key, value) for key, value in row.items()}
+
+
+def iter_select_rows(stmt):
+    """Yield the rows of a SELECT as mappings from a server-side cursor, STREAM_BATCH_SIZE rows at a time"""
+    from app import db
+
+    result = db.session.execute(stmt.execution_options(stream_results=True, yield_per=STREAM_BATCH_SIZE))
+    try:
+        for partition in result.partitions():
+            for row in partition:
+                yield row._mapping
+    finally:
+        result.close()
+
+
+def stream_ropa_export(user_email, user_role, export_format, include_drafts=False, include_rejected=False):
+    """Yield a CSV or NDJSON export in chunks of STREAM_BATCH_SIZE rows; nothing is written to disk"""
+    import csv
+
+    if export_format not in STREAM_FORMATS:
+        raise Exception(f"Unsupported streaming format: {export_format}")
+
+    buffer = io.StringIO()
+    writer = None
+    if export_format == 'csv':
+        writer = csv.writer(buffer)
+        writer.writerow(EXPORT_COLUMNS.values())
+        # Header goes out immediately so the download starts before the query returns
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+
+    pending = 0
+    for row in iter_export_rows(user_email, user_role, include_drafts, include_rejected):
+        if writer:
+            writer.writerow(row.values())
+        else:
+            buffer.write(json.dumps({EXPORT_COLUMNS[key]: value for key, value in row.items()}, default=str))
+            buffer.write('\n')
+        pending += 1
+        if pending >= STREAM_BATCH_SIZE:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+            pending = 0
+
+    if buffer.tell():
+        yield buffer.getvalue()
+
+
+def export_stream_filename(export_format):
+    """Download name for a streamed export"""
+    return f"ROPA_Export_{datetime.now().strftime('%Y%m%d_%H%M%S')}.{export_format}"
+
+def parse_delta_cursor(value):
+    """Parse a since/cursor value (ISO timestamp) into a naive UTC datetime; None means a full sync"""
+    if not value:
+        return None
+    parsed = datetime.fromisoformat(value.strip().replace('Z', '+00:00'))
+    if parsed.tzinfo is not None:
+        from datetime import timezone
+        parsed = parsed.astimezone(timezone.utc).replace(tzinfo=None)
+    return parsed
+
+
+def delta_value(value):
+    """JSON-safe value for delta payloads"""
+    return value.isoformat() if isinstance(value, datetime) else value
+
+
+def diff_sheet_rows(base_rows, current_rows):
+    """Return (changed rows as [{'row': index, 'values': row}], deleted row indexes) between two snapshots"""
+    changed = [
+        {'row': index, 'values': row}
+        for index, row in enumerate(current_rows)
+        if index >= len(base_rows) or base_rows[index] != row
+    ]
+    deleted = list(range(len(current_rows), len(base_rows)))
+    return changed, deleted
+
+
+def get_sheet_changes(user, user_role, since):
+    """Row-level changes for uploaded sheets created or edited after `since`"""
+    from sqlalchemy import or_
+    from models import ExcelFileData, ExcelSheetData, ExcelVersionHistory
+
+    query = ExcelSheetData.query.join(ExcelFileData, ExcelFileData.id == ExcelSheetData.excel_file_id)
+    if user_role == 'Privacy Champion':
+        query = query.filter(ExcelFileData.uploaded_by == user.id)
+    if since is not None:
+        query = query.filter(or_(ExcelSheetData.created_at > since, ExcelFileData.last_edited_at > since))
+
+    changes = []
+    for sheet in query.order_by(ExcelSheetData.id).all():
+        current_rows = json.loads(sheet.sheet_data or '[]')
+        full = False
+        if since is None or (sheet.created_at and sheet.created_at > since):
+            base_rows = []
+        else:
+            # Sheet state as of the watermark is the last snapshot saved at or before it
+            base = (ExcelVersionHistory.query
+                    .filter(ExcelVersionHistory.sheet_id == sheet.id, ExcelVersionHistory.changed_at <= since)
+                    .order_by(ExcelVersionHistory.changed_at.desc(), ExcelVersionHistory.id.desc())
+                    .first())
+            if base is not None:
+                base_rows = json.loads(base.snapshot or '[]')
+            else:
+                base_rows, full = [], True  # no known state at the watermark, so resend the sheet
+
+        changed, deleted = diff_sheet_rows(base_rows, current_rows)
+        if not changed and not deleted and not full:
+            continue  # file was touched but this sheet's rows are unchanged
+        changes.append({
+            'sheet_id': sheet.id,
+            'excel_file_id': sheet.excel_file_id,
+            'sheet_name': sheet.sheet_name,
+            'columns': json.loads(sheet.columns or '[]'),
+            'full': full,
+            'rows': changed,
+            'deleted_rows': deleted
+        })
+    return changes
+
+
+def generate_delta_export(user_email, user_role, since=None):
+    """
+    Records, custom values and sheet rows created, updated or deleted after `since` (naive UTC datetime),
+    plus tombstones for deletions. Pass the returned cursor as the next `since`.
+    """
+    from models import ROPARecord, ROPACustomData, ApprovedCustomField, Tombstone, User
+    from app import db
+
+    user = User.query.filter_by(email=user_email).first()
+    if not user:
+        raise Exception("User not found")
+
+    cursor = datetime.utcnow()
+    champion = user_role == 'Privacy Champion'
+
+    record_columns = [column for column in ROPARecord.__table__.c if column.key != 'custom_values']
+    record_query = db.session.query(*record_columns)
+    if champion:
+        record_query = record_query.filter(ROPARecord.created_by == user.id)
+    if since is not None:
+        record_query = record_query.filter(ROPARecord.updated_at > since)
+    records = [
+        {key: delta_value(value) for key, value in row._mapping.items()}
+        for row in record_query.order_by(ROPARecord.updated_at, ROPARecord.id).all()
+    ]
+
+    value_query = (db.session.query(ROPACustomData.ropa_record_id, ROPACustomData.custom_field_id,
+                                    ApprovedCustomField.field_name, ROPACustomData.field_value,
+                                    ROPACustomData.updated_at)
+                   .join(ApprovedCustomField, ApprovedCustomField.id == ROPACustomData.custom_field_id))
+    if champion:
+        value_query = value_query.join(ROPARecord, ROPARecord.id == ROPACustomData.ropa_record_id)\
+            .filter(ROPARecord.created_by == user.id)
+    if since is not None:
+        value_query = value_query.filter(ROPACustomData.updated_at > since)
+    custom_values = [
+        {'record_id': row.ropa_record_id, 'field_id': row.custom_field_id, 'field_name': row.field_name,
+         'value': row.field_value, 'updated_at': delta_value(row.updated_at)}
+        for row in value_query.order_by(ROPACustomData.updated_at, ROPACustomData.id).all()
+    ]
+
+    deleted = []
+    if since is not None:
+        tombstone_query = Tombstone.query.filter(Tombstone.deleted_at > since)
+        if champion:
+            tombstone_query = tombstone_query.filter(Tombstone.owner_id == user.id)
+        deleted = [
+            {'table': tombstone.table_name, 'id': tombstone.row_id, 'key': tombstone.row_key,
+             'deleted_at': delta_value(tombstone.deleted_at)}
+            for tombstone in tombstone_query.order_by(Tombstone.deleted_at, Tombstone.id).all()
+        ]
+
+    return {
+        'since': delta_value(since),
+        'cursor': cursor.isoformat(),
+        'records': records,
+        'custom_values': custom_values,
+        'sheets': get_sheet_changes(user, user_role, since),
+        'deleted': deleted
+    }
+
+PDF_REPORT_TITLE = 'GDPR ROPA Compliance Report'
+# fpdf2 holds every page until output, so the per-record tables stop here to keep memory bounded;
+# the summary sections still cover every record and the Excel/CSV exports list them all
+PDF_RECORD_TABLE_LIMIT = int(os.environ.get('PDF_RECORD_TABLE_LIMIT', 1000))
+NO_TRANSFER_VALUES = ['', 'no', 'none', 'n/a', 'na', 'false', '0']
+
+# Per-record table columns: (row key, header, relative width)
+PDF_COMPLIANCE_COLUMNS = [
+    ('processing_activity_name', 'Processing Activity', 3),
+    ('department_function', 'Department', 1.6),
+    ('status', 'Status', 1.1),
+    ('legal_basis', 'Legal Basis', 2),
+    ('retention_period', 'Retention Period', 1.6),
+    ('third_country_transfers', 'Crossborder Transfer', 1.4),
+    ('safeguards', 'Safeguards', 2),
+    ('gaps', 'Compliance Gaps', 2.6),
+]
+PDF_RISK_COLUMNS = [
+    ('processing_activity_name', 'Processing Activity', 3),
+    ('category', 'Category', 1.6),
+    ('special_categories', 'Special Categories', 2),
+    ('breach_likelihood', 'Likelihood', 1.1),
+    ('breach_impact', 'Impact', 1.1),
+    ('risk_level', 'Risk Level', 1),
+    ('dpia_required', 'DPIA', 0.7),
+    ('dpia_outcome', 'DPIA Outcome', 1.8),
+    ('security_measures', 'Security Measures', 2.4),
+]
+
+
+def compliance_gap_conditions():
+    """Compliance check label -> SQL condition that is true when a record fails the check"""
+    from sqlalchemy import and_, func
+    from models import ROPARecord
+
+    table = ROPARecord.__table__
+
+    def blank(column):
+        return func.trim(func.coalesce(column, '')) == ''
+
+    transfers = func.lower(func.trim(func.coalesce(table.c.third_country_transfers, '')))
+    return {
+        'No purpose': blank(table.c.processing_purpose),
+        'No legal basis': blank(table.c.legal_basis),
+        'No retention period': blank(table.c.retention_period),
+        'No security measures': blank(table.c.security_measures),
+        'Transfer without safeguards': and_(transfers.notin_(NO_TRANSFER_VALUES), blank(table.c.safeguards)),
+        'DPIA outcome missing': and_(table.c.dpia_required.is_(True), blank(table.c.dpia_outcome)),
+    }
+
+
+def gap_column_name(position):
+    return f'gap_{position}'
+
+
+def build_pdf_summary_select(user, user_role, include_drafts=False, include_rejected=False):
+    """One GROUP BY over the exported records that yields every count the report summary needs"""
+    from sqlalchemy import case, func, or_, select
+    from models import ROPARecord
+
+    table = ROPARecord.__table__
+    gaps = list(compliance_gap_conditions().values())
+
+    def count_where(condition):
+        return func.sum(case((condition, 1), else_=0))
+
+    columns = [
+        table.c.status, table.c.category, table.c.risk_level,
+        func.count().label('records'),
+        count_where(table.c.dpia_required.is_(True)).label('dpia_required'),
+        count_where(or_(*gaps)).label('with_gaps'),
+    ]
+    columns.extend(count_where(condition).label(gap_column_name(position)) for position, condition in enumerate(gaps))
+    return (select(*columns)
+            .where(*export_record_conditions(user, user_role, include_drafts, include_rejected))
+            .group_by(table.c.status, table.c.category, table.c.risk_level))
+
+
+def label_or(value, default):
+    value = (value or '').strip()
+    return value or default
+
+
+def get_pdf_summary(user, user_role, include_drafts=False, include_rejected=False):
+    """Fold the grouped summary rows into totals by status, category, risk level and compliance check"""
+    from app import db
+
+    gap_labels = list(compliance_gap_conditions())
+    summary = {
+        'total': 0, 'dpia_required': 0, 'with_gaps': 0,
+        'status': {}, 'category': {}, 'risk': {},
+        'gaps': dict.fromkeys(gap_labels, 0),
+    }
+    stmt = build_pdf_summary_select(user, user_role, include_drafts, include_rejected)
+    for row in db.session.execute(stmt).mappings():
+        records = row['records']
+        summary['total'] += records
+        summary['dpia_required'] += row['dpia_required'] or 0
+        summary['with_gaps'] += row['with_gaps'] or 0
+        status = label_or(row['status'], 'Unknown')
+        summary['status'][status] = summary['status'].get(status, 0) + records
+
+        category = summary['category'].setdefault(label_or(row['category'], 'Uncategorised'), {'records': 0, 'approved': 0})
+        category['records'] += records
+        if status == 'Approved':
+            category['approved'] += records
+
+        risk = summary['risk'].setdefault(label_or(row['risk_level'], 'Not assessed').title(), {'records': 0, 'dpia_required': 0})
+        risk['records'] += records
+        risk['dpia_required'] += row['dpia_required'] or 0
+
+        for position, label in enumerate(gap_labels):
+            summary['gaps'][label] += row[gap_column_name(position)] or 0
+    return summary
+
+
+def build_pdf_records_select(user, user_role, include_drafts=False, include_rejected=False):
+    """Columns for the per-record tables, with each compliance check evaluated in SQL"""
+    from sqlalchemy import case, select
+    from models import ROPARecord
+
+    table = ROPARecord.__table__
+    keys = dict.fromkeys(key for key, _, _ in PDF_COMPLIANCE_COLUMNS + PDF_RISK_COLUMNS if key != 'gaps')
+    columns = [table.c[key] for key in keys]
+    columns.extend(case((condition, 1), else_=0).label(gap_column_name(position))
+                   for position, condition in enumerate(compliance_gap_conditions().values()))
+    return (select(*columns)
+            .where(*export_record_conditions(user, user_role, include_drafts, include_rejected))
+            .order_by(table.c.created_at.desc()))
+
+
+def iter_pdf_table_rows(stmt, columns):
+    """Stream table rows for the report, one record at a time"""
+    gap_labels = list(compliance_gap_conditions())
+    for row in iter_select_rows(stmt):
+        cells = []
+        for key, _, _ in columns:
+            if key == 'gaps':
+                failed = [label for position, label in enumerate(gap_labels) if row[gap_column_name(position)]]
+                cells.append(', '.join(failed) or 'None')
+            else:
+                cells.append(format_export_value(key, row[key]))
+        yield cells
+
+
+def percent(part, whole):
+    return f'{(part / whole * 100):.1f}%' if whole else '0.0%'
+
+
+# The core PDF fonts only cover Latin-1; common typographic characters get plain equivalents
+PDF_TEXT_REPLACEMENTS = str.maketrans({
+    '\u2018': "'", '\u2019': "'", '\u201c': '"', '\u201d': '"', '\u2013': '-', '\u2014': '-',
+    '\u2026': '...', '\u2022': '-', '\u20ac': 'EUR',
+})
+PDF_MARGIN = 36
+PDF_HEADER_COLOR = (31, 78, 121)
+PDF_STRIPE_COLOR = (242, 242, 242)
+
+
+def pdf_text(value):
+    """Text the core Helvetica font can render; anything else becomes '?'"""
+    return str(value).translate(PDF_TEXT_REPLACEMENTS).encode('latin-1', errors='replace').decode('latin-1')
+
+
+class ReportPDF(FPDF):
+    """A4 landscape report layout: headings, paragraphs and tables that break across pages"""
+
+    def __init__(self, title):
+        super().__init__(orientation='L', unit='pt', format='A4')
+        self.report_title = pdf_text(title)
+        self.set_title(self.report_title)
+        self.set_creator('ROPA Platform')
+        self.set_margins(PDF_MARGIN, PDF_MARGIN)
+        self.set_auto_page_break(True, margin=PDF_MARGIN + 20)  # room for the footer
+
+    def footer(self):
+        y = self.h - PDF_MARGIN - 8
+        self.set_draw_color(191)
+        self.set_line_width(0.5)
+        self.line(self.l_margin, y, self.w - self.r_margin, y)
+        self.set_font('helvetica', size=7)
+        self.set_text_color(127)
+        self.set_xy(self.l_margin, y + 2)
+        self.cell(0, 10, self.report_title)
+        self.set_x(self.l_margin)
+        self.cell(0, 10, f'Page {self.page_no()}', align='R')
+
+    def fits(self, height):
+        return self.get_y() + height <= self.page_break_trigger
+
+    def heading(self, value, size=14):
+        if not self.fits(size * 2 + 24):  # keep a heading with at least a line of what follows
+            self.add_page()
+        self.set_font('helvetica', 'B', size)
+        self.set_text_color(*PDF_HEADER_COLOR)
+        self.cell(0, size + 4, pdf_text(value), new_x='LMARGIN', new_y='NEXT')
+        self.ln(6)
+
+    def paragraph(self, value, size=9):
+        self.set_font('helvetica', size=size)
+        self.set_text_color(44)
+        self.multi_cell(0, size * 1.3, pdf_text(value), new_x='LMARGIN', new_y='NEXT')
+        self.ln(4)
+
+    def cell_lines(self, value, width, max_lines):
+        """Word-wrap a cell for the current font; overflow past max_lines is ellipsised"""
+        value = pdf_text(value)
+        measure = self.get_string_width
+        if '\n' not in value and measure(value) <= width:
+            return [value.strip()]
+
+        # Only what could fit in max_lines + 1 lines of the narrowest glyphs is worth wrapping
+        value = value[:int(width * (max_lines + 1) / (0.19 * self.font_size)) + 1]
+        space = measure(' ')
+        lines = []
+        for paragraph in value.splitlines() or ['']:
+            line, line_width = '', 0
+            for word in paragraph.split():
+                word_width = measure(word)
+                if line and line_width + space + word_width <= width:
+                    line, line_width = f'{line} {word}', line_width + space + word_width
+                    continue
+                if line:
+                    lines.append(line)
+                # Break words that are longer than a whole line
+                while word_width > width and len(word) > 1:
+                    cut = len(word) - 1
+                    while cut > 1 and measure(word[:cut]) > width:
+                        cut -= 1
+                    lines.append(word[:cut])
+                    word = word[cut:]
+                    word_width = measure(word)
+                line, line_width = word, word_width
+            lines.append(line)
+            if len(lines) > max_lines:
+                break
+
+        if len(lines) > max_lines:
+            lines = lines[:max_lines]
+            last = lines[-1].rstrip()
+            while last and measure(last + '...') > width:
+                last = last[:-1]
+            lines[-1] = last.rstrip() + '...'
+        return lines
+
+    def draw_row(self, cell_lines, widths, leading, padding, fill=None):
+        height = max(len(lines) for lines in cell_lines) * leading + 2 * padding
+        if fill:
+            self.set_fill_color(*fill)
+            self.rect(self.l_margin, self.get_y(), sum(widths), height, style='F')
+        x, y = self.l_margin, self.get_y()
+        baseline = y + padding + leading - (leading - self.font_size) / 2 - 1
+        for lines, width in zip(cell_lines, widths):
+            for index, line in enumerate(lines):
+                self.text(x + padding, baseline + index * leading, line)
+            x += width
+        self.set_xy(self.l_margin, y + height)
+
+    def table(self, columns, rows, size=7.5, max_lines=3):
+        """
+        Draw a table from an iterable of row lists, consuming it one row at a time.
+        columns is a list of (title, relative width); the header repeats on every page.
+        """
+        total_weight = sum(weight for _, weight in columns)
+        widths = [self.epw * weight / total_weight for _, weight in columns]
+        padding = 3
+        leading = size * 1.25
+
+        def draw_header():
+            self.set_font('helvetica', 'B', size + 0.5)
+            header_lines = [self.cell_lines(title, width - 2 * padding, 2) for (title, _), width in zip(columns, widths)]
+            self.set_text_color(255)
+            self.draw_row(header_lines, widths, leading, padding, fill=PDF_HEADER_COLOR)
+
+        if not self.fits(6 * leading):
+            self.add_page()
+        draw_header()
+        self.set_draw_color(217)
+        for row_index, row in enumerate(rows):
+            self.set_font('helvetica', size=size)
+            cell_lines = [self.cell_lines('' if value is None else value, width - 2 * padding, max_lines)
+                          for value, width in zip(row, widths)]
+            if not self.fits(max(len(lines) for lines in cell_lines) * leading + 2 * padding):
+                self.add_page()
+                draw_header()
+                self.set_font('helvetica', size=size)
+            self.set_text_color(44)
+            self.draw_row(cell_lines, widths, leading, padding, fill=PDF_STRIPE_COLOR if row_index % 2 else None)
+            self.set_draw_color(217)
+            self.set_line_width(0.3)
+            self.line(self.l_margin, self.get_y(), self.l_margin + self.epw, self.get_y())
+        self.ln(10)
+
+
+def write_pdf_report(fileobj, user, user_role, include_drafts=False, include_rejected=False):
+    """Render the compliance report into a binary file object; returns the page count"""
+    summary = get_pdf_summary(user, user_role, include_drafts, include_rejected)
+    total = summary['total']
+    statuses = export_status_filters(include_drafts, include_rejected)
+    approved = summary['status'].get('Approved', 0)
+
+    doc = ReportPDF(PDF_REPORT_TITLE)
+    doc.add_page()
+    doc.heading(PDF_REPORT_TITLE, size=18)
+    scope = 'All records in the organisation' if user_role != 'Privacy Champion' else f'Records created by {user.email}'
+    doc.paragraph(f"Generated on {datetime.now().strftime('%Y-%m-%d %H:%M:%S')} for {user.email}")
+    doc.paragraph(f"Scope: {scope}. Statuses included: {', '.join(statuses)}.")
+
+    doc.heading('Executive Summary')
+    metrics = [['Total ROPA Records', total]]
+    metrics.extend([f'{status} Records', summary['status'].get(status, 0)] for status in statuses)
+    metrics.extend([
+        ['Compliance Rate (approved)', percent(approved, total)],
+        ['Records with Compliance Gaps', f"{summary['with_gaps']} ({percent(summary['with_gaps'], total)})"],
+        ['DPIA Required', summary['dpia_required']],
+    ])
+    doc.table([('Metric', 3), ('Value', 2)], metrics, size=9)
+
+    if total:
+        doc.heading('Records by Category')
+        categories = sorted(summary['category'].items(), key=lambda item: (-item[1]['records'], item[0]))
+        doc.table([('Category', 3), ('Records', 1), ('Share', 1), ('Approved', 1), ('Approved Rate', 1)], (
+            [name, counts['records'], percent(counts['records'], total), counts['approved'],
+             percent(counts['approved'], counts['records'])]
+            for name, counts in categories
+        ))
+
+        doc.heading('Risk Distribution')
+        risks = sorted(summary['risk'].items(), key=lambda item: (-item[1]['records'], item[0]))
+        doc.table([('Risk Level', 3), ('Records', 1), ('Share', 1), ('DPIA Required', 1)], (
+            [name, counts['records'], percent(counts['records'], total), counts['dpia_required']]
+            for name, counts in risks
+        ))
+
+        doc.heading('Compliance Checks')
+        doc.table([('Check', 3), ('Records Failing', 1), ('Share', 1)], (
+            [label, count, percent(count, total)] for label, count in summary['gaps'].items()
+        ))
+
+        stmt = build_pdf_records_select(user, user_role, include_drafts, include_rejected).limit(PDF_RECORD_TABLE_LIMIT)
+        table_note = None
+        if total > PDF_RECORD_TABLE_LIMIT:
+            table_note = (f'Showing the {PDF_RECORD_TABLE_LIMIT} most recently created of {total} records. '
+                          'The Excel and CSV exports list every record.')
+
+        doc.add_page()
+        doc.heading('Record Compliance')
+        if table_note:
+            doc.paragraph(table_note)
+        doc.table([(title, width) for _, title, width in PDF_COMPLIANCE_COLUMNS],
+                  iter_pdf_table_rows(stmt, PDF_COMPLIANCE_COLUMNS))
+
+        doc.add_page()
+        doc.heading('Record Risk Assessment')
+        if table_note:
+            doc.paragraph(table_note)
+        doc.table([(title, width) for _, title, width in PDF_RISK_COLUMNS],
+                  iter_pdf_table_rows(stmt, PDF_RISK_COLUMNS))
+    else:
+        doc.paragraph('No records match the selected statuses.')
+
+    doc.output(fileobj)
+    return doc.page_no()
+
+
 def generate_pdf_export(user_email, user_role, include_drafts=False, include_rejected=False):
-    """Generate PDF report"""
-    records_df = get_filtered_ropa_data(user_email, user_role, include_drafts, include_rejected)
+    """Generate the PDF compliance report; record rows are fetched a batch at a time, up to PDF_RECORD_TABLE_LIMIT"""
+    from models import User
 
-    report_content = create_pdf_report_content(records_df)
+    user = User.query.filter_by(email=user_email).first()
+    if not user:
+        raise Exception("User not found")
 
     temp_dir = tempfile.gettempdir()
     timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-    filename = f"ROPA_Report_{timestamp}.txt"
+    filename = f"ROPA_Report_{timestamp}.pdf"
     file_path = os.path.join(temp_dir, filename)
 
-    with open(file_path, 'w', encoding='utf-8') as f:
-        f.write(report_content)
+    try:
+        with open(file_path, 'wb') as f:
+            write_pdf_report(f, user, user_role, include_drafts, include_rejected)
+    except Exception:
+        if os.path.exists(file_path):
+            os.remove(file_path)
+        raise
 
     return file_path, filename
 
@@ -194,50 +825,8 @@ def prepare_export_dataframe(df):
     if df.empty:
         return df
 
-    export_columns = {
-        'processing_activity_name': 'Processing Activity Name',
-        'category': 'Category',
-        'department_function': 'Department/Function',
-        'controller_name': 'Controller Name',
-        'controller_contact': 'Controller Contact',
-        'controller_address': 'Controller Address',
-        'controller_country': 'Controller Country',
-        'dpo_name': 'DPO Name',
-        'dpo_contact': 'DPO Contact',
-        'dpo_country': 'DPO Country',
-        'processor_name': 'Processor Name',
-        'processor_contact': 'Processor Contact',
-        'processor_address': 'Processor Country',
-        'processing_purpose': 'Purpose',
-        'legal_basis': 'Legal Basis for Processing',
-        'data_subjects': 'Categories of Data Subjects',
-        'data_categories': 'Categories of Personal Data',
-        'special_categories': 'Special Categories of Personal Data',
-        'recipients': 'Recipients',
-        'third_country_transfers': 'Crossborder Transfer?',
-        'safeguards': 'Safeguards & Measures',
-        'retention_period': 'Retention Period',
-        'deletion_procedures': 'Is Data Retained/Erased in Accordance with Policy?',
-        'security_measures': 'Security Measures Used',
-        'legitimate_interests': 'Reasons For Not Adhering to Policy',
-        'breach_likelihood': 'Likelihood of Data Breach',
-        'breach_impact': 'Impact of Data Breach',
-        'risk_level': 'Risk Level',
-        'dpia_required': 'DPIA Required?',
-        'dpia_outcome': 'DPIA Outcome / Status',
-        'representative_name': 'Representative Name',
-        'representative_contact': 'Representative Contact',
-        'representative_address': 'Representative Address',
-        'description': 'Notes/Comments',
-        'entity_type': 'Entity Type',
-        'status': 'Status',
-        'created_by': 'Created By',
-        'created_at': 'Created Date',
-        'updated_at': 'Updated Date'
-    }
-
     # Select available columns
-    available_columns = {k: v for k, v in export_columns.items() if k in df.columns}
+    available_columns = {k: v for k, v in EXPORT_COLUMNS.items() if k in df.columns}
 
     export_df = df[list(available_columns.keys())].copy()
     export_df = export_df.rename(columns=available_columns)
@@ -272,41 +861,6 @@ def create_enhanced_summary_data(records_df, excel_files):
 
     return summary
 
-def create_pdf_report_content(df):
-    """Create text content for PDF report"""
-    report = f"""
-GDPR ROPA COMPLIANCE REPORT
-Generated on: {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}
-
-========================================
-EXECUTIVE SUMMARY
-========================================
-
-Total ROPA Records: {len(df)}
-"""
-
-    if not df.empty:
-        report += f"""Approved Records: {len(df[df['status'] == 'Approved'])}
-Pending Review: {len(df[df['status'] == 'Under Review'])}
-Draft Records: {len(df[df['status'] == 'Draft'])}
-
-Compliance Rate: {(len(df[df['status'] == 'Approved']) / len(df) * 100):.1f}%
-"""
-
-    report += """
-========================================
-RECORDS BY CATEGORY
-========================================
-"""
-
-    if not df.empty and 'category' in df.columns:
-        category_counts = df['category'].value_counts()
-        for category, count in category_counts.items():
-            report += f"{category}: {count} records\n"
-
-    return report
-
-
 def export_excel_with_all_sheets(user_email, user_role, include_updates=True):
     """Export Excel file with all original sheets plus updates - beautifully formatted"""
     from models import ExcelFileData, ExcelSheetData, ROPARecord, User
@@ -441,22 +995,21 @@ def export_excel_with_all_sheets(user_email, user_role, include_updates=True):
                 # Get custom field data for integration
                 custom_field_values = {}
                 if custom_fields:
-                    from models import ROPACustomData, ROPARecord
-                    for category, fields in custom_fields.items():
-                        for field in fields:
-                            field_values = db.session.query(ROPACustomData, ROPARecord).join(
-                                ROPARecord, ROPACustomData.ropa_record_id == ROPARecord.id
-                            ).filter(ROPACustomData.custom_field_id == field['id']).all()
-
-                            for custom_data, ropa_record in field_values:
-                                if user_role != 'Privacy Officer' and ropa_record.created_by != user.id:
-                                    continue
-
-                                record_key = ropa_record.processing_activity_name or f"Record_{ropa_record.id}"
-                                if record_key not in custom_field_values:
-                                    custom_field_values[record_key] = {}
-
-                                custom_field_values[record_key][field['field_name']] = custom_data.field_value or ''
+                    from models import ROPARecord
+                    from custom_tab_automation import get_custom_values_for_records
+                    field_names = {field['id']: field['field_name'] for fields in custom_fields.values() for field in fields}
+
+                    record_query = db.session.query(ROPARecord.id, ROPARecord.processing_activity_name)
+                    if user_role != 'Privacy Officer':
+                        record_query = record_query.filter(ROPARecord.created_by == user.id)
+                    record_names = dict(record_query.all())
+
+                    # One pivot over the compact store instead of a join per custom field
+                    for record_id, values in get_custom_values_for_records(record_names).items():
+                        row = {field_names[field_id]: value for field_id, value in values.items() if field_id in field_names}
+                        if row:
+                            record_key = record_names[record_id] or f"Record_{record_id}"
+                            custom_field_values.setdefault(record_key, {}).update(row)
 
                 # Now enhance existing sheets with custom field columns
                 if custom_field_values:
@@ -492,112 +1045,48 @@ def format_excel_sheet(worksheet, df, is_ropa_sheet=False, is_original_sheet=Fal
     try:
         from openpyxl.styles import Font, PatternFill, Alignment, Border, Side
         from openpyxl.utils import get_column_letter
-
-        # Enhanced vibrant color schemes for maximum visual appeal
-        if is_original_sheet:
-            header_color = "1F4E79"  # Deep royal blue for original sheets
-            alt_row_color = "D9E2F3"  # Strong light blue background
-            accent_color = "8DB4E2"  # Medium blue for emphasis
-        elif is_ropa_sheet:
-            header_color = "548235"  # Deep green for ROPA sheets  
-            alt_row_color = "E2EFDA"  # Strong light green background
-            accent_color = "A9D18E"  # Medium green accent
-        else:
-            header_color = "C65911"  # Deep orange
-            alt_row_color = "FCE4D6"  # Strong light orange background
-            accent_color = "F4B183"  # Medium orange accent
-
-        # Enhanced header formatting with professional styling
-        header_font = Font(bold=True, color="FFFFFF", size=12, name="Calibri")
-        header_fill = PatternFill(start_color=header_color, end_color=header_color, fill_type="solid")
-        header_alignment = Alignment(horizontal="center", vertical="center", wrap_text=True)
-        header_border = Border(
-            left=Side(style='medium', color="FFFFFF"),
-            right=Side(style='medium', color="FFFFFF"),
-            top=Side(style='medium', color="FFFFFF"),
-            bottom=Side(style='medium', color="FFFFFF")
-        )
+        from excel_styles import (register_named_styles, export_header_style_name, style_cells, add_zebra_stripes,
+                                  set_default_row_height, sample_column_lengths, EXPORT_DATA_STYLE, EXPORT_STRIPE_COLOR)
 
         # Ensure we have actual data to format
         if df.empty:
             return
 
+        register_named_styles(worksheet.parent)
+        if is_original_sheet:
+            header_style = export_header_style_name('original')
+        elif is_ropa_sheet:
+            header_style = export_header_style_name('ropa')
+        else:
+            header_style = export_header_style_name('default')
+
         # Apply professional header formatting
         num_cols = len(df.columns)
-        for col_num in range(1, num_cols + 1):
-            cell = worksheet.cell(row=1, column=col_num)
-
-            # Set header value with proper formatting
-            if col_num <= len(df.columns):
-                header_value = str(df.columns[col_num - 1])
-
-                # If header is empty or unnamed, provide a meaningful default
-                if not header_value or header_value.strip() == '' or header_value.lower() in ['unnamed', 'nan', 'none']:
-                    header_value = f"Column {col_num}"
-
-                # Clean up header text while preserving original meaning
-                header_value = header_value.strip()
-                if len(header_value) > 50:  # Truncate very long headers
-                    header_value = header_value[:47] + "..."
-
-                cell.value = header_value
-
-            # Apply professional header styling
-            cell.font = header_font
-            cell.fill = header_fill
-            cell.alignment = header_alignment
-            cell.border = header_border
-
-        # Enhanced data cell formatting with professional styling
-        data_font = Font(name="Calibri", size=11, color="2C2C2C")
-        data_alignment = Alignment(horizontal="left", vertical="top", wrap_text=True)
-        data_border = Border(
-            left=Side(style='thin', color="CCCCCC"),
-            right=Side(style='thin', color="CCCCCC"),
-            top=Side(style='thin', color="CCCCCC"),
-            bottom=Side(style='thin', color="CCCCCC")
-        )
-
-        # Apply data formatting with professional alternating colors
+        header_lengths = []
+        for col_num, column in enumerate(df.columns, 1):
+            header_value = str(column)
+
+            # If header is empty or unnamed, provide a meaningful default
+            if not header_value or header_value.strip() == '' or header_value.lower() in ['unnamed', 'nan', 'none']:
+                header_value = f"Column {col_num}"
+
+            # Clean up header text while preserving original meaning
+            header_value = header_value.strip()
+            if len(header_value) > 50:  # Truncate very long headers
+                header_value = header_value[:47] + "..."
+
+            cell = worksheet.cell(row=1, column=col_num, value=header_value)
+            cell.style = header_style
+            header_lengths.append(len(header_value))
+
+        # Data cells share one registered style; alternating light blue rows come from a single conditional format
         num_rows = len(df) + 1  # +1 for header
-        for row_num in range(2, num_rows + 1):
-            for col_num in range(1, num_cols + 1):
-                cell = worksheet.cell(row=row_num, column=col_num)
-
-                # Ensure cell has a value (handle None/NaN)
-                if cell.value is None or str(cell.value).lower() in ['nan', 'none']:
-                    cell.value = ''
-
-                cell.font = data_font
-                cell.alignment = data_alignment
-                cell.border = data_border
-
-                # Apply light blue and white alternating row colors
-                if row_num % 2 == 0:
-                    # Even rows get light blue
-                    cell.fill = PatternFill(start_color="ADD8E6", end_color="ADD8E6", fill_type="solid")
-                else:
-                    # Odd rows get white
-                    cell.fill = PatternFill(start_color="FFFFFF", end_color="FFFFFF", fill_type="solid")
-
-        # Intelligent column width calculation for better readability
-        for col_num in range(1, num_cols + 1):
-            column_letter = get_column_letter(col_num)
-
-            # Calculate optimal width based on content
-            header_length = len(str(worksheet.cell(row=1, column=col_num).value or ''))
-            max_length = max(header_length, 15)  # Minimum readable width
-
-            # Sample data to determine optimal width (check more rows for accuracy)
-            sample_size = min(num_rows, 100)  # Check up to 100 rows
-            for row_num in range(2, sample_size + 1):
-                cell = worksheet.cell(row=row_num, column=col_num)
-                if cell.value is not None:
-                    try:
-                        cell_length = len(str(cell.value))
-                        max_length = max(max_length, cell_length)
-                    except:
-                        pass
+        style_cells(worksheet, EXPORT_DATA_STYLE, 2, num_rows, 1, num_cols)
+        add_zebra_stripes(worksheet, 2, num_rows, num_cols, EXPORT_STRIPE_COLOR)
+
+        # Column widths from a bounded sample of the data rather than every cell
+        for col_num, (header_length, data_length) in enumerate(zip(header_lengths, sample_column_lengths(df)), 1):
+            max_length = max(header_length, data_length, 15)  # Minimum readable width
 
             # Set optimal column width with professional limits
             if max_length <= 20:
@@ -609,14 +1098,11 @@ def format_excel_sheet(worksheet, df, is_ropa_sheet=False, is_original_sheet=Fal
 
             # Ensure minimum and maximum bounds
             adjusted_width = min(max(adjusted_width, 12), 55)
-            worksheet.column_dimensions[column_letter].width = adjusted_width
-
-        # Professional row height settings
-        worksheet.row_dimensions[1].height = 45  # Generous header height for readability
+            worksheet.column_dimensions[get_column_letter(col_num)].width = adjusted_width
 
-        # Set comfortable row height for data rows
-        for row_num in range(2, min(num_rows + 1, 500)):  # Format up to 500 rows
-            worksheet.row_dimensions[row_num].height = 30  # Comfortable reading height
+        # Generous header height, comfortable reading height for every data row
+        worksheet.row_dimensions[1].height = 45
+        set_default_row_height(worksheet, 30)
 
         # Enable gridlines for better structure visibility
         worksheet.sheet_view.showGridLines = True
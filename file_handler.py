@@ -5,7 +5,27 @@ from audit_logger import log_audit_event
 import openpyxl
 from werkzeug.utils import secure_filename
 from datetime import datetime
+import hashlib
 import json
+import os
+import atexit
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from column_mapping import (
+    FIELD_PATTERNS, resolve_column_mapping, sheet_name_matches, header_keyword_matches
+)
+
+# Workbooks with fewer sheets than this are parsed in-process; pool start-up would dominate
+PARALLEL_SHEET_THRESHOLD = 4
+
+# Process pool shared by every upload and workbook export in this process; see get_excel_pool()
+_excel_pool = None
+_excel_pool_pid = None
+_excel_pool_lock = threading.Lock()
+
+# Member added to a workbook ZIP listing the workbooks that could not be built
+EXPORT_ERRORS_MEMBER = 'ERRORS.txt'
 
 def process_uploaded_file(file, user_email):
     """Process uploaded Excel file with all sheets and store complete structure"""
@@ -16,13 +36,24 @@ def process_uploaded_file(file, user_email):
         if file_extension not in ['xlsx', 'xls']:
             return "Only Excel files (.xlsx, .xls) are supported for multi-sheet processing"
 
+        # Hash the raw workbook so re-uploads of the same file are caught before parsing
+        file.seek(0)
+        file_hash = compute_content_hash(file.read())
+        file.seek(0)
+
+        duplicate = find_duplicate_upload(file_hash, user_email)
+        if duplicate:
+            log_audit_event('Duplicate Excel Upload', user_email, f'Skipped re-upload of {filename} (matches file ID {duplicate.id})')
+            return (f"This workbook was already uploaded as '{duplicate.filename}' on "
+                    f"{duplicate.upload_timestamp.strftime('%Y-%m-%d %H:%M')}. No new copy was stored.")
+
         # Read all sheets from Excel file
         excel_data = read_all_excel_sheets(file)
         if not excel_data:
             return "No valid data found in Excel file"
 
         # Store the complete Excel structure in database
-        result = store_excel_data_in_database(excel_data, user_email, filename)
+        result = store_excel_data_in_database(excel_data, user_email, filename, file_hash=file_hash)
 
         log_audit_event('Excel File Processed', user_email, f'Processed multi-sheet Excel file: {filename}')
         return result
@@ -31,11 +62,13 @@ def process_uploaded_file(file, user_email):
         print(f"Error processing file: {str(e)}")
         return f"Error processing file: {str(e)}"
 
-def read_all_excel_sheets(file):
+def read_all_excel_sheets(file, workers=None):
     """Read all sheets from Excel file and preserve structure"""
     try:
-        # Get all sheet names
-        xl_file = pd.ExcelFile(file)
+        # Read the upload once; every sheet is parsed from the same in-memory workbook
+        file.seek(0)
+        content = file.read()
+        xl_file = pd.ExcelFile(io.BytesIO(content))
         sheet_names = xl_file.sheet_names
 
         excel_data = {
@@ -49,38 +82,22 @@ def read_all_excel_sheets(file):
 
         print(f"Found {len(sheet_names)} sheets: {sheet_names}")
 
-        # Read each sheet
-        for sheet_name in sheet_names:
+        if workers is None:
+            workers = get_sheet_parse_workers(len(sheet_names))
+
+        parsed = None
+        if workers > 1:
             try:
-                # Read sheet with multiple strategies
-                sheet_data = read_sheet_with_fallback(file, sheet_name)
-                if sheet_data is not None and not sheet_data.empty:
-                    # Store data with original column names preserved exactly as uploaded
-                    excel_data['sheets'][sheet_name] = {
-                        'data': sheet_data.to_dict('records'),
-                        'columns': list(sheet_data.columns),  # Keep exact original column names
-                        'shape': sheet_data.shape,
-                        'has_data': True
-                    }
-                    print(f"Successfully read sheet '{sheet_name}' with shape {sheet_data.shape}")
-                else:
-                    excel_data['sheets'][sheet_name] = {
-                        'data': [],
-                        'columns': [],
-                        'shape': (0, 0),
-                        'has_data': False,
-                        'error': 'No data found'
-                    }
-                    print(f"No data found in sheet '{sheet_name}'")
+                parsed = read_sheets_in_parallel(content, sheet_names, workers)
             except Exception as e:
-                print(f"Error reading sheet '{sheet_name}': {str(e)}")
-                excel_data['sheets'][sheet_name] = {
-                    'data': [],
-                    'columns': [],
-                    'shape': (0, 0),
-                    'has_data': False,
-                    'error': str(e)
-                }
+                print(f"Parallel sheet parsing failed, falling back to sequential: {str(e)}")
+
+        if parsed is None:
+            parsed = dict(read_sheet_batch(xl_file, sheet_names))
+
+        # Merge in workbook order so the stored structure doesn't depend on worker timing
+        for sheet_name in sheet_names:
+            excel_data['sheets'][sheet_name] = parsed[sheet_name]
 
         return excel_data
 
@@ -88,6 +105,98 @@ def read_all_excel_sheets(file):
         print(f"Error reading Excel file: {str(e)}")
         return None
 
+def get_configured_workers(env_name):
+    """Worker count from env_name, defaulting to the CPU count; 1 disables the pool"""
+    try:
+        return max(1, int(os.environ.get(env_name, os.cpu_count() or 1)))
+    except ValueError:
+        return 1
+
+def get_max_parse_workers():
+    return get_configured_workers('EXCEL_PARSE_WORKERS')
+
+def get_sheet_parse_workers(sheet_count):
+    """Worker count for parsing a workbook with sheet_count sheets"""
+    if sheet_count < PARALLEL_SHEET_THRESHOLD:
+        return 1
+    return min(get_max_parse_workers(), sheet_count)
+
+def get_excel_pool():
+    """
+    Process pool shared by uploads and exports: created on first use (again after a fork), shut down at
+    exit, and sized by the larger of EXCEL_PARSE_WORKERS and EXCEL_EXPORT_WORKERS
+    """
+    global _excel_pool, _excel_pool_pid
+    with _excel_pool_lock:
+        if _excel_pool is None or _excel_pool_pid != os.getpid():
+            workers = max(get_max_parse_workers(), get_configured_workers('EXCEL_EXPORT_WORKERS'))
+            _excel_pool = ProcessPoolExecutor(max_workers=workers)
+            _excel_pool_pid = os.getpid()
+            atexit.register(_excel_pool.shutdown, wait=False, cancel_futures=True)
+        return _excel_pool
+
+def discard_excel_pool(pool):
+    """Drop a broken pool so the next request starts a fresh one"""
+    global _excel_pool
+    with _excel_pool_lock:
+        if _excel_pool is pool:
+            _excel_pool = None
+    pool.shutdown(wait=False, cancel_futures=True)
+
+def read_sheets_in_parallel(content, sheet_names, workers):
+    """Parse worksheets across the shared process pool, each task opening the workbook once for its batch"""
+    batches = [sheet_names[i::workers] for i in range(workers)]
+    parsed = {}
+    pool = get_excel_pool()
+    try:
+        for batch_result in pool.map(read_sheet_batch_from_bytes, [content] * len(batches), batches):
+            parsed.update(batch_result)
+    except BrokenProcessPool:
+        discard_excel_pool(pool)
+        raise
+    return parsed
+
+def read_sheet_batch_from_bytes(content, sheet_names):
+    """Process pool entry point: open the workbook from raw bytes and parse the given sheets"""
+    xl_file = pd.ExcelFile(io.BytesIO(content))
+    return read_sheet_batch(xl_file, sheet_names)
+
+def read_sheet_batch(xl_file, sheet_names):
+    """Parse a list of sheets from an open workbook, returning (sheet_name, sheet_info) pairs"""
+    results = []
+    for sheet_name in sheet_names:
+        try:
+            # Read sheet with multiple strategies
+            sheet_data = read_sheet_with_fallback(xl_file, sheet_name)
+            if sheet_data is not None and not sheet_data.empty:
+                # Store data with original column names preserved exactly as uploaded
+                results.append((sheet_name, {
+                    'data': sheet_data.to_dict('records'),
+                    'columns': list(sheet_data.columns),  # Keep exact original column names
+                    'shape': sheet_data.shape,
+                    'has_data': True
+                }))
+                print(f"Successfully read sheet '{sheet_name}' with shape {sheet_data.shape}")
+            else:
+                results.append((sheet_name, {
+                    'data': [],
+                    'columns': [],
+                    'shape': (0, 0),
+                    'has_data': False,
+                    'error': 'No data found'
+                }))
+                print(f"No data found in sheet '{sheet_name}'")
+        except Exception as e:
+            print(f"Error reading sheet '{sheet_name}': {str(e)}")
+            results.append((sheet_name, {
+                'data': [],
+                'columns': [],
+                'shape': (0, 0),
+                'has_data': False,
+                'error': str(e)
+            }))
+    return results
+
 def read_sheet_with_fallback(file, sheet_name):
     """Read sheet with multiple fallback strategies"""
     strategies = [
@@ -99,7 +208,8 @@ def read_sheet_with_fallback(file, sheet_name):
 
     for strategy in strategies:
         try:
-            file.seek(0)  # Reset file pointer
+            if hasattr(file, 'seek'):
+                file.seek(0)  # Reset file pointer
             df = pd.read_excel(file, sheet_name=sheet_name, **strategy)
 
             # Clean the dataframe
@@ -115,9 +225,46 @@ def read_sheet_with_fallback(file, sheet_name):
 
     return pd.DataFrame()
 
-def store_excel_data_in_database(excel_data, user_email, filename):
-    """Store complete Excel data structure in database"""
-    from models import ROPARecord, ExcelFileData, ExcelSheetData, User
+def compute_content_hash(content):
+    """Return the SHA-256 hex digest used to content-address uploads and sheet bodies"""
+    if isinstance(content, str):
+        content = content.encode('utf-8')
+    return hashlib.sha256(content).hexdigest()
+
+def find_duplicate_upload(file_hash, user_email):
+    """Return the user's existing ExcelFileData with identical bytes, if any"""
+    from models import ExcelFileData, User
+
+    user = User.query.filter_by(email=user_email).first()
+    if not user:
+        return None
+    return ExcelFileData.query.filter_by(content_hash=file_hash, uploaded_by=user.id).first()
+
+def get_or_create_sheet_blob(sheet_info, sheet_body):
+    """Return the shared ExcelSheetBlob for this sheet body, creating it on first sight"""
+    from models import ExcelSheetBlob
+    from app import db
+
+    content_hash = compute_content_hash(sheet_body)
+    blob = ExcelSheetBlob.query.filter_by(content_hash=content_hash).first()
+    if blob is None:
+        blob = ExcelSheetBlob(
+            content_hash=content_hash,
+            columns=json.dumps(sheet_info['columns']),
+            row_count=sheet_info['shape'][0],
+            column_count=sheet_info['shape'][1],
+            sheet_data=sheet_body
+        )
+        db.session.add(blob)
+        db.session.flush()
+    return blob
+
+def store_excel_data_in_database(excel_data, user_email, filename, file_hash=None, extract_records=True, commit=True):
+    """
+    Store complete Excel data structure in database; extract_records=False stores the sheets only.
+    commit=False flushes instead, leaving the transaction (and any rollback) to the caller.
+    """
+    from models import ExcelFileData, ExcelSheetData, User
     from app import db
 
     try:
@@ -131,7 +278,12 @@ def store_excel_data_in_database(excel_data, user_email, filename):
                 department='System'
             )
             db.session.add(user)
-            db.session.commit()
+            db.session.flush()
+
+        # Imported records are classified and risk-scored on the way in for plans with automation
+        from subscription import has_feature
+        from automation import classify_records_frame
+        auto_classify = has_feature(user, 'has_automation')
 
         # Create Excel file record
         excel_file_record = ExcelFileData(
@@ -140,7 +292,8 @@ def store_excel_data_in_database(excel_data, user_email, filename):
             total_sheets=excel_data['metadata']['total_sheets'],
             sheet_names=json.dumps(excel_data['metadata']['sheet_names']),
             upload_timestamp=datetime.now(),
-            file_metadata=json.dumps(excel_data['metadata'])
+            file_metadata=json.dumps(excel_data['metadata']),
+            content_hash=file_hash
         )
         db.session.add(excel_file_record)
         db.session.flush()  # Get the ID
@@ -153,63 +306,49 @@ def store_excel_data_in_database(excel_data, user_email, filename):
             if not sheet_info['has_data']:
                 continue
 
-            # Store sheet metadata
+            # Store sheet metadata; the body itself lives in a shared content-addressed blob
+            blob = get_or_create_sheet_blob(sheet_info, json.dumps(sheet_info['data']))
             excel_sheet_record = ExcelSheetData(
                 excel_file_id=excel_file_record.id,
                 sheet_name=sheet_name,
                 columns=json.dumps(sheet_info['columns']),
                 row_count=sheet_info['shape'][0],
                 column_count=sheet_info['shape'][1],
-                sheet_data=json.dumps(sheet_info['data'])
+                content_hash=blob.content_hash
             )
             db.session.add(excel_sheet_record)
             sheets_processed += 1
 
             # Try to extract ROPA records from sheet if it looks like ROPA data
-            if is_ropa_sheet(sheet_name, sheet_info):
-                ropa_records = extract_ropa_from_sheet_data(sheet_info['data'], user.id)
-                for record_data in ropa_records:
-                    try:
-                        record = ROPARecord(**record_data)
-                        db.session.add(record)
-                        records_created += 1
-                    except Exception as e:
-                        print(f"Error creating ROPA record: {str(e)}")
+            if extract_records and is_ropa_sheet(sheet_name, sheet_info):
+                records_df = extract_ropa_frame_from_sheet_data(sheet_info['data'], user.id)
+                if auto_classify:
+                    records_df = classify_records_frame(records_df)
+                records_created += bulk_insert_ropa_records(records_df)
 
-        db.session.commit()
+        if commit:
+            db.session.commit()
+        else:
+            db.session.flush()
 
         return f"Successfully processed Excel file with {sheets_processed} sheets. Created {records_created} ROPA records from identifiable ROPA sheets."
 
     except Exception as e:
-        db.session.rollback()
+        if commit:
+            db.session.rollback()
         print(f"Error storing Excel data: {str(e)}")
         return f"Error storing Excel data: {str(e)}"
 
 def is_ropa_sheet(sheet_name, sheet_info):
     """Determine if a sheet contains ROPA data"""
-    sheet_name_lower = sheet_name.lower()
-    
-    # Expanded ROPA keywords including common variations
-    ropa_sheet_keywords = [
-        'ropa', 'record', 'processing', 'activities', 'register', 'controller', 'processor',
-        'activity', 'data protection', 'gdpr', 'privacy', 'personal data'
-    ]
-
     # Check sheet name for ROPA indicators
-    if any(keyword in sheet_name_lower for keyword in ropa_sheet_keywords):
+    if sheet_name_matches(sheet_name):
         print(f"Sheet '{sheet_name}' identified as ROPA sheet by name")
         return True
 
-    # Check column names for ROPA indicators
-    columns = [str(col).lower() for col in sheet_info['columns']]
-    ropa_column_keywords = [
-        'processing', 'controller', 'data', 'purpose', 'legal', 'retention', 'security',
-        'activity', 'name', 'department', 'contact', 'address', 'dpo', 'subjects',
-        'categories', 'recipients', 'basis', 'measures', 'period'
-    ]
+    # Check column names for ROPA indicators (compiled matchers, cached per header layout)
+    matches, pattern_matches = header_keyword_matches(sheet_info['columns'])
 
-    matches = sum(1 for keyword in ropa_column_keywords if any(keyword in col for col in columns))
-    
     # Lower threshold for better detection
     if matches >= 2:
         print(f"Sheet '{sheet_name}' identified as ROPA sheet by columns (matches: {matches})")
@@ -218,9 +357,6 @@ def is_ropa_sheet(sheet_name, sheet_info):
     # Additional check: if sheet has reasonable amount of data and looks structured
     if len(sheet_info['columns']) >= 5 and sheet_info['shape'][0] > 1:
         # Check if any columns contain typical ROPA field patterns
-        typical_patterns = ['name', 'purpose', 'controller', 'data', 'legal']
-        pattern_matches = sum(1 for pattern in typical_patterns if any(pattern in col for col in columns))
-        
         if pattern_matches >= 2:
             print(f"Sheet '{sheet_name}' identified as potential ROPA sheet by structure")
             return True
@@ -230,66 +366,80 @@ def is_ropa_sheet(sheet_name, sheet_info):
 
 def extract_ropa_from_sheet_data(sheet_data, user_id):
     """Extract ROPA records from sheet data"""
-    ropa_records = []
-
-    for row in sheet_data:
-        # Convert row to ROPA record format
-        record_data = {
-            'processing_activity_name': '',
-            'status': 'Draft',
-            'created_by': user_id,
-            'created_at': datetime.utcnow(),
-            'updated_at': datetime.utcnow()
-        }
-
-        # Map Excel columns to ROPA fields
-        column_mapping = get_column_mapping()
-
-        for excel_col, value in row.items():
-            excel_col_lower = str(excel_col).lower()
-            for ropa_field, excel_patterns in column_mapping.items():
-                if any(pattern in excel_col_lower for pattern in excel_patterns):
-                    record_data[ropa_field] = str(value) if pd.notna(value) else ''
-                    break
-
-        # Ensure required fields have values
-        if not record_data['processing_activity_name']:
-            # Generate from available data
-            name_parts = []
-            if record_data.get('department_function'):
-                name_parts.append(record_data['department_function'])
-            if record_data.get('processing_purpose'):
-                name_parts.append(record_data['processing_purpose'])
-
-            record_data['processing_activity_name'] = ' - '.join(name_parts) or f'Processing Activity {len(ropa_records) + 1}'
+    return extract_ropa_frame_from_sheet_data(sheet_data, user_id).to_dict('records')
+
+def resolve_sheet_field_sources(columns):
+    """Resolve the ROPA field -> source column mapping once for a whole sheet"""
+    resolved = resolve_column_mapping(columns)
+    field_sources = {}
+
+    for excel_col in columns:
+        ropa_field = resolved.get(str(excel_col))
+        if ropa_field:
+            # Later columns overwrite earlier ones for the same field, as row-wise mapping did
+            field_sources[ropa_field] = excel_col
+
+    return field_sources
+
+def extract_ropa_frame_from_sheet_data(sheet_data, user_id):
+    """Extract ROPA records from sheet data column-wise, returning one DataFrame row per record"""
+    sheet_df = sheet_data if isinstance(sheet_data, pd.DataFrame) else pd.DataFrame(sheet_data)
+    if sheet_df.empty:
+        return pd.DataFrame()
+
+    records_df = pd.DataFrame(index=sheet_df.index)
+    records_df['processing_activity_name'] = ''
+
+    # Transform each mapped column in one pass instead of cell by cell
+    for ropa_field, excel_col in resolve_sheet_field_sources(sheet_df.columns).items():
+        values = sheet_df[excel_col].astype(object)
+        records_df[ropa_field] = values.where(values.notna(), '').map(str)
+
+    # Only keep rows that have meaningful data
+    meaningful = pd.Series(False, index=records_df.index)
+    for field in ['controller_name', 'processing_purpose', 'data_categories']:
+        if field in records_df.columns:
+            meaningful |= records_df[field].str.strip() != ''
+    records_df = records_df[meaningful].reset_index(drop=True)
+    if records_df.empty:
+        return records_df
+
+    # Ensure required fields have values, generating names from available data
+    missing_name = records_df['processing_activity_name'] == ''
+    if missing_name.any():
+        name_parts = pd.Series('', index=records_df.index)
+        for field in ['department_function', 'processing_purpose']:
+            if field in records_df.columns:
+                part = records_df[field]
+                joiner = pd.Series(' - ', index=records_df.index).where((name_parts != '') & (part != ''), '')
+                name_parts = name_parts + joiner + part
+        numbered = 'Processing Activity ' + pd.Series(records_df.index + 1, index=records_df.index).astype(str)
+        generated = name_parts.where(name_parts != '', numbered)
+        records_df.loc[missing_name, 'processing_activity_name'] = generated[missing_name]
+
+    now = datetime.utcnow()
+    records_df['status'] = 'Draft'
+    records_df['created_by'] = user_id
+    records_df['created_at'] = now
+    records_df['updated_at'] = now
+
+    return records_df
+
+def bulk_insert_ropa_records(records_df):
+    """Insert extracted ROPA records with a single executemany statement"""
+    from models import ROPARecord
+    from app import db
 
-        # Only add if it has meaningful data
-        if any(record_data.get(field, '').strip() for field in ['controller_name', 'processing_purpose', 'data_categories']):
-            ropa_records.append(record_data)
+    if records_df.empty:
+        return 0
 
-    return ropa_records
+    rows = records_df.to_dict('records')
+    db.session.execute(ROPARecord.__table__.insert(), rows)
+    return len(rows)
 
 def get_column_mapping():
     """Get mapping between Excel columns and ROPA fields"""
-    return {
-        'processing_activity_name': ['activity', 'name', 'process', 'title'],
-        'category': ['category', 'type'],
-        'description': ['description', 'detail'],
-        'department_function': ['department', 'function', 'responsible'],
-        'controller_name': ['controller', 'name'],
-        'controller_contact': ['controller contact', 'contact'],
-        'controller_address': ['controller address', 'address'],
-        'processing_purpose': ['purpose', 'reason'],
-        'legal_basis': ['legal', 'basis', 'lawful'],
-        'data_categories': ['data categories', 'personal data', 'data types'],
-        'data_subjects': ['data subjects', 'subjects'],
-        'retention_period': ['retention', 'period', 'time'],
-        'security_measures': ['security', 'measures', 'protection'],
-        'recipients': ['recipients', 'third parties'],
-        'dpo_name': ['dpo', 'protection officer'],
-        'dpo_contact': ['dpo contact'],
-        'dpo_address': ['dpo address']
-    }
+    return {field: list(patterns) for field, patterns in FIELD_PATTERNS.items()}
 
 def export_excel_with_all_sheets(user_email, user_role, include_updates=True):
     """Export Excel file with all original sheets plus updates"""
@@ -321,6 +471,7 @@ def export_excel_with_all_sheets(user_email, user_role, include_updates=True):
 
         with pd.ExcelWriter(file_path, engine='openpyxl') as writer:
             sheets_written = 0
+            used_sheet_names = set()
 
             for excel_file in excel_files:
                 # Get all sheets for this file
@@ -333,10 +484,8 @@ def export_excel_with_all_sheets(user_email, user_role, include_updates=True):
                         df = pd.DataFrame(sheet_data)
 
                         if not df.empty:
-                            # Write original sheet
-                            sheet_name = f"{sheet.sheet_name}_{excel_file.id}"
-                            if len(sheet_name) > 31:  # Excel sheet name limit
-                                sheet_name = sheet_name[:31]
+                            # Write original sheet; the file id suffix survives truncation to 31 characters
+                            sheet_name = unique_sheet_name(sheet.sheet_name, used_sheet_names, suffix=f"_{excel_file.id}")
 
                             df.to_excel(writer, sheet_name=sheet_name, index=False)
                             sheets_written += 1
@@ -346,38 +495,8 @@ def export_excel_with_all_sheets(user_email, user_role, include_updates=True):
             # Add updated ROPA records sheet
             if include_updates:
                 try:
-                    if user_role == 'Privacy Officer':
-                        ropa_records = ROPARecord.query.all()
-                    else:
-                        ropa_records = ROPARecord.query.filter_by(created_by=user.id).all()
-
-                    if ropa_records:
-                        ropa_data = []
-                        for record in ropa_records:
-                            record_dict = {
-                                'Processing Activity Name': record.processing_activity_name,
-                                'Category': record.category,
-                                'Description': record.description,
-                                'Department/Function': record.department_function,
-                                'Controller Name': record.controller_name,
-                                'Controller Contact': record.controller_contact,
-                                'Controller Address': record.controller_address,
-                                'DPO Name': record.dpo_name,
-                                'DPO Contact': record.dpo_contact,
-                                'Processing Purpose': record.processing_purpose,
-                                'Legal Basis': record.legal_basis,
-                                'Data Categories': record.data_categories,
-                                'Data Subjects': record.data_subjects,
-                                'Recipients': record.recipients,
-                                'Retention Period': record.retention_period,
-                                'Security Measures': record.security_measures,
-                                'Status': record.status,
-                                'Created Date': record.created_at.strftime('%Y-%m-%d %H:%M:%S') if record.created_at else '',
-                                'Updated Date': record.updated_at.strftime('%Y-%m-%d %H:%M:%S') if record.updated_at else ''
-                            }
-                            ropa_data.append(record_dict)
-
-                        ropa_df = pd.DataFrame(ropa_data)
+                    ropa_df = get_updated_records_frame(user, user_role)
+                    if not ropa_df.empty:
                         ropa_df.to_excel(writer, sheet_name='Updated_ROPA_Records', index=False)
                         sheets_written += 1
                 except Exception as e:
@@ -389,6 +508,195 @@ def export_excel_with_all_sheets(user_email, user_role, include_updates=True):
         print(f"Error exporting Excel with all sheets: {str(e)}")
         raise e
 
+EXCEL_SHEET_NAME_LIMIT = 31
+INVALID_SHEET_NAME_CHARS = '[]*?:/\\'
+
+def unique_sheet_name(name, used_names, suffix=''):
+    """Excel-safe sheet name kept within 31 characters and unique within `used_names` (which it updates)"""
+    base = ''.join('_' if char in INVALID_SHEET_NAME_CHARS else char for char in str(name)).strip() or 'Sheet'
+    candidate = base[:EXCEL_SHEET_NAME_LIMIT - len(suffix)] + suffix
+    counter = 1
+    while candidate.lower() in used_names:
+        counter += 1
+        tail = f"{suffix}_{counter}"
+        candidate = base[:EXCEL_SHEET_NAME_LIMIT - len(tail)] + tail
+    used_names.add(candidate.lower())
+    return candidate
+
+def get_updated_records_frame(user, user_role):
+    """Current ROPA records for the 'Updated_ROPA_Records' sheet, scoped to the user unless they are an officer"""
+    from models import ROPARecord
+
+    if user_role == 'Privacy Officer':
+        ropa_records = ROPARecord.query.all()
+    else:
+        ropa_records = ROPARecord.query.filter_by(created_by=user.id).all()
+
+    ropa_data = []
+    for record in ropa_records:
+        record_dict = {
+            'Processing Activity Name': record.processing_activity_name,
+            'Category': record.category,
+            'Description': record.description,
+            'Department/Function': record.department_function,
+            'Controller Name': record.controller_name,
+            'Controller Contact': record.controller_contact,
+            'Controller Address': record.controller_address,
+            'DPO Name': record.dpo_name,
+            'DPO Contact': record.dpo_contact,
+            'Processing Purpose': record.processing_purpose,
+            'Legal Basis': record.legal_basis,
+            'Data Categories': record.data_categories,
+            'Data Subjects': record.data_subjects,
+            'Recipients': record.recipients,
+            'Retention Period': record.retention_period,
+            'Security Measures': record.security_measures,
+            'Status': record.status,
+            'Created Date': record.created_at.strftime('%Y-%m-%d %H:%M:%S') if record.created_at else '',
+            'Updated Date': record.updated_at.strftime('%Y-%m-%d %H:%M:%S') if record.updated_at else ''
+        }
+        ropa_data.append(record_dict)
+
+    return pd.DataFrame(ropa_data)
+
+class ZipChunkBuffer:
+    """Write-only sink for a streaming ZipFile; drain() returns what was written since the last call"""
+
+    def __init__(self):
+        self._chunks = []
+
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def drain(self):
+        data = b''.join(self._chunks)
+        self._chunks = []
+        return data
+
+def get_export_workers(file_count):
+    """Workbooks one export builds at once; EXCEL_EXPORT_WORKERS overrides the CPU count, 1 disables the pool"""
+    return max(1, min(get_configured_workers('EXCEL_EXPORT_WORKERS'), file_count))
+
+def build_workbook_bytes(sheets):
+    """Process pool entry point: write [(sheet_name, sheet_json)] into one xlsx and return its bytes"""
+    buffer = io.BytesIO()
+    used_sheet_names = set()
+    with pd.ExcelWriter(buffer, engine='openpyxl') as writer:
+        for sheet_name, sheet_json in sheets:
+            df = pd.DataFrame(json.loads(sheet_json) if isinstance(sheet_json, str) else sheet_json)
+            df.to_excel(writer, sheet_name=unique_sheet_name(sheet_name, used_sheet_names), index=False)
+        if not used_sheet_names:
+            pd.DataFrame().to_excel(writer, sheet_name='Empty', index=False)
+    return buffer.getvalue()
+
+def load_workbook_job(excel_file):
+    """Archive entry name and sheet payloads for one uploaded file, read in the request's app context"""
+    stem = os.path.splitext(secure_filename(excel_file.filename) or 'workbook')[0]
+    sheets = [(sheet.sheet_name, sheet.sheet_data or '[]') for sheet in excel_file.sheets]
+    return f"{excel_file.id}_{stem}.xlsx", sheets
+
+def stream_workbooks_zip(user_email, user_role, include_updates=True, workers=None):
+    """
+    Yield a ZIP archive holding one workbook per uploaded file (plus the current ROPA records),
+    building workbooks on the shared process pool and writing each into the archive as soon as it finishes.
+    Workbooks that fail to build are listed in an ERRORS.txt member instead.
+    """
+    import zipfile
+    from itertools import chain
+    from concurrent.futures import FIRST_COMPLETED, wait
+    from models import ExcelFileData, User
+
+    user = User.query.filter_by(email=user_email).first()
+    if not user:
+        raise Exception("User not found")
+
+    query = ExcelFileData.query
+    if user_role != 'Privacy Officer':
+        query = query.filter_by(uploaded_by=user.id)
+    file_ids = [row.id for row in query.with_entities(ExcelFileData.id).order_by(ExcelFileData.upload_timestamp.desc())]
+
+    def iter_jobs():
+        # Load one file's sheets only when there is room for it, so memory stays bounded
+        for file_id in file_ids:
+            excel_file = ExcelFileData.query.filter_by(id=file_id).first()
+            if excel_file is not None:
+                yield load_workbook_job(excel_file)
+        if include_updates:
+            ropa_df = get_updated_records_frame(user, user_role)
+            if not ropa_df.empty:
+                yield 'ROPA_Records.xlsx', [('Updated_ROPA_Records', ropa_df.to_dict('records'))]
+
+    jobs = iter_jobs()
+    sink = ZipChunkBuffer()
+    # Workbooks are already deflated, so the archive just stores them
+    archive = zipfile.ZipFile(sink, 'w', zipfile.ZIP_STORED)
+    failed = []
+
+    def record_failure(name, error):
+        print(f"Error building workbook {name}: {str(error)}")
+        failed.append((name, str(error)))
+
+    workers = workers or get_export_workers(len(file_ids) + 1)
+    if workers > 1:
+        pool = get_excel_pool()
+        pending = {}
+        retry = []
+
+        def submit_next():
+            job = next(jobs, None)
+            if job:
+                try:
+                    pending[pool.submit(build_workbook_bytes, job[1])] = job
+                except BrokenProcessPool:
+                    retry.append(job)
+                    raise
+            return job is not None
+
+        try:
+            # Keep this export's share of the pool busy with one more job queued behind each worker
+            for _ in range(workers * 2):
+                if not submit_next():
+                    break
+            while pending:
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    name, sheets = pending.pop(future)
+                    try:
+                        archive.writestr(name, future.result())
+                    except BrokenProcessPool:
+                        retry.append((name, sheets))
+                        raise
+                    except Exception as e:
+                        record_failure(name, e)
+                    submit_next()
+                yield sink.drain()
+        except BrokenProcessPool as e:
+            # Build whatever the broken pool still held, and the rest, in this process
+            print(f"Workbook export pool failed, continuing in-process: {str(e)}")
+            discard_excel_pool(pool)
+            jobs = chain(retry, list(pending.values()), jobs)
+            pending.clear()
+        finally:
+            for future in pending:
+                future.cancel()
+
+    for name, sheets in jobs:
+        try:
+            archive.writestr(name, build_workbook_bytes(sheets))
+        except Exception as e:
+            record_failure(name, e)
+        yield sink.drain()
+
+    if failed:
+        archive.writestr(EXPORT_ERRORS_MEMBER, 'These workbooks could not be built and are missing from this archive:\n'
+                         + ''.join(f'- {name}: {error}\n' for name, error in failed))
+    archive.close()
+    yield sink.drain()
+
 # Keep existing functions for backward compatibility
 def parse_excel_file(uploaded_file):
     """Legacy function - now uses multi-sheet reader"""
@@ -402,29 +710,10 @@ def parse_excel_file(uploaded_file):
 
 def standardize_columns(df):
     """Standardize column names for ROPA processing"""
-    column_mapping = {
-        'processing activity name': 'processing_activity_name',
-        'activity name': 'processing_activity_name',
-        'name': 'processing_activity_name',
-        'controller': 'controller_name',
-        'controller name': 'controller_name',
-        'purpose': 'processing_purpose',
-        'processing purpose': 'processing_purpose',
-        'data categories': 'data_categories',
-        'categories of data': 'data_categories',
-        'data subjects': 'data_subjects',
-        'retention': 'retention_period',
-        'retention period': 'retention_period',
-        'security measures': 'security_measures',
-        'legal basis': 'legal_basis',
-        'department': 'department_function',
-        'department function': 'department_function'
-    }
-
-    # Normalize column names
-    df.columns = [str(col).lower().strip() for col in df.columns]
+    resolved = resolve_column_mapping(df.columns)
+    column_mapping = {col: resolved.get(str(col), str(col).lower().strip()) for col in df.columns}
 
     # Apply mapping
     df = df.rename(columns=column_mapping)
 
-    return df
\ No newline at end of file
+    return df
@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+"""
+Schema migration command for the ROPA database.
+
+Replaces fix_schema.py, fix_database.py, migrate_db.py and
+reset_database_schema.py with the versioned runner in database.py.
+
+Usage:
+    python migrate.py            # apply pending migrations
+    python migrate.py --status   # show applied and pending versions
+    python migrate.py --reset    # back up, drop every table and rebuild from scratch
+"""
+
+import argparse
+import os
+import sqlite3
+from datetime import datetime
+from database import (get_db_connection, get_schema_version, run_migrations, install_tombstone_triggers,
+                      MIGRATIONS, LATEST_SCHEMA_VERSION)
+
+
+def print_status():
+    """Print each migration with whether it has been applied"""
+    current = get_schema_version()
+    print(f"Schema version {current} (latest {LATEST_SCHEMA_VERSION})")
+    for version, description, _ in MIGRATIONS:
+        state = 'applied' if version <= current else 'pending'
+        print(f"  {version:>3}  {state:<8} {description}")
+
+
+def backup_database():
+    """Copy the live database next to itself with a timestamp suffix"""
+    conn = get_db_connection()
+    db_path = conn.execute("PRAGMA database_list").fetchone()[2]
+    backup_path = f"{db_path}.{datetime.now().strftime('%Y%m%d%H%M%S')}.backup"
+    with sqlite3.connect(backup_path) as backup:
+        conn.backup(backup)
+    conn.close()
+    return backup_path
+
+
+def drop_all_tables():
+    """Drop every user table, including schema_migrations, so the runner starts from version 0"""
+    conn = get_db_connection()
+    tables = [row[0] for row in conn.execute(
+        "SELECT name FROM sqlite_master WHERE type = 'table' AND name NOT LIKE 'sqlite_%'"
+    ).fetchall()]
+    conn.execute("PRAGMA foreign_keys = OFF")
+    for table in tables:
+        conn.execute(f'DROP TABLE IF EXISTS "{table}"')
+    conn.commit()
+    conn.close()
+    return tables
+
+
+def create_model_tables():
+    """Create tables that are defined only in models.py"""
+    os.environ.setdefault('EMAIL_OUTBOX_WORKER', '0')  # no background email delivery during migrations
+    from app import app, db
+    with app.app_context():
+        db.create_all()
+    install_tombstone_triggers()
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Apply ROPA database schema migrations')
+    group = parser.add_mutually_exclusive_group()
+    group.add_argument('--status', action='store_true', help='show applied and pending migrations')
+    group.add_argument('--reset', action='store_true', help='back up, drop all tables and rebuild the schema')
+    args = parser.parse_args()
+
+    if args.status:
+        print_status()
+    else:
+        if args.reset:
+            print(f"Database backed up to {backup_database()}")
+            print(f"Dropped {len(drop_all_tables())} table(s)")
+
+        applied = run_migrations()
+        create_model_tables()
+        print(f"Applied {len(applied)} migration(s); schema is at version {get_schema_version()}")
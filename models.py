@@ -89,6 +89,10 @@ class ROPARecord(db.Model):
     # Entity type (Controller / Processor / Joint Controller)
     entity_type = db.Column(String(50), default='Controller')
 
+    # Non-empty approved custom field values as JSON {custom_field_id: value}; NULL only on rows the
+    # schema migration 10 backfill hasn't reached, which are read from ropa_custom_data instead
+    custom_values = db.Column(Text, default='{}')
+
     # Metadata
     status = db.Column(String(50), default='Draft')
     created_by = db.Column(Integer, db.ForeignKey('users.id'), nullable=False)
@@ -110,6 +114,7 @@ class ExcelFileData(db.Model):
     last_edited_at = db.Column(DateTime, nullable=True)
     last_edited_by = db.Column(Integer, db.ForeignKey('users.id'), nullable=True)
     file_metadata = db.Column(Text)  # JSON metadata about the file
+    content_hash = db.Column(String(64), index=True)  # SHA-256 of the uploaded workbook bytes
 
     uploader = db.relationship('User', foreign_keys=[uploaded_by], backref='uploaded_excel_files')
     last_editor = db.relationship('User', foreign_keys=[last_edited_by], backref='edited_excel_files')
@@ -117,6 +122,9 @@ class ExcelFileData(db.Model):
 
 class ExcelSheetData(db.Model):
     __tablename__ = 'excel_sheets'
+    __table_args__ = (
+        db.UniqueConstraint('excel_file_id', 'sheet_name', name='uq_excel_sheets_file_sheet'),
+    )
 
     id = db.Column(Integer, primary_key=True)
     excel_file_id = db.Column(Integer, db.ForeignKey('excel_files.id'), nullable=False)
@@ -124,6 +132,36 @@ class ExcelSheetData(db.Model):
     columns = db.Column(Text)  # JSON array of column names
     row_count = db.Column(Integer, default=0)
     column_count = db.Column(Integer, default=0)
+    _sheet_data = db.Column('sheet_data', Text)  # JSON data of the sheet content (NULL when shared via a blob)
+    content_hash = db.Column(String(64), db.ForeignKey('excel_sheet_blobs.content_hash'), index=True)
+    created_at = db.Column(DateTime, default=datetime.utcnow)
+
+    blob = db.relationship('ExcelSheetBlob', lazy='joined')
+
+    @property
+    def sheet_data(self):
+        """Sheet JSON, read from the sheet's own copy or from the shared content blob"""
+        if self._sheet_data is not None:
+            return self._sheet_data
+        return self.blob.sheet_data if self.blob else None
+
+    @sheet_data.setter
+    def sheet_data(self, value):
+        # Copy-on-write: an edited sheet stops sharing the uploaded blob
+        self._sheet_data = value
+        self.content_hash = None
+        self.blob = None
+
+
+class ExcelSheetBlob(db.Model):
+    """Content-addressed sheet body shared by every upload containing the same sheet"""
+    __tablename__ = 'excel_sheet_blobs'
+
+    id = db.Column(Integer, primary_key=True)
+    content_hash = db.Column(String(64), unique=True, nullable=False)  # SHA-256 of sheet_data
+    columns = db.Column(Text)  # JSON array of column names
+    row_count = db.Column(Integer, default=0)
+    column_count = db.Column(Integer, default=0)
     sheet_data = db.Column(Text)  # JSON data of the sheet content
     created_at = db.Column(DateTime, default=datetime.utcnow)
 
@@ -179,8 +217,20 @@ class ApprovedCustomField(db.Model):
     custom_tab = db.relationship('CustomTab', backref='approved_field')
 
 
+class CacheVersion(db.Model):
+    """Version counter per cached dataset; bumping it invalidates in-process caches in every worker"""
+    __tablename__ = 'cache_versions'
+
+    name = db.Column(String(100), primary_key=True)
+    version = db.Column(Integer, nullable=False, default=0)
+    updated_at = db.Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+
+
 class ROPACustomData(db.Model):
     __tablename__ = 'ropa_custom_data'
+    __table_args__ = (
+        db.UniqueConstraint('ropa_record_id', 'custom_field_id', name='uq_ropa_custom_data_record_field'),
+    )
     
     id = db.Column(Integer, primary_key=True)
     ropa_record_id = db.Column(Integer, db.ForeignKey('ropa_records.id'), nullable=False)
@@ -265,4 +315,35 @@ class ExcelVersionHistory(db.Model):
 
     excel_file = db.relationship('ExcelFileData', backref='version_history')
     sheet = db.relationship('ExcelSheetData', backref='version_history')
-    user = db.relationship('User', backref='excel_version_changes')
\ No newline at end of file
+    user = db.relationship('User', backref='excel_version_changes')
+
+class Tombstone(db.Model):
+    """One row per deleted record, written by database triggers so delta exports can report deletions"""
+    __tablename__ = 'tombstones'
+
+    id = db.Column(Integer, primary_key=True)
+    table_name = db.Column(String(64), nullable=False)
+    row_id = db.Column(Integer, nullable=False)
+    row_key = db.Column(String(64))  # natural key for rows consumers don't address by id, e.g. "record_id:field_id"
+    owner_id = db.Column(Integer)  # creator/uploader, for scoping Privacy Champion deltas
+    deleted_at = db.Column(DateTime, nullable=False, index=True)
+
+
+class EmailOutbox(db.Model):
+    """Queued outgoing email, delivered by the background outbox worker in email_outbox.py"""
+    __tablename__ = 'email_outbox'
+    __table_args__ = (
+        db.Index('ix_email_outbox_due', 'status', 'next_attempt_at'),
+    )
+
+    id = db.Column(Integer, primary_key=True)
+    to_email = db.Column(String(120), nullable=False)
+    to_name = db.Column(String(200))
+    subject = db.Column(String(500), nullable=False)
+    message = db.Column(Text, nullable=False)
+    status = db.Column(String(20), nullable=False, default='pending')  # pending, sent, dead
+    attempts = db.Column(Integer, nullable=False, default=0)
+    next_attempt_at = db.Column(DateTime, nullable=False, default=datetime.utcnow)
+    last_error = db.Column(Text)
+    created_at = db.Column(DateTime, default=datetime.utcnow)
+    sent_at = db.Column(DateTime)
@@ -485,6 +485,130 @@ document.addEventListener('DOMContentLoaded', function() {
 // Export for global use
 window.ROPAApp = ROPAApp;
 
+// Client for the /api automation endpoints: debounced, cancellable and memoized per input.
+// Inputs can hold personal data, so they are POSTed as JSON and only ever kept in this page's memory.
+const ROPAAutomation = {
+    delay: 300,
+    memoLimit: 100,
+    memo: new Map(),
+    controllers: {},
+    timers: {},
+    pending: {},
+
+    // Payload with sorted keys and arrays joined the way the server splits them
+    normalize: function(payload) {
+        const normalized = {};
+        Object.keys(payload).sort().forEach(function(key) {
+            const value = payload[key];
+            normalized[key] = Array.isArray(value) ? value.join(', ') : (value == null ? '' : String(value));
+        });
+        return normalized;
+    },
+
+    // Least-recently-used memo keyed by the full endpoint + input, so different inputs never share a result
+    memoGet: function(key) {
+        if (!this.memo.has(key)) {
+            return undefined;
+        }
+        const value = this.memo.get(key);
+        this.memo.delete(key);
+        this.memo.set(key, value);
+        return value;
+    },
+
+    memoSet: function(key, value) {
+        this.memo.delete(key);
+        this.memo.set(key, value);
+        while (this.memo.size > this.memoLimit) {
+            this.memo.delete(this.memo.keys().next().value);
+        }
+    },
+
+    // Call an endpoint; resolves with the JSON body, or null if a newer call for the same endpoint replaced it
+    call: function(endpoint, payload, options) {
+        const self = this;
+        const wait = options && options.delay !== undefined ? options.delay : this.delay;
+        const body = JSON.stringify(this.normalize(payload));
+        const key = endpoint + ' ' + body;
+
+        this.cancel(endpoint);
+
+        const memoized = this.memoGet(key);
+        if (memoized !== undefined) {
+            return Promise.resolve(memoized);
+        }
+
+        return new Promise(function(resolve, reject) {
+            self.pending[endpoint] = resolve;
+            self.timers[endpoint] = setTimeout(function() {
+                delete self.pending[endpoint];
+                const controller = new AbortController();
+                self.controllers[endpoint] = controller;
+
+                fetch(endpoint, {
+                    method: 'POST',
+                    headers: {'Content-Type': 'application/json', 'Accept': 'application/json'},
+                    body: body,
+                    credentials: 'same-origin',
+                    signal: controller.signal
+                })
+                .then(function(response) {
+                    if (!response.ok) {
+                        throw new Error('HTTP ' + response.status);
+                    }
+                    return response.json();
+                })
+                .then(function(data) {
+                    self.memoSet(key, data);
+                    resolve(data);
+                })
+                .catch(function(error) {
+                    if (error.name === 'AbortError') {
+                        resolve(null);
+                    } else {
+                        reject(error);
+                    }
+                })
+                .finally(function() {
+                    if (self.controllers[endpoint] === controller) {
+                        delete self.controllers[endpoint];
+                    }
+                });
+            }, wait);
+        });
+    },
+
+    // Drop the debounced or in-flight call for an endpoint; its promise resolves with null
+    cancel: function(endpoint) {
+        clearTimeout(this.timers[endpoint]);
+        if (this.pending[endpoint]) {
+            this.pending[endpoint](null);
+            delete this.pending[endpoint];
+        }
+        if (this.controllers[endpoint]) {
+            this.controllers[endpoint].abort();
+        }
+    },
+
+    autoClassify: function(description) {
+        return this.call('/api/auto-classify', {description: description});
+    },
+
+    suggestPurpose: function(department, category) {
+        return this.call('/api/suggest-purpose', {department: department, category: category});
+    },
+
+    assessRisk: function(dataCategories, specialCategories) {
+        return this.call('/api/assess-risk', {data_categories: dataCategories, special_categories: specialCategories});
+    },
+
+    suggestSecurity: function(dataCategories, riskLevel) {
+        return this.call('/api/suggest-security', {data_categories: dataCategories, risk_level: riskLevel});
+    }
+};
+
+window.ROPAAutomation = ROPAAutomation;
+
 // Global function for dashboard card filtering
 function filterRecords(status) {
     ROPAApp.filterRecords(status);
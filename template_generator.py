@@ -1,11 +1,19 @@
+import io
 import os
 import tempfile
+import threading
 from datetime import datetime
 from openpyxl import Workbook
 from openpyxl.styles import Font, PatternFill, Alignment, Border, Side
 from openpyxl.utils import get_column_letter
 import pandas as pd
 import openpyxl
+from excel_styles import (register_named_styles, style_cells, add_zebra_stripes, set_default_row_height,
+                          REGISTER_SECTION_STYLE, REGISTER_HEADER_STYLE, REGISTER_CELL_STYLE, REGISTER_STRIPE_COLOR)
+
+# Blank workbook skeleton, keyed by the custom field schema version that decides its columns
+_skeleton_cache = {'version': None, 'workbook': None, 'columns': None}
+_skeleton_lock = threading.Lock()
 
 def get_all_database_columns():
     """Get all columns from the ROPARecord table dynamically"""
@@ -32,74 +40,36 @@ def get_all_database_columns():
         except:
             return []
 
+TEMPLATE_DATE_COLUMNS = ['created_at', 'updated_at', 'reviewed_at', 'approved_at']
+
+def template_column_sql(column):
+    """SELECT expression that cleans one column inside SQLite instead of per cell in Python"""
+    if column in TEMPLATE_DATE_COLUMNS:
+        return f'COALESCE("{column}", \'\') AS "{column}"'
+    text = f'TRIM(CAST("{column}" AS TEXT))'
+    if column == 'dpia_required':
+        return (f"CASE WHEN LOWER({text}) IN ('1', 'true', 'yes') THEN 'Yes' "
+                f"WHEN LOWER({text}) IN ('0', 'false', 'no') THEN 'No' "
+                f"ELSE COALESCE({text}, '') END AS \"{column}\"")
+    return f"CASE WHEN {text} IN ('nan', 'None', 'NaT', 'NULL') THEN '' ELSE COALESCE({text}, '') END AS \"{column}\""
+
 def get_all_ropa_data_for_template():
     """Get all existing ROPA records as a pandas DataFrame for template population"""
     try:
-        from database import get_db_connection
-        import sqlite3
+        from database import get_db_connection, table_columns
 
         conn = get_db_connection()
-        cursor = conn.cursor()
-
-        # First, let's check what columns actually exist in the database
-        cursor.execute("PRAGMA table_info(ropa_records)")
-        table_info = cursor.fetchall()
-        actual_columns = [col[1] for col in table_info]
-        print(f"Actual database columns: {actual_columns}")
-
-        # Get all records with all available columns
-        query = "SELECT * FROM הרופארCORDS ORDER BY created_at DESC"
-
-        cursor.execute(query)
-        rows = cursor.fetchall()
-
-        # Get column names from cursor description
-        columns = [description[0] for description in cursor.description]
-
-        # Create DataFrame
-        df = pd.DataFrame(rows, columns=columns)
+        columns = table_columns(conn.cursor(), 'ropa_records')
+        select_list = ', '.join(template_column_sql(column) for column in columns)
+        rows = conn.execute(f"SELECT {select_list} FROM ropa_records ORDER BY created_at DESC").fetchall()
         conn.close()
 
-        print(f"Found {len(df)} ROPA records for template")
-        print(f"Retrieved columns: {list(df.columns)}")
-
-        if df.empty:
+        print(f"Found {len(rows)} ROPA records for template")
+        if not rows:
             return pd.DataFrame()
 
-        # Debug: Print actual values from first record before any processing
-        if len(df) > 0:
-            print("RAW first record data from database:")
-            first_record = df.iloc[0]
-            for col in ['id', 'processing_activity_name', 'controller_name', 'controller_contact', 'controller_address', 'dpo_name']:
-                if col in df.columns:
-                    raw_value = first_record[col]
-                    print(f"  {col}: '{raw_value}' (type: {type(raw_value)})")
-
-        # Clean up the data more carefully
-        for col in df.columns:
-            if col in ['created_at', 'updated_at', 'reviewed_at', 'approved_at']:
-                # Keep datetime columns as strings if they're already formatted
-                df[col] = df[col].fillna('')
-            elif col == 'dpia_required':
-                # Convert boolean/int to Yes/No
-                df[col] = df[col].apply(lambda x: 'Yes' if x in [1, True, 'Yes', 'yes'] else 'No' if x in [0, False, 'No', 'no'] else str(x) if pd.notna(x) and str(x).strip() else '')
-            else:
-                # Handle other columns - be more careful with None/null values
-                df[col] = df[col].apply(lambda x: str(x).strip() if x is not None and pd.notna(x) and str(x).strip() not in ['nan', 'None', 'NaT', 'NULL'] else '')
-
-        print(f"DataFrame created with {len(df)} rows and {len(df.columns)} columns")
-
-        # Debug: Show cleaned data for first record
-        if len(df) > 0:
-            print("First record after cleaning - key fields:")
-            first_record = df.iloc[0]
-            key_fields = ['id', 'processing_activity_name', 'controller_name', 'controller_contact', 'controller_address', 'dpo_name', 'processing_purpose', 'status']
-            for col in key_fields:
-                if col in df.columns:
-                    value = first_record[col]
-                    print(f"  {col}: '{value}'")
-
-        return df
+        # Every column arrives as clean text, so no per-column conversion is needed
+        return pd.DataFrame.from_records(rows, columns=columns)
 
     except Exception as e:
         print(f"Error getting all ROPA data for template: {str(e)}")
@@ -132,10 +102,47 @@ def read_uploaded_excel_structure(file_path):
         print(f"Error reading Excel file: {str(e)}")
         return None
 
-def create_controller_sheet(wb, existing_data):
-    """Create the Controller Processing Activities Register sheet"""
-    ws = wb.create_sheet("Controller Processing Activities Register")
+def write_register_headers(ws, first_section, columns_structure):
+    """Section and column headers, widths and row heights shared by the Controller and Processor registers"""
+    register_named_styles(ws.parent)
+
+    # Row 1: Main section headers
+    last_col = get_column_letter(len(columns_structure))
+    sections = [
+        ('A1:C1', first_section),
+        ('D1:F1', 'Data Protection Officer'),
+        ('G1:I1', 'Representative Details (if applicable)'),
+        (f'J1:{last_col}1', 'Processing Details'),
+    ]
+    for cell_range, title in sections:
+        ws.merge_cells(cell_range)
+        cell = ws[cell_range.split(':')[0]]
+        cell.value = title
+        cell.style = REGISTER_SECTION_STYLE
+
+    # Row 2: Sub-headers exactly as shown in the image
+    for col_idx, (header, _) in enumerate(columns_structure, 1):
+        ws.cell(row=2, column=col_idx, value=header).style = REGISTER_HEADER_STYLE
+
+    # Set row heights to match the image
+    ws.row_dimensions[1].height = 30
+    ws.row_dimensions[2].height = 80  # Taller for the detailed headers
+
+    # Set column widths to match the proportions in the image
+    column_widths = [20, 30, 25, 20, 30, 25, 20, 30, 25, 35, 35, 30, 35, 25, 30, 40, 25, 15, 25, 30]
+    for i, width in enumerate(column_widths[:len(columns_structure)], 1):
+        ws.column_dimensions[get_column_letter(i)].width = width
+
+def style_register_rows(ws, first_row, last_row, num_cols):
+    """Bordered register cells with grey even rows; heights come from the sheet default"""
+    style_cells(ws, REGISTER_CELL_STYLE, first_row, last_row, 1, num_cols)
+    add_zebra_stripes(ws, first_row, last_row, num_cols, REGISTER_STRIPE_COLOR)
+    set_default_row_height(ws, 30)
 
+CONTROLLER_SHEET_TITLE = "Controller Processing Activities Register"
+
+def get_controller_columns():
+    """(header, field) pairs for the Controller register, including approved Controller custom fields"""
     # Define the exact column structure from the uploaded ROPA file
     columns_structure = [
         # Controller Details section (3 columns)
@@ -178,138 +185,44 @@ def create_controller_sheet(wb, existing_data):
 
     # Add Notes/Comments as the last column
     columns_structure.append(("Notes/Comments", "notes_comments"))
+    return columns_structure
 
-    # Create the header structure exactly as shown in the image
-    # Row 1: Main section headers
-    ws.merge_cells('A1:C1')  # Controller Details
-    ws['A1'] = 'Controller Details'
-    ws['A1'].font = Font(bold=True, color="FFFFFF", size=11)
-    ws['A1'].fill = PatternFill(start_color="366092", end_color="366092", fill_type="solid")
-    ws['A1'].alignment = Alignment(horizontal="center", vertical="center")
-    ws['A1'].border = Border(left=Side(style='thin'), right=Side(style='thin'), top=Side(style='thin'), bottom=Side(style='thin'))
-
-    ws.merge_cells('D1:F1')  # Data Protection Officer
-    ws['D1'] = 'Data Protection Officer'
-    ws['D1'].font = Font(bold=True, color="FFFFFF", size=11)
-    ws['D1'].fill = PatternFill(start_color="366092", end_color="366092", fill_type="solid")
-    ws['D1'].alignment = Alignment(horizontal="center", vertical="center")
-    ws['D1'].border = Border(left=Side(style='thin'), right=Side(style='thin'), top=Side(style='thin'), bottom=Side(style='thin'))
-
-    ws.merge_cells('G1:I1')  # Representative Details
-    ws['G1'] = 'Representative Details (if applicable)'
-    ws['G1'].font = Font(bold=True, color="FFFFFF", size=11)
-    ws['G1'].fill = PatternFill(start_color="366092", end_color="366092", fill_type="solid")
-    ws['G1'].alignment = Alignment(horizontal="center", vertical="center")
-    ws['G1'].border = Border(left=Side(style='thin'), right=Side(style='thin'), top=Side(style='thin'), bottom=Side(style='thin'))
-
-    # Calculate the last column letter for Processing Details
-    last_col = get_column_letter(len(columns_structure))
-    ws.merge_cells(f'J1:{last_col}1')  # Processing Details
-    ws['J1'] = 'Processing Details'
-    ws['J1'].font = Font(bold=True, color="FFFFFF", size=11)
-    ws['J1'].fill = PatternFill(start_color="366092", end_color="366092", fill_type="solid")
-    ws['J1'].alignment = Alignment(horizontal="center", vertical="center")
-    ws['J1'].border = Border(left=Side(style='thin'), right=Side(style='thin'), top=Side(style='thin'), bottom=Side(style='thin'))
-
-    # Row 2: Sub-headers exactly as shown in the image
-    headers = [col[0] for col in columns_structure]
-    for col_idx, header in enumerate(headers, 1):
-        cell = ws.cell(row=2, column=col_idx, value=header)
-        cell.font = Font(bold=True, color="FFFFFF", size=9)
-        cell.fill = PatternFill(start_color="4472C4", end_color="4472C4", fill_type="solid")
-        cell.alignment = Alignment(horizontal="center", vertical="center", wrap_text=True)
-        cell.border = Border(
-            left=Side(style='thin'),
-            right=Side(style='thin'),
-            top=Side(style='thin'),
-            bottom=Side(style='thin')
-        )
-
-    # Set row heights to match the image
-    ws.row_dimensions[1].height = 30
-    ws.row_dimensions[2].height = 80  # Taller for the detailed headers
+def create_controller_sheet(wb, existing_data):
+    """Create the Controller Processing Activities Register sheet"""
+    ws = wb.create_sheet(CONTROLLER_SHEET_TITLE)
+    columns_structure = get_controller_columns()
 
-    # Set column widths to match the proportions in the image
-    column_widths = [20, 30, 25, 20, 30, 25, 20, 30, 25, 35, 35, 30, 35, 25, 30, 40, 25, 15, 25, 30]
-    for i, width in enumerate(column_widths[:len(columns_structure)], 1):
-        ws.column_dimensions[get_column_letter(i)].width = width
+    # Create the header structure exactly as shown in the image
+    write_register_headers(ws, 'Controller Details', columns_structure)
+    populate_controller_sheet(ws, columns_structure, existing_data)
 
+def populate_controller_sheet(ws, columns_structure, existing_data):
+    """Write the data rows below the register headers and style them plus 20 blank entry rows"""
     # Add existing database data starting from row 3 (no sample data)
     start_row = 3
     if not existing_data.empty:
         print(f"Populating controller sheet with {len(existing_data)} existing records")
-        print(f"Available columns in data: {list(existing_data.columns)}")
-
-        for row_idx, (_, row) in enumerate(existing_data.iterrows(), start_row):
-            print(f"Processing row {row_idx - start_row + 1}")
-            for col_idx, (header, db_field) in enumerate(columns_structure, 1):
-                # Get value from existing data, with better field mapping
-                value = ''
-
-                # Try direct field mapping first
-                if db_field and db_field in row:
-                    value = row[db_field]
-                # Handle special cases and alternative field names
-                elif db_field == 'international_transfers':
-                    # Try alternative field names
-                    value = row.get('third_country_transfers', '') or row.get('international_transfers', '')
-                elif db_field == 'additional_info':
-                    # Try alternative field names
-                    value = row.get('additional_info', '') or row.get('other_relevant_information', '') or row.get('any_other_relevant_information', '')
-                elif db_field == 'dpia_required':
-                    # Handle boolean DPIA field
-                    dpia_val = row.get('dpia_required', '')
-                    if isinstance(dpia_val, bool):
-                        value = 'Yes' if dpia_val else 'No'
-                    elif str(dpia_val).lower() in ['true', '1', 'yes']:
-                        value = 'Yes'
-                    elif str(dpia_val).lower() in ['false', '0', 'no']:
-                        value = 'No'
-                    else:
-                        value = str(dpia_val) if dpia_val else ''
-                elif db_field.startswith("custom_"):
-                    # Handle custom fields, map them from the row directly
-                    # Assuming custom fields in the DB match the naming convention used here
-                    value = row.get(db_field, '')
-
-
-                # Handle None values and convert to string
-                if value is None or str(value).lower() in ['nan', 'none']:
-                    value = ''
-                else:
-                    value = str(value).strip()
-
-                # Debug print for first record
-                if row_idx == start_row:
-                    print(f"  {header} ({db_field}): '{value}'")
-
-                cell = ws.cell(row=row_idx, column=col_idx, value=value)
-                cell.border = Border(left=Side(style='thin'), right=Side(style='thin'), top=Side(style='thin'), bottom=Side(style='thin'))
-                cell.alignment = Alignment(wrap_text=True, vertical='top')
-                cell.font = Font(name="Calibri", size=10)
-
-                # Apply alternating row colors
-                fill_color = "FFFFFF" if row_idx % 2 == 1 else "F2F2F2"
-                cell.fill = PatternFill(start_color=fill_color, end_color=fill_color, fill_type="solid")
-
-            ws.row_dimensions[row_idx].height = 30
+
+        # Align the data to the sheet's columns once; fields the data doesn't have come out blank
+        from export_utils import normalize_text_series
+        fields = list(dict.fromkeys(db_field for _, db_field in columns_structure))
+        aligned = existing_data.reindex(columns=fields)
+        for field in fields:
+            aligned[field] = normalize_text_series(aligned[field], null_strings=[])
+            aligned[field] = aligned[field].mask(aligned[field].str.lower().isin(['nan', 'none']), '')
+        column_values = [aligned[db_field].tolist() for _, db_field in columns_structure]
+
+        for row_idx, values in enumerate(zip(*column_values), start_row):
+            for col_idx, value in enumerate(values, 1):
+                ws.cell(row=row_idx, column=col_idx, value=value)
 
         # Add empty rows for data entry after existing data
         next_empty_row = start_row + len(existing_data)
     else:
         next_empty_row = start_row
 
-    # Add empty rows for future data entry
-    for row_idx in range(next_empty_row, next_empty_row + 20):
-        fill_color = "FFFFFF" if row_idx % 2 == 1 else "F2F2F2"
-        fill = PatternFill(start_color=fill_color, end_color=fill_color, fill_type="solid")
-        for col_idx in range(1, len(columns_structure) + 1):
-            cell = ws.cell(row=row_idx, column=col_idx)
-            cell.border = Border(left=Side(style='thin'), right=Side(style='thin'), top=Side(style='thin'), bottom=Side(style='thin'))
-            cell.fill = fill
-            cell.font = Font(name="Calibri", size=10)
-            cell.alignment = Alignment(wrap_text=True, vertical='top')
-        ws.row_dimensions[row_idx].height = 30
+    # Style the data plus 20 empty rows for future data entry
+    style_register_rows(ws, start_row, next_empty_row + 19, len(columns_structure))
 
 def create_processor_sheet(wb):
     """Create the Processor Processing Activity sheet exactly as shown in the uploaded file"""
@@ -359,71 +272,10 @@ def create_processor_sheet(wb):
     processor_columns.append(("Notes/Comments", "processor_notes_comments"))
 
     # Create the header structure for Processor sheet
-    # Row 1: Main section headers
-    ws.merge_cells('A1:C1')  # Processor Details
-    ws['A1'] = 'Processor Details'
-    ws['A1'].font = Font(bold=True, color="FFFFFF", size=11)
-    ws['A1'].fill = PatternFill(start_color="366092", end_color="366092", fill_type="solid")
-    ws['A1'].alignment = Alignment(horizontal="center", vertical="center")
-    ws['A1'].border = Border(left=Side(style='thin'), right=Side(style='thin'), top=Side(style='thin'), bottom=Side(style='thin'))
-
-    ws.merge_cells('D1:F1')  # Data Protection Officer
-    ws['D1'] = 'Data Protection Officer'
-    ws['D1'].font = Font(bold=True, color="FFFFFF", size=11)
-    ws['D1'].fill = PatternFill(start_color="366092", end_color="366092", fill_type="solid")
-    ws['D1'].alignment = Alignment(horizontal="center", vertical="center")
-    ws['D1'].border = Border(left=Side(style='thin'), right=Side(style='thin'), top=Side(style='thin'), bottom=Side(style='thin'))
-
-    ws.merge_cells('G1:I1')  # Representative Details
-    ws['G1'] = 'Representative Details (if applicable)'
-    ws['G1'].font = Font(bold=True, color="FFFFFF", size=11)
-    ws['G1'].fill = PatternFill(start_color="366092", end_color="366092", fill_type="solid")
-    ws['G1'].alignment = Alignment(horizontal="center", vertical="center")
-    ws['G1'].border = Border(left=Side(style='thin'), right=Side(style='thin'), top=Side(style='thin'), bottom=Side(style='thin'))
-
-    # Calculate the last column letter for Processing Details
-    last_col = get_column_letter(len(processor_columns))
-    ws.merge_cells(f'J1:{last_col}1')  # Processing Details
-    ws['J1'] = 'Processing Details'
-    ws['J1'].font = Font(bold=True, color="FFFFFF", size=11)
-    ws['J1'].fill = PatternFill(start_color="366092", end_color="366092", fill_type="solid")
-    ws['J1'].alignment = Alignment(horizontal="center", vertical="center")
-    ws['J1'].border = Border(left=Side(style='thin'), right=Side(style='thin'), top=Side(style='thin'), bottom=Side(style='thin'))
-
-    # Row 2: Sub-headers
-    headers = [col[0] for col in processor_columns]
-    for col_idx, header in enumerate(headers, 1):
-        cell = ws.cell(row=2, column=col_idx, value=header)
-        cell.font = Font(bold=True, color="FFFFFF", size=9)
-        cell.fill = PatternFill(start_color="4472C4", end_color="4472C4", fill_type="solid")
-        cell.alignment = Alignment(horizontal="center", vertical="center", wrap_text=True)
-        cell.border = Border(
-            left=Side(style='thin'),
-            right=Side(style='thin'),
-            top=Side(style='thin'),
-            bottom=Side(style='thin')
-        )
-
-    # Set row heights
-    ws.row_dimensions[1].height = 30
-    ws.row_dimensions[2].height = 80
-
-    # Set column widths
-    column_widths = [20, 30, 25, 20, 30, 25, 20, 30, 25, 35, 35, 30, 35, 25, 30, 40, 25, 15, 25, 30]
-    for i, width in enumerate(column_widths[:len(processor_columns)], 1):
-        ws.column_dimensions[get_column_letter(i)].width = width
+    write_register_headers(ws, 'Processor Details', processor_columns)
 
     # Add empty rows for future data entry
-    for row_idx in range(3, 23):
-        fill_color = "FFFFFF" if row_idx % 2 == 1 else "F2F2F2"
-        fill = PatternFill(start_color=fill_color, end_color=fill_color, fill_type="solid")
-        for col_idx in range(1, len(processor_columns) + 1):
-            cell = ws.cell(row=row_idx, column=col_idx)
-            cell.border = Border(left=Side(style='thin'), right=Side(style='thin'), top=Side(style='thin'), bottom=Side(style='thin'))
-            cell.fill = fill
-            cell.font = Font(name="Calibri", size=10)
-            cell.alignment = Alignment(wrap_text=True, vertical='top')
-        ws.row_dimensions[row_idx].height = 30
+    style_register_rows(ws, 3, 22, len(processor_columns))
 
 def create_introduction_sheet(wb):
     """Create the Introduction sheet with GDPR ROPA information"""
@@ -518,25 +370,46 @@ The content of the template has been added to a 'table' which allows for simple
     for row in range(23, 26):
         ws.row_dimensions[row].height = 25
 
+def build_template_skeleton():
+    """Introduction, register headers and the Processor sheet with no data rows, as xlsx bytes"""
+    wb = Workbook()
+
+    # Remove the default sheet
+    wb.remove(wb.active)
+
+    create_introduction_sheet(wb)
+    columns_structure = get_controller_columns()
+    write_register_headers(wb.create_sheet(CONTROLLER_SHEET_TITLE), 'Controller Details', columns_structure)
+    create_processor_sheet(wb)
+
+    buffer = io.BytesIO()
+    wb.save(buffer)
+    return buffer.getvalue(), columns_structure
+
+def get_template_skeleton():
+    """Skeleton bytes and Controller columns, rebuilt only when approved custom fields change the columns"""
+    from custom_tab_automation import get_custom_field_schema_version
+
+    version = get_custom_field_schema_version()
+    with _skeleton_lock:
+        if _skeleton_cache['version'] != version:
+            _skeleton_cache['workbook'], _skeleton_cache['columns'] = build_template_skeleton()
+            _skeleton_cache['version'] = version
+            print(f"Built ROPA template skeleton for custom field schema version {version}")
+        return _skeleton_cache['workbook'], _skeleton_cache['columns']
+
+def build_populated_template(existing_data):
+    """Open a copy of the cached skeleton and fill in only the Controller data rows"""
+    skeleton, columns_structure = get_template_skeleton()
+    wb = openpyxl.load_workbook(io.BytesIO(skeleton))
+    populate_controller_sheet(wb[CONTROLLER_SHEET_TITLE], columns_structure, existing_data)
+    return wb
+
 def generate_populated_ropa_template(export_data_df):
     """Generate ROPA template populated with specific export data"""
     try:
         print(f"Generating populated ROPA template with {len(export_data_df)} records")
-
-        # Create workbook
-        wb = Workbook()
-
-        # Remove the default sheet
-        wb.remove(wb.active)
-
-        # Create Introduction sheet first
-        create_introduction_sheet(wb)
-
-        # Create Controller Processing Activities Register sheet with export data
-        create_controller_sheet(wb, export_data_df)
-
-        # Create Processor Processing Activity sheet (empty for now)
-        create_processor_sheet(wb)
+        wb = build_populated_template(export_data_df)
 
         # Save to temporary file
         temp_dir = tempfile.gettempdir()
@@ -556,48 +429,17 @@ def generate_populated_ropa_template(export_data_df):
         return None
 
 def generate_ropa_template():
-    """Generate complete ROPA template with Controller, Processor, and Example sheets"""
+    """Generate the complete ROPA template populated with existing records, as an in-memory xlsx file"""
     try:
-        # First, try to read the uploaded ROPA file to understand its structure
-        ropa_file_path = "attached_assets/ROPA_1755785640068.xlsx"
-        reference_structure = None
-
-        if os.path.exists(ropa_file_path):
-            reference_structure = read_uploaded_excel_structure(ropa_file_path)
-            if reference_structure is not None:
-                print("Successfully read reference ROPA structure")
-
-        # Get existing data to populate template
-        existing_data = get_all_ropa_data_for_template()
-
-        # Create workbook
-        wb = Workbook()
-
-        # Remove the default sheet
-        wb.remove(wb.active)
-
-        # Create Introduction sheet first
-        create_introduction_sheet(wb)
-
-        # Create Controller Processing Activities Register sheet
-        create_controller_sheet(wb, existing_data)
+        wb = build_populated_template(get_all_ropa_data_for_template())
 
-        # Create Processor Processing Activity sheet
-        create_processor_sheet(wb)
-
-        # Save to temporary file
-        temp_dir = tempfile.mkdtemp()
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        filename = f"ROPA_Complete_{timestamp}.xlsx"
-        file_path = os.path.join(temp_dir, filename)
-
-        wb.save(file_path)
-        print(f"Complete template saved to: {file_path}")
-
-        return file_path
+        buffer = io.BytesIO()
+        wb.save(buffer)
+        buffer.seek(0)
+        return buffer
 
     except Exception as e:
         print(f"Error during template generation: {str(e)}")
         import traceback
         traceback.print_exc()
-        return None
\ No newline at end of file
+        return None